@@ -1,65 +1,149 @@
 # app.py (読み込み専用・Googleフォーム連携版)
 
+import time
+_script_start = time.perf_counter()
+
 import streamlit as st
 import pandas as pd
 import base64
+import os
 from pathlib import Path
 from datetime import datetime
 import pytz 
-from astral.sun import sun
-from astral import LocationInfo
-import streamlit.components.v1 as components
 
-# 外部サービス連携用のライブラリ
-import gspread
-from gspread_dataframe import get_as_dataframe
-from google.oauth2.service_account import Credentials
+# 外部サービス連携用のライブラリ (gspread, google-auth。modules/sources.py で使う) と、各タブのモジュール (plotlyなど) は
+# 重いので、使う時に import_timed で読み込む。読み込み時間はログに出る (modules/lazy_import.py)
 
 # 自作モジュール (formはもう使いませんが、コメントアウトで残します)
 # from modules import form
-from modules import tracker, ranking
+from modules import admin, perf
+from modules.circles import circle_cache, load_circles
+from modules.dataset import build_dataset, get_dataset
+from modules.lazy_import import import_timed, logger
+from modules.shared_snapshot import SharedSnapshot
+from modules.sheet_sync import SheetSync
+from modules.snapshot_store import SnapshotStore
+from modules.sources import DEFAULT_LOCAL_PATH, LocalSource, SheetsSource
+from modules.sql_store import get_sql_dataset
+from modules.submission_queue import SubmissionQueue
 
 # --- データ読み込み関数 ---
-@st.cache_data(ttl=60) # 1分間は結果をキャッシュする
-def load_data(sheet_name, worksheet_name):
+# 記録の取得元: 環境変数 TRACKER_SOURCE=local の時は Googleに接続せず、
+# TRACKER_LOCAL_PATH (既定は data/training_log.csv) のCSV・Parquetを使う (modules/sources.py)
+DATA_SOURCE = os.environ.get("TRACKER_SOURCE", "sheets")
+
+@st.cache_resource(show_spinner=False)
+def get_source(sheet_name, worksheet_name):
+    """シートごとに1つの取得元。Googleの認証済みクライアントはプロセス全体で使い回す。"""
+    if DATA_SOURCE == "local":
+        return LocalSource(os.environ.get("TRACKER_LOCAL_PATH", DEFAULT_LOCAL_PATH))
+    return SheetsSource(sheet_name, worksheet_name, st.secrets["gcp_service_account"])
+
+@st.cache_resource(show_spinner=False)
+def get_sheet_sync(sheet_name, worksheet_name):
     """
-    指定されたGoogleスプレッドシートからデータを読み込み、DataFrameとして返す。
+    シートごとに1つの差分同期オブジェクトをプロセス全体で共有する。
+    ローカルに前回のスナップショット (data/snapshots/) があれば、そこから復元した状態で始まる。
     """
-    try:
-        scopes = ['https://www.googleapis.com/auth/spreadsheets', 'https://www.googleapis.com/auth/drive']
-        creds = Credentials.from_service_account_info(
-            st.secrets["gcp_service_account"],
-            scopes=scopes
-        )
-        client = gspread.authorize(creds)
-        spreadsheet = client.open(sheet_name)
-        worksheet = spreadsheet.worksheet(worksheet_name)
-        df = get_as_dataframe(worksheet)
-        
+    source = get_source(sheet_name, worksheet_name)
+    return SheetSync(
+        source.open,
+        # ローカルのファイルを使う時は、本番シートのスナップショットを上書きしない
+        store=SnapshotStore.for_sheet(sheet_name, worksheet_name) if DATA_SOURCE == "sheets" else None,
+    )
+
+def load_data(sync):
+    """
+    Googleスプレッドシートからデータを読み込み、DataFrameとして返す。
+    2回目以降は前回から追記された行だけを取得する (modules/sheet_sync.py)。
+    接続できない場合は例外になる (表示は get_snapshot 側で行う)。
+    裏で動く取り直しのスレッドから呼ばれるので、st の関数は使わない。
+    """
+    with perf.stage('sheet_fetch') as timing:
+        df = sync.sync()
+        timing['rows'] = len(df)
+    return clean_data(df)
+
+def load_local_data(sync):
+    """ローカルに保存した前回のスナップショット (ネットワークは使わない)。無ければ None。"""
+    if not sync.has_data:
+        return None
+    return clean_data(sync.snapshot())
+
+def clean_data(df):
+    """シートの生データから空行を除き、記録日を日付にする。"""
+    with perf.stage('clean', rows=len(df)):
         # --- データクリーニング処理 ---
         # 1. 全ての列が空の行を削除
         df.dropna(how='all', inplace=True)
         if not df.empty:
             # 2. 「記入者名」が空の行を削除する（こちらの方が安全）
             df.dropna(subset=['記入者名'], inplace=True)
-        
+
         # 3. 日付列をdatetime型に変換
         if '記録日' in df.columns:
             df['記録日'] = pd.to_datetime(df['記録日'], errors='coerce')
 
-        return df # DataFrameだけを返す
+    return df # DataFrameだけを返す
+
+@st.cache_resource(show_spinner=False)
+def get_submission_queue(sheet_name, worksheet_name):
+    """
+    シートごとに1つ、アプリ内フォームからの書き込みをまとめて送るキュー (modules/submission_queue.py)。
+    ヘッダー行は同期済みのものを使うので、送信のたびにシートを読まない。
+    """
+    sync = get_sheet_sync(sheet_name, worksheet_name)
+    return SubmissionQueue(
+        get_source(sheet_name, worksheet_name).open,
+        known_header=lambda: sync.header,
+    )
 
-    except Exception as e:
-        st.error(f"スプレッドシートの読み込み中にエラーが発生しました: {e}")
-        return pd.DataFrame()
+# 記録の保存先: 環境変数 TRACKER_BACKEND=sqlite の時は data/tracker.db (SQLite) に置き、
+# トラッカー・ランキングの絞り込みや集計をSQLのクエリで行う。既定はメモリ上のpandas
+USE_SQLITE = os.environ.get("TRACKER_BACKEND", "pandas") == "sqlite"
+
+# シートを取り直す間隔 (秒)。環境変数 TRACKER_REFRESH_INTERVAL で変えられる
+REFRESH_INTERVAL = float(os.environ.get("TRACKER_REFRESH_INTERVAL", 60))
+
+@st.cache_resource(show_spinner=False)
+def get_snapshot(circle_id, sheet_name, worksheet_name):
+    """
+    サークルごとに1つ、全セッションで共有する最新のDataset (modules/shared_snapshot.py)。
+    プロセスに1つの裏のスレッドが REFRESH_INTERVAL 秒ごとにシートと同期し、
+    内容が変わっていれば新しい版に差し替える。表示する側はシートへのアクセスを待たない。
+    起動直後はローカルに保存した前回のスナップショットからすぐに版を作る。
+    アプリ内フォームから送信されてまだシートに届いていない記録も、末尾に足して表示する。
+    """
+    # 取り直しはスクリプトの実行外で動くので、キャッシュされた関数はここで先に呼んでおく
+    sync = get_sheet_sync(sheet_name, worksheet_name)
+    submissions = get_submission_queue(sheet_name, worksheet_name)
+    datasets = circle_cache(circle_id, "dataset")
+    return SharedSnapshot(
+        lambda: load_data(sync),
+        lambda df: build_dataset(df, datasets),
+        interval=REFRESH_INTERVAL,
+        overlay=submissions.with_pending,
+        warm_start=lambda: load_local_data(sync),
+    )
+
+def get_view(dataset, circle_id):
+    """タブに渡す正規化済みデータ。SQLite版の時は同じ版をSQLiteに反映したものを渡す"""
+    return get_sql_dataset(dataset, circle_id) if USE_SQLITE else dataset
 
 # --- テーマ設定 ---
 tokyo_tz = pytz.timezone("Asia/Tokyo")
+
+@st.cache_data(show_spinner=False)
+def get_sun_times(day):
+    """東京の日の出・日の入りの時刻。日付ごとに1回だけ計算する。"""
+    astral = import_timed("astral")
+    astral_sun = import_timed("astral.sun")
+    city = astral.LocationInfo("Tokyo", "Japan", "Asia/Tokyo", 35.6895, 139.6917)
+    s = astral_sun.sun(city.observer, date=day, tzinfo=tokyo_tz)
+    return s["sunrise"], s["sunset"]
+
 now = datetime.now(tokyo_tz)
-city = LocationInfo("Tokyo", "Japan", "Asia/Tokyo", 35.6895, 139.6917)
-s = sun(city.observer, date=now.date(), tzinfo=tokyo_tz)
-sunrise = s["sunrise"]
-sunset = s["sunset"]
+sunrise, sunset = get_sun_times(now.date())
 
 # UIのライト/ダークモード設定
 if sunrise <= now <= sunset:
@@ -71,15 +155,43 @@ else:
 # --- ページ設定 ---
 st.set_page_config(page_title="UEC 筋トレトラッカー", layout="wide", initial_sidebar_state="collapsed")
 
+# この実行の段階ごとの時間・行数・キャッシュの結果を記録する (modules/perf.py)
+perf.start_run(st.session_state.get('active_tab', "トラッカー"))
+
+@st.cache_resource(show_spinner=False)
 def get_base64_image(image_path):
     with open(image_path, "rb") as img_file:
         return base64.b64encode(img_file.read()).decode()
 
+# --- サークル選択 ---
+# サークルごとのシート名・フォームは .streamlit/secrets.toml の [circles.*] で設定する (modules/circles.py)
+circles = load_circles()
+if st.session_state.get('circle') not in circles:
+    st.session_state.circle = next(iter(circles))
+circle = circles[st.session_state.circle]
+
+# --- データ読み込み ---
+# データは全セッションで共有するサークルごとのスナップショットから毎回受け取り、セッションにはコピーを持たない。
+# シートの同期・正規化・集計のキャッシュもサークルごとに分かれているので、
+# サークルを切り替えても他のサークルのデータを読み直したり追い出したりしない
+snapshot = get_snapshot(circle.id, circle.sheet, circle.worksheet)
+dataset = snapshot.current()
+if dataset is None:
+    if snapshot.last_error is not None:
+        st.error(f"スプレッドシートの読み込み中にエラーが発生しました: {snapshot.last_error}")
+    else:
+        st.info("スプレッドシートを読み込み中です。しばらくしてから再読み込みしてください。")
+    dataset = get_dataset(pd.DataFrame(), circle.id)
+elif snapshot.last_error is not None:
+    # 接続できない間は、最後に取得できたデータを表示し続ける
+    st.warning(f"スプレッドシートに接続できないため、前回取得したデータを表示しています: {snapshot.last_error}")
+
 # --- セッション管理 ---
-if 'df' not in st.session_state:
-    # ★★★ ここに、あなたのスプレッドシート名と、フォームの回答シート名を入力 ★★★
-    df = load_data("training_log_sheet", "フォームの回答") # 例: "フォームの回答 1"
-    st.session_state.df = df
+# セッションには表示中のデータのバージョンだけを覚えておき、新しい版に変わったら知らせる
+seen_versions = st.session_state.setdefault('data_versions', {})
+if seen_versions.get(circle.id) not in (None, dataset.version):
+    st.toast("新しい記録を反映しました")
+seen_versions[circle.id] = dataset.version
 
 # --- UI描画 ---
 image_data = get_base64_image("uecmuscle_icon.png")
@@ -142,10 +254,21 @@ st.markdown(f"""
     <div class="blue-header">
         <div style="display: flex; align-items: center; justify-content: center; gap: 16px;">
             <img src="data:image/png;base64,{image_data}" alt="logo" width="80" height="80">
-            <span>UEC 筋トレサークル</span>
+            <span>{circle.name}</span>
         </div>
     </div>
 """, unsafe_allow_html=True)
+# スクリプト開始からヘッダーを描画するまでの時間 (最初の表示までの目安)。--logger.level=debug で出る
+logger.debug("header painted: %.0f ms", (time.perf_counter() - _script_start) * 1000)
+
+# サークルが複数設定されている時だけ切り替えを表示する
+if len(circles) > 1:
+    _, circle_col, _ = st.columns([2, 3, 2])
+    with circle_col:
+        st.selectbox(
+            "サークル", list(circles), format_func=lambda c: circles[c].name,
+            key="circle", label_visibility="collapsed"
+        )
 
 # st.radioを使ったナビゲーション
 # st.session_stateに選択中のタブを保存
@@ -172,8 +295,8 @@ if st.session_state.active_tab == "記録入力":
     st.subheader("Googleフォームから記録を入力してください")
     st.markdown("---")
     
-    # ★★★ ここに、あなたのGoogleフォームの「共有可能なリンク」を貼り付け ★★★
-    google_form_url = "https://docs.google.com/forms/d/e/1FAIpQLSdwu012eCGPirIy8ko6h61F4lF2S6sCUz30Sk3dGF1EWLwbMg/viewform?usp=preview" # 例
+    # Googleフォームの「共有可能なリンク」はサークルごとの設定 (modules/circles.py) から取る
+    google_form_url = circle.form_url
     st.link_button("Googleフォームを開いて記録する ↗", google_form_url, type="primary")
     
     st.info("💡 入力した内容は、1分程度でアプリに反映されます。")
@@ -182,13 +305,20 @@ if st.session_state.active_tab == "記録入力":
     st.write("▼ フォームを直接表示することもできます")
     # 埋め込み用URLは、フォーム編集画面の「送信」ボタンから取得できます
     google_form_embed_url = google_form_url.replace("/viewform", "/viewform?embedded=true")
-    components.iframe(src=google_form_embed_url, height=800, scrolling=True)
+    import_timed("streamlit.components.v1").iframe(src=google_form_embed_url, height=800, scrolling=True)
     
     # --- 以前の入力フォーム機能は、いつでも復活できるようにコメントアウト ---
     # from modules import form
-    # form.run(st.session_state.df, st.session_state.get('worksheet'))
+    # form.run(dataset.raw, get_submission_queue(circle.sheet, circle.worksheet), snapshot)
     
 elif st.session_state.active_tab == "トラッカー":
-    tracker.run(st.session_state.df)
+    import_timed("modules.tracker").run(get_view(dataset, circle.id))
 elif st.session_state.active_tab == "ランキング":
-    ranking.run(st.session_state.df)
+    import_timed("modules.ranking").run(get_view(dataset, circle.id))
+
+logger.debug("script run (%s): %.0f ms", st.session_state.active_tab, (time.perf_counter() - _script_start) * 1000)
+last_run = perf.finish_run()
+
+# 性能パネル・隔離した行: URLに ?admin=<トークン> を付けた時だけ表示する (トークンは secrets の admin_token)
+if admin.is_admin():
+    admin.run(last_run, dataset, get_submission_queue(circle.sheet, circle.worksheet))
@@ -0,0 +1,115 @@
+# benchmarks/generate.py (ベンチマーク用の架空のトレーニング記録を作る)
+
+import numpy as np
+import pandas as pd
+
+from modules.exercises import EXERCISES
+from modules.scoring import BODYWEIGHT_COLUMN
+
+# Googleフォームの回答シートと同じ列順 (data/training_log.csv と同じ)。
+# modules/exercises.py に後から追加された種目の列は、シートと同じく右端に足す
+FORM_COLUMNS = [
+    'タイムスタンプ', 'メールアドレス', '記入者名', '記録日',
+    'ベンチプレス(kg × 回数)', 'スクワット(kg × 回数)', 'デッドリフト(kg × 回数)',
+    'ラットプルダウン(kg × 回数)', '懸垂(回数)', 'マシンショルダープレス(kg × 回数)',
+    'レッグプレス(kg × 回数)', '45°レッグプレス(kg × 回数)',
+]
+FORM_COLUMNS += [ex.column for ex in EXERCISES if ex.column not in FORM_COLUMNS]
+# 体重の列 (任意の質問) は、作る時だけ右端に足す
+
+# 種目ごとの「記入される割合」と「初心者の目安重量 (kg)」。割合は data/training_log.csv の実績に近い値
+# (ここに無い種目は _DEFAULT_EXERCISE の値で作る)
+_EXERCISES = {
+    'bench_press': (0.85, 35.0),
+    'deadlift': (0.10, 70.0),
+    'squat': (0.35, 50.0),
+    'latpulldown': (0.60, 35.0),
+    'chinup': (0.20, 0.0),
+    'shoulder_press': (0.20, 25.0),
+    'leg_press': (0.20, 100.0),
+    'leg_press_45': (0.30, 90.0),
+}
+_DEFAULT_EXERCISE = (0.10, 40.0)
+_REPS = np.array([1, 3, 5, 6, 8, 10, 10, 10, 12, 15])
+
+# 実際の入力にある誤入力の例 (どれも parse_sets で1セットも読めない)
+_MALFORMED = np.array(["60-", "-10", "60-10-2", "abc", "60--10", "六十-十", "60kg", "?"])
+
+
+def _lookup(table, index):
+    """文字列の表を引いてobject配列にする。行ごとに文字列を整形するより大幅に速い。"""
+    return np.asarray(table, dtype=object)[index]
+
+
+def generate_log(n_rows, n_members=None, n_months=None, malformed_rate=0.01, multi_set_rate=0.05,
+                 alt_notation_rate=0.02, bodyweight_rate=0.1, seed=0, end=pd.Timestamp("2025-12-31")):
+    """
+    Googleフォームの回答シートと同じ列構成の架空の記録を n_rows 行作る (値はすべて文字列、空欄はNaN)。
+      - メンバーはそれぞれの基礎体力から月ごとに少しずつ重量が伸びる
+      - 各行には数種目だけが記入される (疎な種目列)
+      - multi_set_rate の割合で "80-10,80-8" / "80-10 80-8" のような複数セット、
+        alt_notation_rate の割合で "80x10" のような別の表記になる
+      - malformed_rate の割合で、解釈できない「kg-回数」文字列が混ざる
+      - bodyweight_rate の割合の行にだけ体重 (BODYWEIGHT_COLUMN) が入る。0なら体重の列を作らない
+    n_members / n_months を省略すると、行数に応じた現実的な値にする。
+    """
+    rng = np.random.default_rng(seed)
+    if n_members is None:
+        n_members = int(np.clip(n_rows // 50, 5, 5000))
+    if n_months is None:
+        n_months = int(np.clip(n_rows // (n_members * 4), 3, 120))
+
+    member = rng.integers(0, n_members, n_rows)
+    strength = rng.lognormal(0.0, 0.3, n_members)  # メンバーごとの基礎体力
+    # 記録日は期間の初日からの日数で持ち、日付の文字列は表を引いて作る
+    days = rng.integers(0, n_months * 30, n_rows)
+    calendar = pd.date_range(end=end.normalize(), periods=n_months * 30 + 3)
+    # 記録日の昼12時から3日以内に送信されたことにし、シートと同じく送信順に並べる
+    # (記録日は前後することがある)
+    delay = rng.integers(12 * 3600, 3 * 86400, n_rows)
+    order = np.argsort(days * 86400 + delay, kind="stable")
+    days, delay = days[order], delay[order]
+
+    columns = {
+        'タイムスタンプ': (
+            _lookup(calendar.strftime("%Y/%m/%d "), days + delay // 86400)
+            + _lookup([f"{h:02d}:{m:02d}:{s:02d}" for h in range(24) for m in range(60) for s in range(60)],
+                      delay % 86400)
+        ),
+        'メールアドレス': _lookup([f"m{i}@example.com" for i in range(n_members)], member),
+        '記入者名': _lookup([f"メンバー{i:04d}" for i in range(n_members)], member),
+        '記録日': _lookup(calendar.strftime("%Y-%m-%d 00:00:00"), days),
+    }
+    progress = 1 + 0.02 * days / 30  # 月2%ずつ伸びる
+    for ex in EXERCISES:
+        rate, base = _EXERCISES.get(ex.id, _DEFAULT_EXERCISE)
+        filled = rng.random(n_rows) < rate
+        if ex.reps_only:
+            reps = (strength[member] * 8 * progress * rng.uniform(0.6, 1.1, n_rows)).astype("int64")
+            values = _lookup([str(r) for r in range(reps.max() + 1)], reps)
+        else:
+            # 0.5kg刻みの重量を「半kg単位の整数」で持ち、'37.5' / '60' の表を引く
+            half_kg = np.round(base * strength[member] * progress * rng.uniform(0.7, 1.0, n_rows) * 2).astype("int64")
+            kg_text = [str(h // 2) if h % 2 == 0 else f"{h / 2}" for h in range(half_kg.max() + 1)]
+            kg_values = _lookup(kg_text, half_kg)
+            reps_text = [str(r) for r in range(_REPS.max() + 1)]
+            values = kg_values + "-" + _lookup(reps_text, rng.choice(_REPS, n_rows))
+            # 同じ重量でもう1セット (区切りは半分が ","、半分が空白)
+            multi = rng.random(n_rows) < multi_set_rate
+            separator = np.where(rng.random(int(multi.sum())) < 0.5, ",", " ").astype(object)
+            values[multi] += separator + kg_values[multi] + "-" + _lookup(reps_text, rng.choice(_REPS, int(multi.sum())))
+            alt = rng.random(n_rows) < alt_notation_rate
+            values[alt] = pd.Series(values[alt], dtype=object).str.replace("-", "x").to_numpy()
+        broken = rng.random(n_rows) < malformed_rate
+        values[broken] = rng.choice(_MALFORMED, int(broken.sum()))
+        values[~filled] = np.nan
+        columns[ex.column] = values
+
+    if not bodyweight_rate:
+        return pd.DataFrame(columns, columns=FORM_COLUMNS)
+    # 体重はメンバーごとの値の前後1kgほど。0.1kg刻みの文字列で、ほとんどの行は空欄
+    bodyweight = rng.normal(65, 10, n_members).clip(45, 110)[member] + rng.uniform(-1, 1, n_rows)
+    weights = np.round(bodyweight, 1).astype(str).astype(object)
+    weights[rng.random(n_rows) >= bodyweight_rate] = np.nan
+    columns[BODYWEIGHT_COLUMN] = weights
+    return pd.DataFrame(columns, columns=FORM_COLUMNS + [BODYWEIGHT_COLUMN])
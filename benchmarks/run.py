@@ -0,0 +1,227 @@
+# benchmarks/run.py (データ処理の各段階の時間を測り、保存済みの基準値と比べる)
+"""
+使い方 (リポジトリのルートで実行):
+
+    python -m benchmarks.run                       # 1k / 10k / 100k 行で計測し、基準値と比較
+    python -m benchmarks.run --sizes 1k,1m         # 行数を指定 (k / m 表記可)
+    python -m benchmarks.run --save-baseline       # 計測結果を基準値として保存
+    python -m benchmarks.run --check               # 基準値より threshold 倍以上遅い段階があれば終了コード1
+
+ネットワークにもStreamlitの実行環境にも依存せず、benchmarks/generate.py の架空の記録だけで動く。
+基準値 (benchmarks/baseline.json) は計測したマシンに依存するので、同じマシンでの比較に使うこと。
+"""
+
+import argparse
+import json
+import platform
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.generate import generate_log
+from modules.chart_data import downsample
+from modules.cube import AggregateCube
+from modules.dataset import COLUMN_NAMES, Dataset, normalize
+from modules.exercises import EXERCISE_COLS, ONE_RM_EXERCISES
+from modules.growth import growth_for, growth_table
+from modules.parsing import parse_sets
+from modules.pr_index import PRIndex
+from modules.scoring import metric_values
+from modules.sheet_sync import SheetSync
+from modules.sources import FakeSheetsSource
+from modules.window_index import WindowIndex
+
+BASELINE_PATH = Path(__file__).resolve().parent / "baseline.json"
+DEFAULT_SIZES = "1k,10k,100k"
+
+
+def parse_size(text):
+    """'1k' → 1000、'1m' → 1000000。"""
+    text = text.strip().lower()
+    scale = {'k': 1_000, 'm': 1_000_000}.get(text[-1:], 1)
+    return int(float(text.rstrip('km')) * scale)
+
+
+def clean(df_raw):
+    """app.py の load_data と同じ前処理 (シートの値はすべて文字列で届く)。"""
+    df = df_raw.dropna(how='all').dropna(subset=['記入者名'])
+    return df.assign(記録日=pd.to_datetime(df['記録日'], errors='coerce'))
+
+
+# --- 計測する段階 ---
+# 各段階は (準備, 本体) の組。準備の時間は測らず、本体だけを repeat 回測る
+def stage_load(df_raw):
+    # シートからの全件読み込み〜前処理 (プロセス内の偽シートを使うので通信の時間は含まない)
+    source = FakeSheetsSource.from_frame(df_raw)
+    return lambda: clean(SheetSync(source.open).sync())
+
+
+def stage_parse(df_raw):
+    renamed = df_raw.rename(columns=COLUMN_NAMES)
+    return lambda: [parse_sets(renamed[ex]) for ex in EXERCISE_COLS]
+
+
+def stage_normalize(df_raw):
+    return lambda: normalize(df_raw)
+
+
+def stage_pr_ranking(df_raw):
+    events = normalize(df_raw)
+    return lambda: [PRIndex.build(events).ranking(ex) for ex in ONE_RM_EXERCISES]
+
+
+def stage_window_ranking(df_raw):
+    # 索引を作り、全種目について「直近30日」と「最初の半年」のランキングを引く
+    events = normalize(df_raw)
+    first, last = events['date'].min(), events['date'].max()
+    windows = [(last - pd.Timedelta(days=29), last), (first, first + pd.Timedelta(days=182))]
+
+    def run():
+        index = WindowIndex.build(events)
+        return [index.leaderboard(ex, start, end, k=10) for ex in ONE_RM_EXERCISES for start, end in windows]
+    return run
+
+
+def stage_relative_ranking(df_raw):
+    # 体重比のランキング (Dataset.metric_index と同じ): 取り込み時に埋めた体重のスコアで索引を作り、全種目の全期間を引く
+    events = normalize(df_raw)
+
+    def run():
+        index = WindowIndex.build(events, metric_values(events, relative=True))
+        return [index.leaderboard(ex, k=10) for ex in ONE_RM_EXERCISES]
+    return run
+
+
+def stage_cube(df_raw):
+    events = normalize(df_raw)
+    return lambda: AggregateCube.build(events)
+
+
+def stage_growth_ranking(df_raw):
+    # Dataset.growth と同じく、集計キューブの月ごとのセルから作る
+    dataset = Dataset(df_raw)
+    cube, months = dataset.cube, dataset.months
+
+    def run():
+        table = growth_table(cube.monthly_best(), months)
+        return [growth_for(table, ex, month) for ex in ONE_RM_EXERCISES for month in months]
+    return run
+
+
+def stage_chart_data(df_raw):
+    dataset = Dataset(df_raw)
+    # トラッカーで記録の多い5人を選んだ場合
+    members = dataset.events['name'].value_counts().index[:5].tolist()
+    first, last = dataset.date_range()
+
+    def run():
+        dff = dataset.select('bench_press', members, first, last)
+        window_start = dff['date'].max() - pd.Timedelta(days=13)
+        return downsample(dff, 'kg', window_start), downsample(dff, 'one_rm', window_start)
+    return run
+
+
+STAGES = {
+    'load': stage_load,
+    'parse': stage_parse,
+    'normalize': stage_normalize,
+    'pr_ranking': stage_pr_ranking,
+    'window_ranking': stage_window_ranking,
+    'relative_ranking': stage_relative_ranking,
+    'cube': stage_cube,
+    'growth_ranking': stage_growth_ranking,
+    'chart_data': stage_chart_data,
+}
+
+
+def measure(fn, repeat):
+    """repeat 回実行した中で最も速かった時間 (ms)。"""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def run_benchmarks(sizes, repeat=3, stages=STAGES, seed=0):
+    """{サイズ表記: {段階: ms}} を返す。"""
+    results = {}
+    for label in sizes:
+        df_raw = clean(generate_log(parse_size(label), seed=seed))
+        results[label] = {name: measure(prepare(df_raw), repeat) for name, prepare in stages.items()}
+    return results
+
+
+def load_baseline(path):
+    if not Path(path).exists():
+        return {}
+    return json.loads(Path(path).read_text(encoding="utf-8")).get("results", {})
+
+
+def save_baseline(path, results):
+    merged = load_baseline(path)
+    for label, timings in results.items():
+        # 一部の段階だけを計測した場合も、他の段階の基準値は残す
+        merged.setdefault(label, {}).update({name: round(ms, 3) for name, ms in timings.items()})
+    payload = {
+        "meta": {
+            "saved_at": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "pandas": pd.__version__,
+            "numpy": np.__version__,
+            "machine": platform.platform(),
+        },
+        "results": merged,
+    }
+    Path(path).write_text(json.dumps(payload, ensure_ascii=False, indent=2) + "\n", encoding="utf-8")
+
+
+def report(results, baseline, threshold):
+    """結果を表にして表示し、基準値より threshold 倍以上遅かった (サイズ, 段階) のリストを返す。"""
+    regressions = []
+    print(f"{'rows':>6}  {'stage':<15} {'ms':>10} {'baseline':>10} {'ratio':>7}")
+    for label, timings in results.items():
+        for name, ms in timings.items():
+            base = baseline.get(label, {}).get(name)
+            ratio = ms / base if base else None
+            flag = ""
+            if ratio is not None and ratio >= threshold:
+                flag = "  << REGRESSION"
+                regressions.append((label, name))
+            base_text = f"{base:10.1f}" if base else f"{'-':>10}"
+            ratio_text = f"{ratio:7.2f}" if ratio is not None else f"{'-':>7}"
+            print(f"{label:>6}  {name:<15} {ms:10.1f} {base_text} {ratio_text}{flag}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="muscle_tracker のデータ処理ベンチマーク")
+    parser.add_argument("--sizes", default=DEFAULT_SIZES, help="行数のカンマ区切り (例: 1k,10k,100k,1m)")
+    parser.add_argument("--stages", default=",".join(STAGES), help="計測する段階のカンマ区切り")
+    parser.add_argument("--repeat", type=int, default=3, help="各段階を何回実行して最速値を取るか")
+    parser.add_argument("--baseline", default=str(BASELINE_PATH), help="基準値のJSONファイル")
+    parser.add_argument("--save-baseline", action="store_true", help="計測結果を基準値として保存する")
+    parser.add_argument("--threshold", type=float, default=1.25, help="この倍率以上遅ければ退行とみなす")
+    parser.add_argument("--check", action="store_true", help="退行があれば終了コード1で終わる")
+    args = parser.parse_args(argv)
+
+    sizes = [s.strip() for s in args.sizes.split(",") if s.strip()]
+    stages = {name: STAGES[name] for name in args.stages.split(",")}
+    results = run_benchmarks(sizes, args.repeat, stages)
+    regressions = report(results, load_baseline(args.baseline), args.threshold)
+
+    if args.save_baseline:
+        save_baseline(args.baseline, results)
+        print(f"基準値を保存しました: {args.baseline}")
+    if args.check and regressions:
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,121 @@
+# modules/admin.py (管理者向けの性能パネルと隔離した行の一覧。URLに ?admin=<トークン> を付けた時だけ表示する)
+
+import hmac
+import os
+
+import streamlit as st
+
+from modules import perf
+from modules.lazy_import import IMPORT_TIMES
+
+
+def admin_token():
+    """管理者トークン (secrets の admin_token、無ければ環境変数 ADMIN_TOKEN)。未設定なら None。"""
+    try:
+        token = st.secrets.get("admin_token")
+    except Exception:
+        # secrets.toml が無い環境 (ローカル実行など)
+        token = None
+    return token or os.environ.get("ADMIN_TOKEN") or None
+
+
+def is_admin():
+    """URLの ?admin= がトークンと一致するか。トークンが未設定ならパネルは常に無効。"""
+    token = admin_token()
+    given = st.query_params.get("admin")
+    return bool(token and given) and hmac.compare_digest(str(given), str(token))
+
+
+def run(last_run, dataset=None, submissions=None):
+    """
+    直近の実行 (perf.finish_run の戻り値) と、プロセス全体の履歴の集計を表示する。
+    dataset を渡すと、取り込み時の検証 (modules/validation.py) で隔離した行も表示する。
+    submissions (modules/submission_queue.py) を渡すと、シートへの書き込みの誤りと書き込めなかった行も表示する。
+    """
+    st.markdown("---")
+    st.subheader("🛠 性能パネル (管理者用)")
+    runs = perf.history()
+
+    if last_run is not None:
+        st.markdown(f"**この実行**: {last_run['run']} / 合計 {last_run['total_ms']:.1f} ms")
+        st.dataframe(perf.stages_frame([last_run]).drop(columns=['run', 'started_at']), use_container_width=True)
+
+    st.markdown(f"**直近 {len(runs)} 回の実行の集計** (全セッション・裏で動く同期を含む)")
+    st.dataframe(
+        perf.summarize(runs),
+        column_config={
+            "hit_rate": st.column_config.NumberColumn(format="%.2f"),
+        },
+        use_container_width=True,
+    )
+
+    if IMPORT_TIMES:
+        st.markdown("**モジュールの初回読み込み時間 (ms)**")
+        st.dataframe(
+            {name: round(sec * 1000, 1) for name, sec in IMPORT_TIMES.items()},
+            use_container_width=True,
+        )
+
+    col1, col2 = st.columns(2)
+    col1.download_button(
+        "実行ログをダウンロード (JSON Lines)",
+        data=perf.to_jsonl(runs),
+        file_name="perf_runs.jsonl",
+        mime="application/x-ndjson",
+    )
+    col2.download_button(
+        "段階ごとの記録をダウンロード (CSV)",
+        data=perf.stages_frame(runs).to_csv(index=False),
+        file_name="perf_stages.csv",
+        mime="text/csv",
+    )
+
+    if submissions is not None:
+        show_submission_errors(submissions)
+    if dataset is not None:
+        show_quarantine(dataset.quarantine)
+
+
+def show_submission_errors(submissions):
+    """アプリ内フォームからシートへの書き込みで、再試行中の誤り (last_error) と書き込めなかった行 (failed)。"""
+    st.subheader("📮 シートへの書き込み")
+    if submissions.last_error is not None:
+        st.warning(f"書き込みを再試行しています: {submissions.last_error}")
+    failed = submissions.failed_rows()
+    if failed.empty:
+        st.caption("書き込めなかった行はありません。")
+        return
+    st.caption(f"{len(failed)} 行をシートに書き込めませんでした。内容を確かめて、Googleフォームから送り直してください。")
+    st.dataframe(failed, hide_index=True, use_container_width=True)
+
+
+QUARANTINE_LABELS = {
+    'sheet_row': "シートの行",
+    'timestamp': "送信日時",
+    'name': "記入者名",
+    'date': "記録日",
+    'dropped': "取り込まなかった部分",
+    'reasons': "理由",
+}
+
+
+def show_quarantine(quarantine):
+    """
+    検証で弾いた (イベントテーブルに入れていない) 行・セルと理由。
+    途中の行の編集は差分の同期では検出できないので、シートを直した内容は全体の読み直し (SheetSync) で取り込まれる。
+    """
+    st.subheader("🚧 取り込まなかった記録")
+    if quarantine.empty:
+        st.caption("検証で弾いた記録はありません。")
+        return
+    st.caption(
+        f"{len(quarantine)} 行 (セルだけを弾いた行は、同じ送信の他の種目は取り込み済み)。"
+        "シートの該当行を直すか消した内容は、"
+        "30分ごとのシート全体の読み直しで反映されます (すぐには反映されません)。"
+    )
+    st.dataframe(
+        quarantine.rename(columns=QUARANTINE_LABELS),
+        column_config={"記録日": st.column_config.DateColumn(format="YYYY-MM-DD")},
+        hide_index=True,
+        use_container_width=True,
+    )
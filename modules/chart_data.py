@@ -0,0 +1,71 @@
+# modules/chart_data.py (グラフに送る点を間引く)
+
+import numpy as np
+import pandas as pd
+
+# 1メンバー (1本の線) あたりにグラフへ送る点の上限
+POINT_BUDGET = 300
+
+
+def lttb(x, y, n_out):
+    """
+    Largest-Triangle-Three-Buckets法で n_out 点を選び、そのインデックスを返す。
+    最初と最後の点は必ず残し、間はバケットごとに「前に選んだ点・次のバケットの平均」と
+    最も大きな三角形を作る点を選ぶので、山や谷の形が残る。x は昇順であること。
+    """
+    n = len(x)
+    if n_out >= n:
+        return np.arange(n)
+    if n_out < 3:
+        return np.array([0, n - 1])
+
+    x = np.asarray(x, dtype="float64")
+    y = np.asarray(y, dtype="float64")
+    # 最初と最後を除いた点を n_out - 2 個のバケットに分ける
+    edges = np.linspace(1, n - 1, n_out - 1).astype(int)
+    selected = np.empty(n_out, dtype=int)
+    selected[0] = 0
+    selected[-1] = n - 1
+    prev = 0
+    for i in range(n_out - 2):
+        start, end = edges[i], edges[i + 1]
+        if i + 2 < len(edges):
+            nxt = slice(edges[i + 1], edges[i + 2])
+            next_x, next_y = x[nxt].mean(), y[nxt].mean()
+        else:
+            next_x, next_y = x[n - 1], y[n - 1]
+        area = np.abs(
+            (x[prev] - next_x) * (y[start:end] - y[prev])
+            - (x[prev] - x[start:end]) * (next_y - y[prev])
+        )
+        prev = start + int(area.argmax())
+        selected[i + 1] = prev
+    return selected
+
+
+def downsample(df, y, window_start=None, budget=POINT_BUDGET, by='name'):
+    """
+    グラフ用に点を減らした df を返す (日付順)。線 (by 列の値) ごとに、
+      - window_start 以降 (最初に表示される範囲) の点はすべて残し、
+      - それより前の点は残りの点数の範囲内で LTTB で間引く。
+    window_start が None の時は全体を budget 点まで間引く。
+    """
+    if df.empty:
+        return df
+    parts = []
+    for _, trace in df.groupby(by, sort=False, observed=True):
+        trace = trace.sort_values('date', kind='stable')
+        if window_start is None:
+            visible = trace.iloc[:0]
+            older = trace
+        else:
+            is_visible = trace['date'] >= pd.Timestamp(window_start)
+            visible = trace[is_visible]
+            older = trace[~is_visible]
+        older_budget = max(budget - len(visible), 2)
+        if len(older) > older_budget:
+            keep = lttb(older['date'].to_numpy(dtype="int64"), older[y].to_numpy(), older_budget)
+            older = older.iloc[keep]
+        parts.append(older)
+        parts.append(visible)
+    return pd.concat(parts).sort_values('date', kind='stable')
@@ -0,0 +1,100 @@
+# modules/circles.py (サークルごとのデータソースとキャッシュの区切り)
+
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+
+import streamlit as st
+
+from modules import perf
+
+# サークルを区別しない (1サークル運用の) 時のサークルID
+DEFAULT_CIRCLE = "default"
+
+
+@dataclass(frozen=True)
+class Circle:
+    id: str
+    name: str
+    sheet: str
+    worksheet: str
+    form_url: str
+
+
+# secrets に設定が無い時に使う、これまでの1サークル分の設定
+_DEFAULT_CIRCLES = {
+    DEFAULT_CIRCLE: Circle(
+        id=DEFAULT_CIRCLE,
+        name="UEC 筋トレサークル",
+        sheet="training_log_sheet",
+        worksheet="フォームの回答",
+        form_url="https://docs.google.com/forms/d/e/1FAIpQLSdwu012eCGPirIy8ko6h61F4lF2S6sCUz30Sk3dGF1EWLwbMg/viewform?usp=preview",
+    ),
+}
+
+
+def load_circles():
+    """
+    利用するサークルの一覧 {id: Circle} を返す。
+    .streamlit/secrets.toml に次のような表があればそれを使い、無ければ既定の1サークルだけ。
+
+        [circles.uec]
+        name = "UEC 筋トレサークル"
+        sheet = "training_log_sheet"
+        worksheet = "フォームの回答"
+        form_url = "https://docs.google.com/forms/..."
+    """
+    try:
+        configured = st.secrets.get("circles")
+    except Exception:
+        # secrets.toml が無い環境 (ローカル実行など)
+        configured = None
+    if not configured:
+        return dict(_DEFAULT_CIRCLES)
+    return {
+        circle_id: Circle(
+            id=circle_id,
+            name=conf.get("name", circle_id),
+            sheet=conf["sheet"],
+            worksheet=conf["worksheet"],
+            form_url=conf["form_url"],
+        )
+        for circle_id, conf in configured.items()
+    }
+
+
+class VersionCache:
+    """
+    1サークル分の「データのバージョン → 作った結果」のキャッシュ。新しく使ったものから max_entries 件だけ残す。
+    サークルごとに別のインスタンスを持つので、更新の多いサークルが他のサークルの結果を追い出すことはない。
+    同じサークルの中ではロックで1つずつ作るので、同じバージョンを複数セッションが同時に作ることもない。
+    """
+
+    def __init__(self, name, max_entries=4):
+        self.name = name  # 時間計測 (modules/perf.py) での段階名
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, build):
+        """key の結果を返す。無ければ build(latest) で作る。latest は直近に使った結果 (無ければ None)。"""
+        start = time.perf_counter()
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                perf.record(self.name, (time.perf_counter() - start) * 1000, cache='hit')
+                return self._entries[key]
+            latest = next(reversed(self._entries.values()), None)
+            value = build(latest)
+            self._entries[key] = value
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            perf.record(self.name, (time.perf_counter() - start) * 1000, cache='miss')
+            return value
+
+
+@st.cache_resource(show_spinner=False)
+def circle_cache(circle, kind):
+    """サークル・用途 (kind) ごとに1つの VersionCache をプロセス全体で共有する。"""
+    return VersionCache(kind)
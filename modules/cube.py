@@ -0,0 +1,193 @@
+# modules/cube.py (メンバー × 種目 × 週・月 の集計キューブ)
+
+from functools import cached_property
+
+import numpy as np
+import pandas as pd
+
+# 期間の単位: 週 (月曜始まり) と月
+GRAINS = ('W', 'M')
+# 全種目をまとめたセルの exercise の値 (練習日数などを種目をまたいで数える)
+ALL_EXERCISES = '*'
+
+CELL_KEYS = ['grain', 'period', 'name', 'exercise']
+_SUM_COLUMNS = ['sessions', 'sets', 'total_reps', 'tonnage']
+_MAX_COLUMNS = ['best_one_rm', 'best_score']
+CELL_COLUMNS = _SUM_COLUMNS + _MAX_COLUMNS
+
+
+def period_start(dates, grain):
+    """日付を、その週 (月曜) または月の初日に揃える。"""
+    days = dates.to_numpy(dtype="datetime64[D]")
+    if grain == 'W':
+        # 1970-01-01 は木曜日なので、3日ずらして月曜始まりにする
+        return pd.DatetimeIndex((days - ((days.astype("int64") + 3) % 7)).astype("datetime64[ns]"))
+    return pd.DatetimeIndex(days.astype("datetime64[M]").astype("datetime64[ns]"))
+
+
+def _hash_rows(frame):
+    return pd.util.hash_pandas_object(frame, index=False).to_numpy()
+
+
+def _mark_new_days(days, keys):
+    """
+    keys (1日分を表すハッシュ値) のうち days (数えた日、昇順) に無いものの最初の1行だけ True の配列と、
+    それを足した days を返す。
+    """
+    unique_keys, first = np.unique(keys, return_index=True)
+    new = ~np.isin(unique_keys, days, assume_unique=True)
+    flags = np.zeros(len(keys), dtype=bool)
+    flags[first[new]] = True
+    return flags, np.insert(days, np.searchsorted(days, unique_keys[new]), unique_keys[new])
+
+
+class AggregateCube:
+    """
+    イベントテーブル (modules/events.py) を、(期間の単位, 期間の初日, メンバー, 種目) のセルに集計したもの。
+    セルの値:
+      sessions    : 記録のある日数
+      sets        : セット数
+      total_reps  : 合計回数
+      tonnage     : 総挙上量 (重量×回数の合計、kg)
+      best_one_rm : 期間内の最大推定1RM
+      best_score  : 期間内の最大スコア (回数のみの種目は回数)
+    exercise が ALL_EXERCISES のセルは全種目の合計 (sessions は種目をまたいだ練習日数、best_* は持たない)。
+
+    cells はセルのキー4列のハッシュ値を索引にしたDataFrameで、追加分の足し込みは該当するセルだけを引いて行う。
+    update() は追加分だけを集計して足し合わせた新しいキューブを返す (元のキューブは変えない)。
+    同じ日の記録が後から届いても日数を二重に数えないよう、数えた日のハッシュ値を持っておく。
+    """
+
+    def __init__(self, cells=None, days=None):
+        if cells is None:
+            cells = pd.DataFrame({
+                'grain': pd.Series(dtype=object),
+                'period': pd.Series(dtype="datetime64[ns]"),
+                'name': pd.Series(dtype=object),
+                'exercise': pd.Series(dtype=object),
+                **{c: pd.Series(dtype="float64") for c in CELL_COLUMNS},
+            }, index=pd.Index([], dtype="uint64"))
+        self.cells = cells
+        # 数えた (日付, メンバー, 種目) と (日付, メンバー) のハッシュ値 (昇順)
+        self._days = np.empty(0, dtype="uint64") if days is None else days
+
+    @classmethod
+    def build(cls, events):
+        return cls().update(events)
+
+    def __len__(self):
+        return len(self.cells)
+
+    def update(self, events):
+        """events (追加分のイベントテーブル) を反映した新しいキューブを返す。"""
+        if events.empty:
+            return self
+        ev = pd.DataFrame({
+            'date': events['date'],
+            'name': events['name'],
+            'exercise': events['exercise'],
+            'reps': events['reps'].astype("int64"),
+            'tonnage': events['kg'].astype("float64") * events['reps'],
+            'one_rm': events['one_rm'].astype("float64"),
+            'score': events['score'].astype("float64"),
+        })
+        # 新しく記録のあった日 (まだ数えていない日) だけを練習日数に足す。種目ごとと全種目の2段で数える
+        ev['new_day'], days = _mark_new_days(self._days, _hash_rows(ev[['date', 'name', 'exercise']]))
+        ev['new_day_all'], days = _mark_new_days(days, _hash_rows(ev[['date', 'name']].assign(exercise=ALL_EXERCISES)))
+
+        parts = []
+        for grain in GRAINS:
+            ev['period'] = period_start(ev['date'], grain)
+            by_exercise = ev.groupby(['period', 'name', 'exercise'], observed=True, sort=False).agg(
+                sessions=('new_day', 'sum'),
+                sets=('reps', 'size'),
+                total_reps=('reps', 'sum'),
+                tonnage=('tonnage', 'sum'),
+                best_one_rm=('one_rm', 'max'),
+                best_score=('score', 'max'),
+            ).reset_index()
+            by_member = ev.groupby(['period', 'name'], observed=True, sort=False).agg(
+                sessions=('new_day_all', 'sum'),
+                sets=('reps', 'size'),
+                total_reps=('reps', 'sum'),
+                tonnage=('tonnage', 'sum'),
+            ).reset_index()
+            by_exercise['exercise'] = by_exercise['exercise'].astype(str)
+            by_member['exercise'] = ALL_EXERCISES
+            parts += [by_exercise.assign(grain=grain), by_member.assign(grain=grain)]
+
+        delta = pd.concat(parts, ignore_index=True)
+        delta['name'] = delta['name'].astype(str)
+        delta = delta[CELL_KEYS + CELL_COLUMNS].astype({c: "float64" for c in CELL_COLUMNS})
+        delta.index = pd.Index(_hash_rows(delta[CELL_KEYS]), dtype="uint64")
+        return AggregateCube(_combine(self.cells, delta), days)
+
+    @cached_property
+    def _slices(self):
+        """(期間の単位, 種目) → セルの行番号。キューブは作り直さないので1度だけ分ける。"""
+        return self.cells.groupby(['grain', 'exercise'], sort=False).indices
+
+    def query(self, grain, exercise, names=None, start=None, end=None):
+        """
+        1種目 (または ALL_EXERCISES) のセルを (期間, メンバー) 順のDataFrameで返す。
+        names を省略すると全員。start / end はその日を含む期間までに絞る。
+        frequency は週あたりの練習日数。
+        """
+        rows = self._slices.get((grain, exercise))
+        if rows is None:
+            return _empty_result()
+        cells = self.cells.iloc[rows]
+        if names is not None:
+            cells = cells[cells['name'].isin(list(names))]
+        if start is not None:
+            cells = cells[cells['period'] >= period_start(pd.Series([pd.Timestamp(start)]), grain)[0]]
+        if end is not None:
+            cells = cells[cells['period'] <= pd.Timestamp(end)]
+        weeks = 1.0 if grain == 'W' else cells['period'].dt.days_in_month / 7
+        cells = cells.assign(frequency=cells['sessions'] / weeks)
+        return cells.sort_values(['period', 'name'])[_RESULT_COLUMNS].reset_index(drop=True)
+
+    def monthly_best(self):
+        """(種目, メンバー, 月) ごとの月内ベスト1RM (列: exercise, name, month, one_rm)。成長率の計算 (modules/growth.py) に使う。"""
+        months = pd.concat(
+            [self.cells.iloc[rows] for (grain, exercise), rows in self._slices.items()
+             if grain == 'M' and exercise != ALL_EXERCISES],
+        ) if len(self.cells) else self.cells
+        months = months[months['best_one_rm'] > 0]
+        return pd.DataFrame({
+            'exercise': months['exercise'],
+            'name': months['name'],
+            'month': months['period'].dt.to_period('M'),
+            'one_rm': months['best_one_rm'],
+        }).reset_index(drop=True)
+
+
+_RESULT_COLUMNS = ['period', 'name'] + CELL_COLUMNS + ['frequency']
+
+
+def _empty_result():
+    return pd.DataFrame({
+        'period': pd.Series(dtype="datetime64[ns]"),
+        'name': pd.Series(dtype=object),
+        **{c: pd.Series(dtype="float64") for c in CELL_COLUMNS + ['frequency']},
+    })
+
+
+def _combine(cells, delta):
+    """既存のセルに追加分を足す (日数・回数などは和、ベストは最大)。既存のセルは書き換えず、コピーに足す。"""
+    if cells.empty:
+        return delta
+    pos = cells.index.get_indexer(delta.index)
+    present = pos >= 0
+    merged = cells.copy()
+    if present.any():
+        at = pos[present]
+        for col in _SUM_COLUMNS:
+            values = merged[col].to_numpy(copy=True)
+            values[at] += delta[col].to_numpy()[present]
+            merged[col] = values
+        for col in _MAX_COLUMNS:
+            values = merged[col].to_numpy(copy=True)
+            values[at] = np.fmax(values[at], delta[col].to_numpy()[present])
+            merged[col] = values
+    return pd.concat([merged, delta[~present]])
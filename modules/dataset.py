@@ -0,0 +1,258 @@
+# modules/dataset.py (全タブで共有する正規化済みデータ層)
+
+import hashlib
+from functools import cached_property
+
+import numpy as np
+import pandas as pd
+
+from modules import perf
+from modules.circles import DEFAULT_CIRCLE, circle_cache
+from modules.cube import AggregateCube
+from modules.events import append_events, day_bodyweights, fill_bodyweights, parse_cells, to_events
+from modules.exercises import EXERCISE_COLS, EXERCISE_COLUMN_NAMES, REPS_ONLY_EXERCISES
+from modules.growth import growth_for, growth_table
+from modules.pr_index import PRIndex
+from modules.scoring import BODYWEIGHT_COLUMN, DEFAULT_FORMULA, metric_values
+from modules.validation import validate
+from modules.window_index import WindowIndex
+
+# Googleフォームの列名 → プログラム内で使う英語名 (種目の列は modules/exercises.py の一覧から作る)
+COLUMN_NAMES = {
+    'タイムスタンプ': 'timestamp',
+    '記入者名': 'name',
+    '記録日': 'date',
+    **EXERCISE_COLUMN_NAMES,
+    BODYWEIGHT_COLUMN: 'bodyweight',
+    'メールアドレス': 'email',
+}
+
+
+def row_hashes(df_raw):
+    """生データの1行ごとのハッシュ値 (uint64配列)。"""
+    if df_raw.empty:
+        return np.empty(0, dtype="uint64")
+    return pd.util.hash_pandas_object(df_raw, index=False).to_numpy()
+
+
+def data_version(df_raw, hashes=None):
+    """生データの内容から決まるバージョン文字列 (内容ハッシュ) を返す。"""
+    if hashes is None:
+        hashes = row_hashes(df_raw)
+    h = hashlib.sha1()
+    h.update("\x1f".join(map(str, df_raw.columns)).encode("utf-8"))
+    h.update(hashes.tobytes())
+    return h.hexdigest()[:16]
+
+
+def ingest(df_raw, seen=None, latest_sent=None, bodyweights=None):
+    """
+    シートの生データを検証 (modules/validation.py) し、問題の無い行だけを
+    全タブ共通のイベントテーブル (modules/events.py) に正規化する。
+      - 列名を英語に統一
+      - 'date' をdatetime型にする (読めない日付の行は隔離する)
+      - 各種目のセルを1セット1行に分解し、日付順に並べる (セルの解釈は検証と正規化で1度だけ)
+    seen は前の版までに見た送信の内容、latest_sent は前の版までの最後の送信日時、
+    bodyweights は前の版までの体重の表 (modules/events.py の day_bodyweights。どれも追記分だけを正規化する時に渡す)。
+    (events, Validation, 前の版の分も含めた体重の表) を返す。
+    """
+    df = df_raw.rename(columns=COLUMN_NAMES)
+    dates = pd.to_datetime(df['date'], errors='coerce') if 'date' in df.columns else pd.NaT
+    df = df.assign(date=dates)
+    parsed = parse_cells(df, EXERCISE_COLS)
+    with perf.stage('validate', rows=len(df)):
+        checked = validate(df, parsed, EXERCISE_COLS, seen, latest_sent)
+    # 行全体を弾いた行を除き、取り込まないセル (範囲外のセット・体重) を除いてから正規化する
+    accepted = df[checked.ok]
+    if 'bodyweight' in accepted.columns and not checked.bodyweight_ok.all():
+        accepted = accepted.assign(bodyweight=accepted['bodyweight'].where(checked.bodyweight_ok[checked.ok]))
+    bodyweights = day_bodyweights(accepted, bodyweights)
+    events = to_events(
+        accepted, EXERCISE_COLS, REPS_ONLY_EXERCISES, bodyweights,
+        parsed.take_sets(checked.set_ok).take_rows(checked.ok),
+    )
+    return events, checked, bodyweights
+
+
+def normalize(df_raw):
+    """シートの生データのうち、検証を通った行だけのイベントテーブル (ingest の events)。"""
+    return ingest(df_raw)[0]
+
+
+class Dataset:
+    """
+    1つのシートスナップショットから作った正規化済みデータ。
+    計算はすべて縦持ちのイベントテーブル events (1セット1行) を使う。
+    全タブ・全セッションで共有する読み取り専用オブジェクトなので、
+    events を直接書き換えず、フィルタした結果 (コピー) だけを加工すること。
+
+    検証 (modules/validation.py) で弾いた行は events に入れず、理由と一緒に quarantine に残す。
+    raw は弾いた行も含めたシートの内容のまま (バックアップ用)。
+
+    base に前の版を渡すと、生データが「前の版 + 末尾への追記」になっている場合に限り、
+    追記された行だけを検証・正規化し、自己ベスト索引 (pr_index) と集計キューブ (cube) も追加分だけで更新する。
+    """
+
+    def __init__(self, df_raw, version=None, hashes=None, base=None):
+        self.raw = df_raw
+        self.row_hashes = row_hashes(df_raw) if hashes is None else hashes
+        self.version = version or data_version(df_raw, self.row_hashes)
+
+        if base is not None and base._is_prefix_of(df_raw, self.row_hashes):
+            with perf.stage('normalize', rows=len(df_raw) - len(base.raw)):
+                added, checked, self._bodyweights = ingest(
+                    df_raw.iloc[len(base.raw):], base._seen, base._latest_sent, base._bodyweights
+                )
+                self.events = append_events(base.events, added)
+                if self._bodyweights is not base._bodyweights:
+                    self.events = self._refill_bodyweights(self.events, base._bodyweights)
+                self.quarantine = base.quarantine
+                if not checked.quarantine.empty:
+                    self.quarantine = pd.concat([base.quarantine, checked.quarantine], ignore_index=True)
+            with perf.stage('pr_index', rows=len(added)):
+                self.pr_index = base.pr_index.copy()
+                self.pr_index.update_from(added)
+            with perf.stage('cube', rows=len(added)):
+                self.cube = base.cube.update(added)
+        else:
+            with perf.stage('normalize', rows=len(df_raw)):
+                self.events, checked, self._bodyweights = ingest(df_raw)
+                self.quarantine = checked.quarantine
+            with perf.stage('pr_index', rows=len(self.events)):
+                self.pr_index = PRIndex.build(self.events)
+            with perf.stage('cube', rows=len(self.events)):
+                self.cube = AggregateCube.build(self.events)
+
+        self._seen = checked.seen
+        self._latest_sent = checked.latest_sent
+        self.members = self.events['name'].cat.categories.tolist()
+
+    def _refill_bodyweights(self, events, old):
+        """
+        追記分に体重があると、そのメンバーの前の版の記録の体重 (前後の記録日から埋めた値) も変わり得るので、
+        全体を作り直した時と同じになるように、体重の表が変わったメンバーの記録だけ体重を引き直す。
+        """
+        changed = pd.concat([old, self._bodyweights]).drop_duplicates(keep=False)['name'].unique()
+        mask = events['name'].isin(changed).to_numpy()
+        weights = events['bodyweight'].to_numpy(copy=True)
+        weights[mask] = fill_bodyweights(
+            events['name'].to_numpy()[mask], events['date'].to_numpy()[mask], self._bodyweights
+        )
+        return events.assign(bodyweight=weights)
+
+    def _is_prefix_of(self, df_raw, hashes):
+        """df_raw がこの版の生データの末尾に行を足しただけのものか。"""
+        n = len(self.raw)
+        return (
+            0 < n < len(df_raw)
+            and list(df_raw.columns) == list(self.raw.columns)
+            and np.array_equal(hashes[:n], self.row_hashes)
+        )
+
+    @property
+    def empty(self):
+        return self.events.empty
+
+    @cached_property
+    def months(self):
+        """記録のある月 ('YYYY-MM') の新しい順のリスト。"""
+        if self.events.empty:
+            return []
+        periods = self.events['date'].dt.to_period('M').drop_duplicates().sort_values(ascending=False)
+        return periods.astype(str).tolist()
+
+    @cached_property
+    def growth(self):
+        """全種目・全月の成長率テーブル (modules/growth.py)。集計キューブの月ごとのセルから、初回アクセス時に1度だけ作る。"""
+        best = self.cube.monthly_best()
+        with perf.stage('growth_table', rows=len(best)):
+            return growth_table(best, self.months)
+
+    @cached_property
+    def window_index(self):
+        """期間を指定したランキング用の索引 (modules/window_index.py)。初回アクセス時に1度だけ作る。"""
+        with perf.stage('window_index', rows=len(self.events)):
+            return WindowIndex.build(self.events)
+
+    @cached_property
+    def _metric_indexes(self):
+        return {}
+
+    def metric_index(self, formula=DEFAULT_FORMULA, relative=False):
+        """
+        推定1RMの式・体重比 (modules/scoring.py) を選んだランキング用の索引。標準の式のスコアは window_index。
+        式ごとの列は取り込み時に作ってあるので、ここでは索引を (選ばれた組ごとに1度だけ) 作るだけ。
+        """
+        if formula == DEFAULT_FORMULA and not relative:
+            return self.window_index
+        key = (formula, relative)
+        if key not in self._metric_indexes:
+            with perf.stage('window_index', rows=len(self.events)):
+                self._metric_indexes[key] = WindowIndex.build(self.events, metric_values(self.events, formula, relative))
+        return self._metric_indexes[key]
+
+    # --- タブから使う問い合わせ (modules/sql_store.py の SqlDataset と同じ形) ---
+
+    def date_range(self):
+        """記録のある最初と最後の日付。"""
+        return self.events['date'].min(), self.events['date'].max()
+
+    def select(self, exercise, names, start, end, formula=DEFAULT_FORMULA, relative=False):
+        """
+        1種目・指定メンバー・期間 (両端を含む) の記録を日付順に返す。
+        one_rm 列は選んだ推定1RMの式・体重比 (modules/scoring.py) の値になる。
+        """
+        events = self.events
+        mask = (
+            (events['exercise'] == exercise) &
+            events['name'].isin(names) &
+            (events['date'] >= pd.to_datetime(start)) &
+            (events['date'] <= pd.to_datetime(end))
+        )
+        # グラフの凡例に未選択のメンバーが出ないよう、名前はカテゴリから文字列に戻す
+        rows = events.loc[mask, ['name', 'date', 'kg', 'reps']].astype({'name': str})
+        rows['one_rm'] = metric_values(events.loc[mask], formula, relative).astype("float32")
+        return rows.sort_values('date', kind='stable').reset_index(drop=True)
+
+    def best(self, name, exercise):
+        """(スコア, 日付) を返す。記録が無ければ None。"""
+        return self.pr_index.best(name, exercise)
+
+    def ranking(self, exercise):
+        """種目の自己ベストをメンバーごとに並べたDataFrame (name, best, date)。スコアの高い順。"""
+        return self.pr_index.ranking(exercise)
+
+    def leaderboard(self, exercise, start=None, end=None, k=None, formula=DEFAULT_FORMULA, relative=False):
+        """
+        期間 (両端を含む、省略すると無制限) 内のベストで並べたランキング (name, best, date, percentile)。
+        best は選んだ推定1RMの式・体重比の値。
+        """
+        return self.metric_index(formula, relative).leaderboard(exercise, start, end, k)
+
+    def growth_for(self, exercise, month):
+        """1種目・1ヶ月分の成長率 (成長したメンバーのみ)。"""
+        return growth_for(self.growth, exercise, month)
+
+    def trend(self, grain, exercise, names=None, start=None, end=None):
+        """週 ('W')・月 ('M') ごとの集計 (modules/cube.py の AggregateCube.query)。exercise に ALL_EXERCISES で全種目。"""
+        return self.cube.query(grain, exercise, names, start, end)
+
+
+def get_dataset(df_raw, circle=DEFAULT_CIRCLE):
+    """
+    生データに対応するDatasetを返す。同じ内容なら全セッションで同じオブジェクトを共有する。
+    キャッシュはサークルごとに分かれていて、直近に使った版を base に差分で作る。
+    """
+    return build_dataset(df_raw, circle_cache(circle, "dataset"))
+
+
+def build_dataset(df_raw, cache):
+    """
+    get_dataset の本体。キャッシュ (VersionCache) を直接受け取るので、
+    スクリプトの実行外 (裏で動く取り直しのスレッドなど) からも呼べる。
+    """
+    if df_raw is None:
+        df_raw = pd.DataFrame()
+    hashes = row_hashes(df_raw)
+    version = data_version(df_raw, hashes)
+    return cache.get(version, lambda latest: Dataset(df_raw, version, hashes, base=latest))
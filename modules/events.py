@@ -0,0 +1,280 @@
+# modules/events.py (1セット1行の縦持ちイベントテーブル)
+
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+from pandas.api.types import union_categoricals
+
+from modules.parsing import is_no_record, parse_numeric_series, parse_sets
+from modules.scoring import ONE_RM_COLUMNS, one_rm_columns
+
+# イベントテーブルの列と型
+#   date     : datetime64[ns]  記録日
+#   name     : category        記入者名
+#   exercise : category        種目 (英語名)
+#   kg       : float32         重量
+#   reps     : int16           回数
+#   one_rm   : float32         推定1RM (回数のみの種目は0)
+#   score    : float32         自己ベストの比較に使う値 (推定1RM、回数のみの種目は回数)
+#   one_rm_* : float32         他の式の推定1RM (modules/scoring.py の ONE_RM_COLUMNS)
+#   bodyweight: float32        その日の体重 (書かれていなければ前後の記録日の体重、分からなければ NaN)
+# one_rm と score の意味はこれまでと同じ (標準の式)
+_EXTRA_ONE_RM_COLUMNS = [c for c in ONE_RM_COLUMNS.values() if c != 'one_rm']
+EVENT_COLUMNS = ['date', 'name', 'exercise', 'kg', 'reps', 'one_rm', 'score'] + _EXTRA_ONE_RM_COLUMNS + ['bodyweight']
+
+# イベントテーブルの作り方 (セルの解釈・1RMの計算など) の版。
+# 同じ生データでも作り方が変わればイベントが変わるので、保存済みのイベント (modules/sql_store.py) を作り直すのに使う。
+# 変更した時に1つ上げること
+EVENTS_FORMAT = 8
+
+_INT16_MAX = np.iinfo("int16").max
+
+
+def empty_events(exercises):
+    return pd.DataFrame({
+        'date': pd.Series(dtype="datetime64[ns]"),
+        'name': pd.Categorical([]),
+        'exercise': pd.Categorical([], categories=list(exercises)),
+        'kg': pd.Series(dtype="float32"),
+        'reps': pd.Series(dtype="int16"),
+        'one_rm': pd.Series(dtype="float32"),
+        'score': pd.Series(dtype="float32"),
+        **{c: pd.Series(dtype="float32") for c in _EXTRA_ONE_RM_COLUMNS},
+        'bodyweight': pd.Series(dtype="float32"),
+    })
+
+
+def empty_bodyweights():
+    """体重の表 (day_bodyweights) の空の表。メンバー・記録日ごとに1行で、その日に書かれた体重。"""
+    return pd.DataFrame({
+        'name': pd.Series(dtype=object),
+        'date': pd.Series(dtype="datetime64[ns]"),
+        'bodyweight': pd.Series(dtype="float64"),
+    })
+
+
+def day_bodyweights(df, base=None):
+    """
+    df (検証を通った横持ちの行) の 'bodyweight' 列 (フォームの「体重(kg)」、任意) から体重の表を作る。
+    base (前の版までの表) を渡すと、それに df の分を足す。
+    同じメンバー・記録日に複数の体重があれば、シートで後の行の値にする (df は base より後の行)。
+    """
+    table = base if base is not None else empty_bodyweights()
+    if 'bodyweight' not in df.columns or 'name' not in df.columns:
+        return table
+    weights = pd.to_numeric(df['bodyweight'], errors='coerce').astype("float64")
+    given = ((weights > 0) & df['name'].notna() & df['date'].notna()).to_numpy()
+    if not given.any():
+        return table
+    added = pd.DataFrame({
+        'name': df['name'].astype(str).to_numpy(dtype=object)[given],
+        'date': df['date'].to_numpy(dtype="datetime64[ns]")[given],
+        'bodyweight': weights.to_numpy()[given],
+    })
+    table = pd.concat([table, added], ignore_index=True) if not table.empty else added
+    table = table.drop_duplicates(['name', 'date'], keep='last')
+    return table.sort_values(['name', 'date'], kind='stable').reset_index(drop=True)
+
+
+def fill_bodyweights(names, dates, table):
+    """
+    記録 (メンバー names・記録日 dates の配列) ごとの体重 (float64配列) を体重の表 (day_bodyweights) から引く。
+    その日の体重 → それ以前で最後の記録日の体重 → それも無ければ後で最初の記録日の体重。体重の無いメンバーは NaN。
+    どの記録の値もそのメンバーの体重の表だけで決まるので、追記分だけを取り込んでも全体を作り直しても同じ値になる。
+    """
+    result = np.full(len(names), np.nan)
+    if table.empty or len(names) == 0:
+        return result
+    # 表は (名前, 日付) の順なので、(名前の番号, 日数) を1つの整数にして二分探索する
+    members = pd.Index(table['name'].unique())
+    table_code = members.get_indexer(table['name']).astype("int64")
+    code = members.get_indexer(pd.Index(names, dtype=object).astype(str)).astype("int64")
+    table_key = (table_code << 32) + table['date'].to_numpy(dtype="datetime64[D]").astype("int64")
+    key = (code << 32) + np.asarray(dates, dtype="datetime64[D]").astype("int64")
+    before = np.searchsorted(table_key, key, side='right') - 1
+    after = np.minimum(before + 1, len(table_key) - 1)
+    weights = table['bodyweight'].to_numpy()
+    has_before = (before >= 0) & (table_code[np.maximum(before, 0)] == code)
+    has_after = table_code[after] == code
+    known = code >= 0
+    result[known] = np.where(
+        has_before, weights[np.maximum(before, 0)], np.where(has_after, weights[after], np.nan)
+    )[known]
+    return result
+
+
+@dataclass(frozen=True)
+class ParsedCells:
+    """parse_cells の結果。row〜reps は1セット1要素、unparsed_* は書式に合わなかった空でないセル1つ1要素。"""
+    row: np.ndarray  # df 内の行の位置
+    code: np.ndarray  # 種目の番号 (exercises の順)
+    kg: np.ndarray
+    reps: np.ndarray
+    unparsed_row: np.ndarray
+    unparsed_code: np.ndarray
+
+    def take_sets(self, keep):
+        """keep (セットごとの bool 配列) が True のセットだけに絞る。読めなかったセルはそのまま。"""
+        return ParsedCells(
+            self.row[keep], self.code[keep], self.kg[keep], self.reps[keep], self.unparsed_row, self.unparsed_code
+        )
+
+    def take_rows(self, keep):
+        """keep (df の行数の bool 配列) が True の行だけに絞り、行の位置を絞った後の df の位置に詰め直す。"""
+        position = np.cumsum(keep) - 1
+        sets, unparsed = keep[self.row], keep[self.unparsed_row]
+        return ParsedCells(
+            position[self.row[sets]], self.code[sets], self.kg[sets], self.reps[sets],
+            position[self.unparsed_row[unparsed]], self.unparsed_code[unparsed],
+        )
+
+
+def parse_cells(df, exercises):
+    """
+    種目列のセルをまとめて解釈し、1セット1要素の (元の行番号, 種目の番号, 重量, 回数) の配列を返す (ParsedCells)。
+    文字列の列は空でないセルだけを1本に並べて1回で解釈するので、
+    種目の数が増えても (ほとんどが空欄なら) 解釈の手間はほぼ増えない。
+    """
+    rows, codes, kgs, repss = [], [], [], []
+    unparsed_rows, unparsed_codes = [], []
+    text_codes, text_cols = [], []
+    for code, ex in enumerate(exercises):
+        if ex not in df.columns:
+            continue
+        if pd.api.types.is_numeric_dtype(df[ex].dtype):
+            # 数値列 (回数だけの列など) は回数として個別に読む
+            kg, reps = parse_numeric_series(df[ex])
+            rows.append(np.arange(len(df)))
+            codes.append(np.full(len(df), code))
+            kgs.append(kg)
+            repss.append(reps)
+        else:
+            text_codes.append(code)
+            text_cols.append(ex)
+
+    if text_cols:
+        block = df[text_cols].to_numpy(dtype=object)
+        # 行優先で取り出すので、(行, 種目) の順に並ぶ。1セルに複数セットがあれば書かれた順に続く
+        row, col = np.nonzero(pd.notna(block))
+        values = block[row, col]
+        cell, kg, reps = parse_sets(pd.Series(values, dtype=object))
+        rows.append(row[cell])
+        codes.append(np.asarray(text_codes)[col[cell]])
+        kgs.append(kg)
+        repss.append(reps)
+        # セットを1つも出さなかったセルのうち、空白や「なし」は空欄とみなす
+        missed = np.setdiff1d(np.arange(len(values)), cell)
+        missed = missed[~is_no_record(pd.Series(values[missed], dtype=object))]
+        unparsed_rows.append(row[missed])
+        unparsed_codes.append(np.asarray(text_codes)[col[missed]])
+
+    empty = np.zeros(0, dtype="int64")
+    if not rows:
+        return ParsedCells(empty, empty, np.zeros(0, dtype="float64"), empty, empty, empty)
+    return ParsedCells(
+        np.concatenate(rows), np.concatenate(codes), np.concatenate(kgs), np.concatenate(repss),
+        np.concatenate(unparsed_rows) if unparsed_rows else empty,
+        np.concatenate(unparsed_codes) if unparsed_codes else empty,
+    )
+
+
+def to_events(df, exercises, reps_only=(), bodyweights=None, parsed=None):
+    """
+    列名が英語に揃っていて 'date' が有効な横持ちの df から、イベントテーブルを作る。
+    重量・回数ともに0 (未入力・解釈不能) のセルは行にしない。
+    parsed に df の parse_cells の結果を渡すと、セルを解釈し直さずにそれを使う。
+    同じ日付の中では、元の行順 → exercises の順に並ぶ。
+    推定1RMは全部の式 (modules/scoring.py) の列をここで1度だけ計算する。
+    体重は体重の表 bodyweights (省略すると df から作る) から fill_bodyweights で引く。
+    """
+    if parsed is None:
+        parsed = parse_cells(df, exercises)
+    row, code, kg, reps = parsed.row, parsed.code, parsed.kg, parsed.reps
+    keep = (kg != 0) | (reps != 0)
+    if not keep.any():
+        return empty_events(exercises)
+    row, code, kg, reps = row[keep], code[keep], kg[keep], reps[keep]
+
+    reps_only_code = np.isin(code, [i for i, ex in enumerate(exercises) if ex in reps_only])
+    one_rms = {
+        col: np.where(reps_only_code, 0.0, values) for col, values in one_rm_columns(kg, reps).items()
+    }
+    long = pd.DataFrame({
+        'row': row,
+        'code': code,
+        'kg': kg,
+        'reps': reps,
+        **one_rms,
+        'score': np.where(reps_only_code, reps.astype("float64"), one_rms['one_rm']),
+    })
+    dates = df['date'].to_numpy()[long['row'].to_numpy()]
+    order = np.lexsort((long['code'].to_numpy(), long['row'].to_numpy(), dates))
+    long = long.iloc[order]
+    rows = long['row'].to_numpy()
+
+    names = df['name'].astype("object").to_numpy()[rows] if 'name' in df.columns else np.full(len(rows), None)
+    dates = dates[order]
+    if bodyweights is None:
+        bodyweights = day_bodyweights(df)
+    return pd.DataFrame({
+        'date': pd.to_datetime(dates).astype("datetime64[ns]"),
+        'name': pd.Categorical(names, categories=sorted(pd.unique(names[pd.notna(names)]))),
+        'exercise': pd.Categorical.from_codes(long['code'].to_numpy(), categories=list(exercises)),
+        'kg': long['kg'].to_numpy(dtype="float32"),
+        'reps': np.clip(long['reps'].to_numpy(), 0, _INT16_MAX).astype("int16"),
+        'one_rm': long['one_rm'].to_numpy(dtype="float32"),
+        'score': long['score'].to_numpy(dtype="float32"),
+        **{c: long[c].to_numpy(dtype="float32") for c in _EXTRA_ONE_RM_COLUMNS},
+        'bodyweight': fill_bodyweights(names, dates, bodyweights).astype("float32"),
+    })
+
+
+def append_events(events, added):
+    """
+    日付順のイベントテーブルに追加分をつなげる。
+    メンバーのカテゴリは和集合にし、追加分が末尾より古い日付を含む時だけ並べ直す。
+    """
+    if added.empty:
+        return events
+    if events.empty:
+        return added
+    names = union_categoricals([events['name'], added['name']], sort_categories=True)
+    combined = pd.concat(
+        [events.drop(columns='name'), added.drop(columns='name')], ignore_index=True
+    )
+    combined.insert(1, 'name', names)
+    if added['date'].min() < events['date'].iloc[-1]:
+        combined = combined.sort_values('date', kind='stable').reset_index(drop=True)
+    return combined
+
+
+SESSION_COLUMNS = ['date', 'name', 'exercise', 'sets', 'top_kg', 'top_reps', 'top_one_rm', 'total_reps', 'tonnage']
+
+
+def session_summary(events):
+    """
+    イベントテーブルを、日付・メンバー・種目ごと (その日のその種目1回分) にまとめる。
+    1種目に絞り込んだもの (Dataset.select の結果など、exercise 列が無いもの) は日付・メンバーごとにまとめる。
+      sets                         : セット数
+      top_kg / top_reps / top_one_rm: トップセットの重量・回数・推定1RM
+      total_reps                   : 合計回数
+      tonnage                      : 総挙上量 (重量×回数の合計、kg)
+    """
+    keys = [c for c in ('date', 'name', 'exercise') if c in events.columns]
+    columns = keys + SESSION_COLUMNS[3:]
+    ev = events.assign(
+        tonnage=events['kg'].astype("float64") * events['reps'],
+        total_reps=events['reps'].astype("int64"),  # int16 のまま合計すると溢れ得る
+    )
+    grouped = ev.groupby(keys, observed=True, sort=True)
+    summary = grouped.agg(
+        sets=('reps', 'size'), total_reps=('total_reps', 'sum'), tonnage=('tonnage', 'sum')
+    ).reset_index()
+    # トップセットは推定1RM → 回数の順で最大のセット (回数のみの種目は回数が最大のセット)。
+    # 並べ替えてから各グループの最後の行を取る。グループの順は上の集計と同じ
+    top = ev.sort_values(['one_rm', 'reps'], kind='stable').groupby(keys, observed=True, sort=True).last()
+    summary['top_kg'] = top['kg'].to_numpy()
+    summary['top_reps'] = top['reps'].to_numpy()
+    summary['top_one_rm'] = top['one_rm'].to_numpy()
+    return summary[columns]
@@ -0,0 +1,60 @@
+# modules/exercises.py (種目の一覧。フォーム・正規化・トラッカー・ランキングはすべてここから種目を取る)
+
+from dataclasses import dataclass
+
+# 記録の種類
+#   kg_reps : 「重量-回数」(例: 80-10)。推定1RMを計算し、ランキングの対象になる
+#   reps    : 回数のみ (例: 15)。1RMは0、自己ベストは回数で比べる
+KINDS = ('kg_reps', 'reps')
+# 種目ごとの型は持たない。回答シートの値はどの種目も文字列で届き (セルの書き方は kind で決まる)、
+# イベントテーブルは全種目で1本の kg (float32)・reps (int16) の列を共有するので (modules/events.py)、
+# 種目ごとに型を変える場所が無い
+
+
+@dataclass(frozen=True)
+class Exercise:
+    id: str  # プログラム内で使う英語名 (イベントテーブルの exercise)
+    label: str  # 表示名
+    column: str  # Googleフォームの回答シートの列名
+    kind: str = 'kg_reps'
+    group: str = "その他"  # 入力フォームでの見出し
+    placeholder: str = ""  # 入力フォームの入力例
+
+    @property
+    def reps_only(self):
+        return self.kind == 'reps'
+
+    @property
+    def input_label(self):
+        """入力フォームの項目名。"""
+        return f"{self.label} (回数)" if self.reps_only else f"{self.label} (kg-回数)"
+
+
+# 種目を増やす時は、回答シート (Googleフォーム) に列を足し、ここに1行追加するだけでよい (manual/new_exercise.md)。
+# 並び順がフォーム・種目の選択肢・イベントテーブルの種目の順になる
+EXERCISES = (
+    Exercise('bench_press', 'ベンチプレス', 'ベンチプレス(kg × 回数)', group="BIG 3", placeholder="例: 80-10"),
+    Exercise('deadlift', 'デッドリフト', 'デッドリフト(kg × 回数)', group="BIG 3", placeholder="例: 120-8"),
+    Exercise('squat', 'スクワット', 'スクワット(kg × 回数)', group="BIG 3", placeholder="例: 100-12"),
+    Exercise('latpulldown', 'ラットプルダウン', 'ラットプルダウン(kg × 回数)'),
+    Exercise('chinup', '懸垂', '懸垂(回数)', kind='reps', placeholder="例: 15"),
+    Exercise('shoulder_press', 'マシンショルダープレス', 'マシンショルダープレス(kg × 回数)'),
+    Exercise('leg_press', 'レッグプレス', 'レッグプレス(kg × 回数)'),
+    Exercise('leg_press_45', '45°レッグプレス', '45°レッグプレス(kg × 回数)'),
+)
+
+for _ex in EXERCISES:
+    if _ex.kind not in KINDS:
+        raise ValueError(f"unknown exercise kind: {_ex.id} ({_ex.kind})")
+
+# --- 一覧から作る対応表 ---
+EXERCISES_BY_ID = {ex.id: ex for ex in EXERCISES}
+# 種目の英語名 → 表示用ラベル
+EXERCISE_LABELS = {ex.id: ex.label for ex in EXERCISES}
+EXERCISE_COLS = list(EXERCISE_LABELS)
+# 回答シートの種目列名 → 英語名
+EXERCISE_COLUMN_NAMES = {ex.column: ex.id for ex in EXERCISES}
+# 回数のみを記録する種目 (1RM列を作らない)
+REPS_ONLY_EXERCISES = tuple(ex.id for ex in EXERCISES if ex.reps_only)
+# 推定1RMを持つ種目 (ランキング対象)
+ONE_RM_EXERCISES = [ex.id for ex in EXERCISES if not ex.reps_only]
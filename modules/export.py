@@ -0,0 +1,56 @@
+# modules/export.py (全記録のバックアップ用ファイルを作る)
+
+import io
+
+import pandas as pd
+import streamlit as st
+
+from modules import perf
+
+# 形式 -> (表示名, MIMEタイプ, 拡張子)
+EXPORT_FORMATS = {
+    'csv': ("CSV (Excel向け・BOM付きUTF-8)", 'text/csv', 'csv'),
+    'csv.gz': ("CSV (gzip圧縮)", 'application/gzip', 'csv.gz'),
+    'parquet': ("Parquet (圧縮・型付き)", 'application/vnd.apache.parquet', 'parquet'),
+}
+
+
+def select_rows(df_raw, members=None, start=None, end=None):
+    """生データ (フォームの列名のまま) をメンバー・記録日の範囲 (両端を含む) で絞り込む。"""
+    mask = pd.Series(True, index=df_raw.index)
+    if members is not None:
+        mask &= df_raw['記入者名'].isin(members)
+    if start is not None or end is not None:
+        dates = pd.to_datetime(df_raw['記録日'], errors='coerce')
+        if start is not None:
+            mask &= dates >= pd.Timestamp(start)
+        if end is not None:
+            mask &= dates <= pd.Timestamp(end)
+    return df_raw[mask]
+
+
+def to_bytes(df, fmt):
+    """df を指定形式のファイルの中身 (bytes) にする。"""
+    buf = io.BytesIO()
+    if fmt == 'csv':
+        # BOM付きUTF-8でエンコードすることで、Excelで開いた際の文字化けを防ぐ
+        df.to_csv(buf, index=False, encoding='utf-8-sig')
+    elif fmt == 'csv.gz':
+        # 全体を文字列にしてから圧縮せず、書き出しながら圧縮する
+        df.to_csv(buf, index=False, encoding='utf-8', compression={'method': 'gzip', 'mtime': 0})
+    elif fmt == 'parquet':
+        df.to_parquet(buf, index=False, compression='zstd')
+    else:
+        raise ValueError(f"unknown export format: {fmt}")
+    return buf.getvalue()
+
+
+@st.cache_resource(max_entries=8, show_spinner="ファイルを作成しています...")
+def build_export(version, fmt, members, start, end, _df_raw):
+    """
+    バックアップファイルの中身を作る。ダウンロードを要求された時にだけ呼び、
+    (データのバージョン, 形式, 絞り込み条件) ごとに全セッションで使い回す。
+    members が None なら全員、start / end が None なら期間で絞らない。
+    """
+    perf.mark_miss()
+    return to_bytes(select_rows(_df_raw, members, start, end), fmt)
@@ -1,23 +1,31 @@
 # modules/form.py (st.toastを使った最終完成版)
 
 import streamlit as st
-import pandas as pd
 from datetime import datetime
-import gspread
-from gspread_dataframe import set_with_dataframe
-from tenacity import retry, stop_after_attempt, wait_fixed
 
-@retry(stop=stop_after_attempt(3), wait=wait_fixed(2))
-def append_row_with_retry(worksheet, data):
-    """gspreadのAPIエラーが起きてもリトライする、append_rowのラッパー関数"""
-    worksheet.append_row(data)
+from modules.exercises import EXERCISES
+from modules.scoring import BODYWEIGHT_COLUMN
 
 
-def run(df, worksheet):
+def run(df, submissions, snapshot=None):
+    """
+    記録入力フォーム。送信された記録は submissions (modules/submission_queue.py) に入れるだけで、
+    シートへの書き込みは裏でまとめて行う。snapshot (共有スナップショット) を渡すと、
+    書き込みを待たずに全タブの表示へ反映する。
+    """
     # run関数の先頭にあったsession_stateのメッセージ処理は、もう不要なので削除します。
 
     st.title("筋トレ記録入力フォーム")
     st.markdown("### 今日のトレーニングを記録しよう！")
+
+    # 送信後に書き込めなかった記録があれば、送った人が気付けるように先に知らせる
+    if submissions is not None:
+        failed = submissions.failed_rows()
+        if not failed.empty:
+            st.error(f"シートに書き込めなかった記録が {len(failed)} 件あります。内容を確かめて、もう一度送信してください。")
+            st.dataframe(failed, hide_index=True, use_container_width=True)
+        elif submissions.last_error is not None:
+            st.warning("シートへの書き込みが遅れています。送信した記録は、書き込めるまで自動で送り直します。")
     
     st.markdown("##### 記入者")
     
@@ -52,20 +60,17 @@ def run(df, worksheet):
             )
 
         record_date = st.date_input("記録日", datetime.now())
+        # 体重は任意。回答シートに体重の列が無ければ書き込まれない (ヘッダーに無い列は submissions が捨てる)
+        bodyweight = st.text_input("体重 (kg、任意)", placeholder="例: 65.5")
         
-        st.markdown("---")
-        st.markdown("##### BIG 3")
-        bench_press = st.text_input("ベンチプレス (kg-回数)", placeholder="例: 80-10")
-        deadlift = st.text_input("デッドリフト (kg-回数)", placeholder="例: 120-8")
-        squat = st.text_input("スクワット (kg-回数)", placeholder="例: 100-12")
-        
-        st.markdown("---")
-        st.markdown("##### その他")
-        latpulldown = st.text_input("ラットプルダウン (kg-回数)")
-        chinup = st.text_input("懸垂 (回数)", placeholder="例: 15")
-        shoulder_press = st.text_input("マシンショルダープレス (kg-回数)")
-        leg_press = st.text_input("レッグプレス (kg-回数)")
-        leg_press_45 = st.text_input("45°レッグプレス (kg-回数)")
+        # 種目の入力欄は modules/exercises.py の一覧から、見出し (group) ごとに並べる
+        values = {}
+        for group in dict.fromkeys(ex.group for ex in EXERCISES):
+            st.markdown("---")
+            st.markdown(f"##### {group}")
+            for ex in EXERCISES:
+                if ex.group == group:
+                    values[ex.column] = st.text_input(ex.input_label, placeholder=ex.placeholder)
 
         submit_button = st.form_submit_button(label='この内容で記録する', type='primary')
 
@@ -74,29 +79,28 @@ def run(df, worksheet):
             st.warning("記入者を選択、または新しい名前を入力してください。")
             st.stop()
         
-        if worksheet is None:
+        if submissions is None:
             st.error("スプレッドシートに接続できません。設定を確認してください。")
             st.stop()
 
-        new_row_data = [
-            datetime.now().strftime('%Y/%m/%d %H:%M:%S'), '', name,
-            record_date.strftime('%Y-%m-%d 00:00:00'),
-            bench_press, deadlift, squat, latpulldown, chinup,
-            shoulder_press, leg_press, leg_press_45,
-        ]
+        # 列名で組み立て、シートの列順には submissions が同期済みのヘッダーで並べ替える
+        record = {
+            'タイムスタンプ': datetime.now().strftime('%Y/%m/%d %H:%M:%S'),
+            '記入者名': name,
+            '記録日': record_date.strftime('%Y-%m-%d 00:00:00'),
+            **values,
+        }
+        if bodyweight:
+            record[BODYWEIGHT_COLUMN] = bodyweight
 
         try:
-            append_row_with_retry(worksheet, new_row_data)
-            
-            # session_stateのデータ更新は、他のタブとの連携のために継続
-            headers = worksheet.get_all_values()[0]
-            new_record_df = pd.DataFrame([new_row_data], columns=headers)
-            new_record_df['記録日'] = pd.to_datetime(new_record_df['記録日'])
-            updated_df = pd.concat([df, new_record_df], ignore_index=True)
-            st.session_state.df = updated_df
-            
+            submissions.submit(record)
+            if snapshot is not None:
+                # シートに届く前から、書き込み待ちの行を足した版を全セッションに見せる
+                snapshot.republish()
+
             # ★★★ st.successとst.rerunを、st.toastに変更 ★★★
             st.toast(f'{name}さんの記録を追加しました！', icon='🎉')
 
         except Exception as e:
-            st.error(f"書き込み中に予期せぬエラーが発生しました: {e}")
\ No newline at end of file
+            st.error(f"書き込み中に予期せぬエラーが発生しました: {e}")
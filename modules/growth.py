@@ -0,0 +1,53 @@
+# modules/growth.py (全月分の成長率テーブルを一括で作る)
+
+import numpy as np
+import pandas as pd
+
+GROWTH_COLUMNS = ['name', 'start_1rm', 'end_1rm', 'growth', 'growth_pct']
+
+
+def growth_table(best, months):
+    """
+    全種目・全月について、各メンバーの「月初時点のベスト1RM」と「月末時点のベスト1RM」を
+    月内ベスト1RM (AggregateCube.monthly_best の結果、列: exercise, name, month, one_rm) から1回の計算でまとめて求める。
+
+    (種目, メンバー) × 月 の月内ベスト1RMを作り、月方向の累積最大値 (cummax) を取れば
+    「その月末までのベスト」になり、1列ずらせば「その月初より前のベスト」になる。
+    成長した (月末 > 月初) 行だけを残し、(exercise, month) で引けるように並べて返す。
+    月初が0の行は成長率が inf になるので、表示側で除外すること。
+    """
+    months = pd.PeriodIndex(months, freq='M').unique().sort_values().rename('month')
+    if best.empty or months.empty:
+        empty = pd.DataFrame(columns=['exercise', 'month'] + GROWTH_COLUMNS)
+        return empty.set_index(['exercise', 'month'])
+
+    by_month = (
+        best.groupby(['exercise', 'name', 'month'])['one_rm'].max()
+        .unstack('month')
+        .reindex(columns=months)
+    )
+    # 記録の無い月は「それまでのベストのまま」なので0で埋めてから累積最大を取る
+    end_best = by_month.fillna(0).cummax(axis=1)
+    start_best = end_best.shift(1, axis=1).fillna(0)
+
+    end_long = end_best.stack()
+    start_long = start_best.stack()
+    grew = end_long > start_long
+    growth = pd.DataFrame({
+        'start_1rm': start_long[grew],
+        'end_1rm': end_long[grew],
+    })
+    growth['growth'] = growth['end_1rm'] - growth['start_1rm']
+    with np.errstate(divide='ignore'):
+        growth['growth_pct'] = growth['growth'] / growth['start_1rm'] * 100
+    growth = growth.reset_index()
+    growth['month'] = growth['month'].astype(str)
+    return growth.set_index(['exercise', 'month']).sort_index()
+
+
+def growth_for(table, exercise, month):
+    """growth_table の結果から1種目・1ヶ月分を取り出す。該当なしなら空のDataFrame。"""
+    key = (exercise, str(month))
+    if key not in table.index:
+        return pd.DataFrame(columns=GROWTH_COLUMNS)
+    return table.loc[[key], GROWTH_COLUMNS].reset_index(drop=True)
@@ -0,0 +1,28 @@
+# modules/lazy_import.py (重いモジュールを使う時まで読み込まない)
+
+import importlib
+import sys
+import time
+
+from streamlit.logger import get_logger
+
+logger = get_logger(__name__)
+
+# モジュール名 -> このプロセスで最初に読み込んだ時にかかった秒数
+IMPORT_TIMES = {}
+
+
+def import_timed(name):
+    """
+    モジュールを読み込んで返す。読み込み済みならそのまま返し、
+    初めて読み込んだ時はかかった時間を IMPORT_TIMES に記録してログに出す。
+    """
+    module = sys.modules.get(name)
+    if module is not None:
+        return module
+    start = time.perf_counter()
+    module = importlib.import_module(name)
+    elapsed = time.perf_counter() - start
+    IMPORT_TIMES[name] = elapsed
+    logger.info("import %s: %.0f ms", name, elapsed * 1000)
+    return module
@@ -1,5 +1,7 @@
 import streamlit as st
 
+from modules.scoring import bench_target_ratio
+
 def render():
     st.title("(TEST)ベンチプレス目標メニュー自動生成")
 
@@ -10,7 +12,8 @@ def render():
     weight = st.number_input("体重（kg）", min_value=30, max_value=200, value=60)
 
     # 自動計算
-    strength_ratio = 1.2 + (height - 160) * 0.005
+    # 目標は体重比 (ランキングの「体重比」と同じ 1RM÷体重 の考え方、modules/scoring.py)
+    strength_ratio = bench_target_ratio(height)
     target = round(weight * strength_ratio)
 
     # 強調表示（色付きボックス）
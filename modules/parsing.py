@@ -0,0 +1,123 @@
+# modules/parsing.py (「kg-回数」文字列の列指向パースエンジン)
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+# 重量の書き方 (float() が受け付ける範囲)
+_KG = r"\+?(?:\d+(?:\.\d*)?|\.\d+)(?:[eE]\+?\d+)?"
+
+
+def parse_numeric_series(values):
+    """
+    数値の列 (Sheets側で回数だけが入力された列など) の各セルを回数とみなし、
+    (重量のfloat64配列 (すべて0), 回数のint64配列) を返す。
+    int() と同じく切り捨て、NaN・無限大・9桁を超える値は0。
+    """
+    reps = pd.to_numeric(values, errors="coerce").to_numpy(dtype="float64", na_value=np.nan)
+    reps = np.where(np.isfinite(reps) & (np.abs(reps) < 1e9), np.trunc(reps), 0).astype("int64")
+    return np.zeros(len(reps), dtype="float64"), reps
+
+
+# --- 複数セット・表記ゆれに対応した解釈 (parse_sets) ---
+# 1セルに "80-10,85-8,90-5" のように複数セットを書いたり、"80x10" や全角 "８０－１０"、
+# IMEの長音符 "80ー10" で書いたりした入力も読む。正規表現はpyarrow (RE2) で列ごとまとめて処理する
+#   重量と回数の区切り: - ー − ‐ – — x × * (全角も可)
+#   セットの区切り    : , 、 ; / (全角も可)、空白 ("80-10 85-8")。空の区切りや末尾の区切り ("80-10、") は無視する
+#   単位              : 重量の後の "kg"、回数の後の "回" は省略可 ("kg" を書いた時は区切りも省略可: 30kg10回)
+#   セット数          : 回数の後の "x3" / "×3セット" で同じセットを繰り返す ("80x10x3"、"100kg×5回×3セット")
+_DASHES = r"[ー−‐‑–—―]"
+_TIMES = r"[×*]"
+_SEPARATORS = r"[、;/]"
+_SET_COUNT_UNIT = r"(?:セット|sets?)"
+# 1セットの終わり (回数・"回"・セット数) の直後の空白で、次のセットが数字で始まるものはセットの区切りとみなす。
+# "17kg 10回" のようなセットの途中の空白は、前に重量と回数の区切りが無いので区切りにならない
+_SPACE_SEPARATOR = rf"(\d\s*(?:kg\s*[-x]?|[-x])\s*\d+\s*(?:回)?(?:\s*x\s*\d+\s*{_SET_COUNT_UNIT}?)?)\s+([+.\d])"
+
+
+def _set_regex(named):
+    """1セット分の正規表現。named=False の時はグループに名前を付けない (セル全体の検査用)。"""
+    kg, reps, count = ("?P<kg>", "?P<reps>", "?P<count>") if named else ("?:", "?:", "?:")
+    # 回数は9桁まで (int64 に収まらない値で変換が失敗しないように)。セット数は2桁まで
+    return (
+        rf"(?:({kg}{_KG})\s*(?:kg\s*[-x]?|[-x])\s*)?\+?({reps}\d{{1,9}})\s*(?:回)?"
+        rf"(?:\s*x\s*({count}\d{{1,2}})\s*{_SET_COUNT_UNIT}?)?"
+    )
+
+
+# 記録が無いことを表す書き方 (normalize_entry_text の後の形)。空欄と同じに扱い、読めないセルとはみなさない
+NO_RECORD_TEXTS = ("", "なし", "無し", "-", "x")
+
+_SET_PATTERN = rf"^{_set_regex(True)}$"
+_ENTRY_PATTERN = rf"^{_set_regex(False)}(?:\s*,\s*{_set_regex(False)})*$"
+
+
+def normalize_entry_text(values):
+    """
+    入力の表記ゆれを揃えた pyarrow の文字列配列を返す
+    (全角→半角、小文字化、区切り記号の統一、空の区切りと前後の区切り・空白の除去)。
+    空セル (NaN) は空文字になる。
+    """
+    try:
+        arr = pa.array(values, type=pa.string(), from_pandas=True).fill_null("")
+    except (pa.ArrowTypeError, pa.ArrowInvalid):
+        # 文字列以外の値が混ざった列 (数値のセルなど) は1つずつ文字列にする
+        arr = pa.array(values.astype("object").where(values.notna(), "").astype(str), type=pa.string())
+    arr = pc.utf8_normalize(arr, "NFKC")
+    arr = pc.utf8_lower(arr)
+    arr = pc.replace_substring_regex(arr, _DASHES, "-")
+    arr = pc.replace_substring_regex(arr, _TIMES, "x")
+    arr = pc.replace_substring_regex(arr, _SEPARATORS, ",")
+    arr = pc.utf8_trim_whitespace(arr)
+    # 置き換えは重ならない範囲ごとなので、"80-10 85-8 90-5" の区切りも1回で全部置き換わる
+    arr = _replace_where(arr, " ", _SPACE_SEPARATOR, r"\1,\2")
+    arr = _replace_where(arr, ",", r"\s*,[\s,]*", ",")
+    return pc.utf8_trim(arr, ", ")
+
+
+def _replace_where(arr, literal, pattern, replacement):
+    """literal を含む要素 (ほとんどのセルは含まない) だけに正規表現の置き換えをかける。"""
+    mask = pc.match_substring(arr, literal)
+    if not pc.any(mask).as_py():
+        return arr
+    replaced = pc.replace_substring_regex(arr.filter(mask), pattern, replacement)
+    return pc.replace_with_mask(arr, mask, replaced)
+
+
+def is_no_record(values):
+    """Seriesの各セルが「記録なし」(空欄・NO_RECORD_TEXTS) かどうかの bool 配列。"""
+    if len(values) == 0:
+        return np.zeros(0, dtype=bool)
+    text = normalize_entry_text(values)
+    return pc.is_in(text, value_set=pa.array(NO_RECORD_TEXTS)).to_numpy(zero_copy_only=False)
+
+
+def parse_sets(values):
+    """
+    Seriesの各セルを1セット1要素に分解し、(セルの位置, 重量のfloat64配列, 回数のint64配列) を返す。
+    セル全体が書式に合わないセル・空セルは1つもセットを出さない。1セル内のセットは書かれた順に並び、
+    セット数の付いたセット ("80x10x3") はその数だけ繰り返す。
+    処理はすべて列単位 (pyarrow) なので、時間はセル数ではなくセットの総数にほぼ比例する。
+    """
+    if len(values) == 0:
+        return np.zeros(0, dtype="int64"), np.zeros(0, dtype="float64"), np.zeros(0, dtype="int64")
+    if pd.api.types.is_numeric_dtype(values.dtype):
+        kg, reps = parse_numeric_series(values)
+        return np.arange(len(values)), kg, reps
+
+    text = normalize_entry_text(values)
+    valid = pc.match_substring_regex(text, _ENTRY_PATTERN)
+    text = pc.if_else(valid, text, pa.scalar(None, pa.string()))
+    sets = pc.split_pattern_regex(text, r"\s*,\s*")
+    cell = pc.list_parent_indices(sets).to_numpy()
+    parts = pc.extract_regex(pc.list_flatten(sets), _SET_PATTERN)
+    kg = parts.field("kg").to_numpy(zero_copy_only=False)
+    reps = parts.field("reps").to_numpy(zero_copy_only=False)
+    count = parts.field("count").to_numpy(zero_copy_only=False)
+    kg = np.where(kg == "", "0", kg).astype("float64")
+    reps = reps.astype("int64")
+    count = np.where(count == "", "1", count).astype("int64")
+    if (count != 1).any():
+        return np.repeat(cell, count).astype("int64"), np.repeat(kg, count), np.repeat(reps, count)
+    return cell.astype("int64"), kg, reps
@@ -0,0 +1,128 @@
+# modules/perf.py (処理段階ごとの時間計測)
+
+import json
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+import pandas as pd
+from streamlit.logger import get_logger
+
+logger = get_logger(__name__)
+
+# プロセス全体で直近何回分の実行を残すか
+HISTORY_SIZE = 500
+
+_history = deque(maxlen=HISTORY_SIZE)
+_history_lock = threading.Lock()
+# Streamlitはスクリプトの実行ごとに別スレッドを使うので、実行中の記録はスレッドごとに持つ
+_local = threading.local()
+
+
+def start_run(label):
+    """スクリプト1回分の記録を始める。"""
+    _local.run = {
+        'run': label,
+        'started_at': time.time(),
+        'stages': [],
+    }
+    _local.start = time.perf_counter()
+
+
+def finish_run():
+    """記録を閉じて履歴に加え、1行のJSONとしてログに出す (--logger.level=debug で表示)。記録を返す。"""
+    run = getattr(_local, 'run', None)
+    if run is None:
+        return None
+    _local.run = None
+    run['total_ms'] = round((time.perf_counter() - _local.start) * 1000, 3)
+    _append(run)
+    return run
+
+
+def _append(run):
+    with _history_lock:
+        _history.append(run)
+    logger.debug("perf %s", json.dumps(run, ensure_ascii=False, default=str))
+
+
+def record(name, ms, rows=None, cache=None):
+    """
+    段階1つ分の記録を追加する。cache はキャッシュを使えたかどうか ('hit' / 'miss'、関係なければ None)。
+    スクリプトの実行外 (裏で動く同期スレッドなど) から呼ばれた場合は、それだけで1件の記録にする。
+    """
+    entry = {'stage': name, 'ms': round(ms, 3), 'rows': rows, 'cache': cache}
+    run = getattr(_local, 'run', None)
+    if run is not None:
+        run['stages'].append(entry)
+    else:
+        _append({'run': 'background', 'started_at': time.time(), 'stages': [entry], 'total_ms': entry['ms']})
+
+
+@contextmanager
+def stage(name, rows=None, cache=None):
+    """
+    with ブロックの時間を段階 name として記録する。行数やキャッシュの結果が後で分かる場合は、
+    受け取った辞書に書き込む:  with stage("normalize") as s: ...; s['rows'] = len(df)
+    """
+    info = {'rows': rows, 'cache': cache}
+    if not hasattr(_local, 'stack'):
+        _local.stack = []
+    _local.stack.append(info)
+    start = time.perf_counter()
+    try:
+        yield info
+    finally:
+        _local.stack.pop()
+        record(name, (time.perf_counter() - start) * 1000, info['rows'], info['cache'])
+
+
+def mark_miss():
+    """
+    実行中の一番内側の段階を「キャッシュなしで作った」ことにする。
+    st.cache_resource の関数の中で呼べば、外側の with stage(..., cache='hit') が
+    実際に作り直した時だけ 'miss' になる。
+    """
+    stack = getattr(_local, 'stack', None)
+    if stack:
+        stack[-1]['cache'] = 'miss'
+
+
+def history():
+    """記録済みの実行 (古い順) のリスト。"""
+    with _history_lock:
+        return list(_history)
+
+
+def stages_frame(runs):
+    """実行の記録を1段階1行のDataFrameにする。"""
+    rows = [
+        {'run': run['run'], 'started_at': pd.Timestamp(run['started_at'], unit='s'), **entry}
+        for run in runs
+        for entry in run['stages']
+    ]
+    return pd.DataFrame(rows, columns=['run', 'started_at', 'stage', 'ms', 'rows', 'cache'])
+
+
+def summarize(runs):
+    """段階ごとの回数・時間 (平均・p50・p95・最大)・平均行数・キャッシュヒット率。"""
+    df = stages_frame(runs)
+    if df.empty:
+        return pd.DataFrame(columns=['count', 'mean_ms', 'p50_ms', 'p95_ms', 'max_ms', 'mean_rows', 'hit_rate'])
+    grouped = df.groupby('stage')
+    summary = pd.DataFrame({
+        'count': grouped.size(),
+        'mean_ms': grouped['ms'].mean(),
+        'p50_ms': grouped['ms'].median(),
+        'p95_ms': grouped['ms'].quantile(0.95),
+        'max_ms': grouped['ms'].max(),
+        'mean_rows': grouped['rows'].mean(),
+        'hit_rate': df.dropna(subset=['cache']).groupby('stage')['cache'].apply(lambda c: (c == 'hit').mean()),
+    })
+    return summary.sort_values('mean_ms', ascending=False)
+
+
+def to_jsonl(runs):
+    """実行の記録をJSON Lines (1実行1行) にする。"""
+    return "".join(json.dumps(run, ensure_ascii=False, default=str) + "\n" for run in runs)
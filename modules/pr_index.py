@@ -0,0 +1,103 @@
+# modules/pr_index.py (メンバー × 種目 の自己ベスト索引)
+
+import bisect
+
+import pandas as pd
+
+
+class PRIndex:
+    """
+    (メンバー, 種目) ごとに、現在の自己ベスト・それを出した日・自己ベスト更新の履歴を持つ索引。
+
+    build() で記録全体から1度だけ作り、その後は新しい記録1件ごとに update() で更新する。
+    日付順に届く記録なら (メンバー, 種目) あたり O(1) で更新できる。
+    スコアは推定1RM (回数のみの種目は回数)。0以下の値は記録なしとして扱う。
+    """
+
+    def __init__(self, history=None):
+        # exercise -> name -> [(date, score), ...]  日付順、スコアは厳密に増加
+        self._history = history if history is not None else {}
+
+    @classmethod
+    def build(cls, events):
+        """
+        イベントテーブル (modules/events.py、日付順) から索引を作る。
+        (種目, メンバー) ごとの累積最大を超えた行だけが履歴に残る。
+        """
+        rows = events.loc[events['score'] > 0, ['exercise', 'name', 'date', 'score']]
+        history = {}
+        if rows.empty:
+            return cls(history)
+        keys = [rows['exercise'], rows['name']]
+        prev_best = (
+            rows.groupby(keys, observed=True)['score'].cummax()
+            .groupby(keys, observed=True).shift(1)
+            .fillna(0)
+        )
+        events = rows[rows['score'] > prev_best]
+        for ex, name, date, score in zip(events['exercise'], events['name'], events['date'], events['score']):
+            history.setdefault(ex, {}).setdefault(name, []).append((date, float(score)))
+        return cls(history)
+
+    def copy(self):
+        """
+        共有中の索引を変えずに新しい版を作るためのコピー。
+        辞書だけを複製し、履歴リストは update() が差し替えるまで元の索引と共有する。
+        """
+        return PRIndex({ex: dict(by_name) for ex, by_name in self._history.items()})
+
+    def update(self, name, date, exercise, score):
+        """
+        記録1件を反映する。自己ベストを更新したら True を返す。
+        過去の日付の記録が後から届いた場合は、その (メンバー, 種目) の履歴だけを組み直す。
+        """
+        if not score or score <= 0 or pd.isna(date):
+            return False
+        score = float(score)
+        by_name = self._history.setdefault(exercise, {})
+        events = by_name.get(name, [])
+        if not events or date >= events[-1][0]:
+            if events and score <= events[-1][1]:
+                return False
+            # リストは copy() 元と共有している可能性があるので、書き換えずに差し替える
+            by_name[name] = events + [(date, score)]
+            return True
+
+        # 日付が前後した場合: 挿入してから「それまでの最大を超えたものだけ」を残す
+        pos = bisect.bisect_right([d for d, _ in events], date)
+        if pos > 0 and score <= events[pos - 1][1]:
+            return False
+        rebuilt, best = [], 0.0
+        for d, s in events[:pos] + [(date, score)] + events[pos:]:
+            if s > best:
+                rebuilt.append((d, s))
+                best = s
+        by_name[name] = rebuilt
+        return True
+
+    def update_from(self, events):
+        """イベントテーブルの追加分 (日付順) を1行ずつ反映する。"""
+        rows = events.loc[events['score'] > 0]
+        for ex, name, date, score in zip(rows['exercise'], rows['name'], rows['date'], rows['score']):
+            self.update(name, date, ex, score)
+
+    def best(self, name, exercise):
+        """(スコア, 日付) を返す。記録が無ければ None。"""
+        events = self._history.get(exercise, {}).get(name)
+        if not events:
+            return None
+        date, score = events[-1]
+        return score, date
+
+    def history(self, name, exercise):
+        """自己ベスト更新の履歴 [(日付, スコア), ...] (古い順)。"""
+        return list(self._history.get(exercise, {}).get(name, []))
+
+    def ranking(self, exercise):
+        """種目の自己ベストをメンバーごとに並べたDataFrame (name, best, date)。スコアの高い順。"""
+        records = [
+            (name, events[-1][1], events[-1][0])
+            for name, events in self._history.get(exercise, {}).items()
+        ]
+        table = pd.DataFrame(records, columns=['name', 'best', 'date'])
+        return table.sort_values(['best', 'name'], ascending=[False, True], kind='stable').reset_index(drop=True)
@@ -3,84 +3,144 @@
 import streamlit as st
 import pandas as pd
 import numpy as np  # numpyをインポート
-from datetime import datetime
 from dateutil.relativedelta import relativedelta
 
-# --- ヘルパー関数 (変更なし) ---
-def parse_kg_count(value):
-    if isinstance(value, str) and '-' in value:
-        try:
-            kg, rep = value.split('-')
-            return float(kg), int(rep)
-        except:
-            return 0.0, 0
-    try:
-        return 0.0, int(value)
-    except:
-        return 0.0, 0
-
-def estimate_1rm(weight, reps):
-    if reps == 0 or weight == 0:
-        return 0.0
-    return weight * (1 + reps / 40)
+from modules.cube import ALL_EXERCISES
+from modules.exercises import EXERCISE_LABELS, ONE_RM_EXERCISES
+from modules import perf
+from modules.export import EXPORT_FORMATS, build_export
+from modules.scoring import DEFAULT_FORMULA, FORMULAS, metric_label
+from modules.window_index import add_percentile
+
+# この日数以内に出た自己ベストを「新記録」として表示する
+NEW_PR_DAYS = 7
+
+# 1RMランキングの期間の選択肢
+RANKING_WINDOWS = {'all': "全期間", '30d': "直近30日", 'semester': "今学期", 'custom': "期間を指定"}
+
+
+def semester_bounds(today):
+    """today を含む学期 (前期: 4/1〜9/30、後期: 10/1〜3/31) の初日と最終日。"""
+    if 4 <= today.month <= 9:
+        return pd.Timestamp(today.year, 4, 1), pd.Timestamp(today.year, 9, 30)
+    year = today.year if today.month >= 10 else today.year - 1
+    return pd.Timestamp(year, 10, 1), pd.Timestamp(year + 1, 3, 31)
 
 
 # --- メイン関数 ---
-def run(df_original):
+def run(dataset):
     st.title("🏆 ランキング")
     st.markdown("---")
 
-    if df_original is None or df_original.empty:
+    if dataset is None or dataset.raw.empty:
         st.warning("表示できる記録がありません。")
         return
 
-    # --- データ前処理 (共通部分) ---
-    df = df_original.copy()
-    df = df.rename(columns={'記入者名': 'name', '記録日': 'date'})
-    for col in df.columns:
-        if 'kg' in col or '回数' in col:
-            new_col_name = col.replace('(kg × 回数)', '').replace('(回数)', '').strip()
-            df = df.rename(columns={col: new_col_name})
-    df['date'] = pd.to_datetime(df['date'], errors='coerce')
-    df.dropna(subset=['date'], inplace=True)
-    
-    exercise_cols = [
-        'ベンチプレス', 'デッドリフト', 'スクワット', 'ラットプルダウン',
-        'マシンショルダープレス', 'レッグプレス', '45°レッグプレス'
-    ]
-    for col in exercise_cols:
-        if col in df.columns:
-            df[col] = df[col].fillna('0-0')
-            df[[f"{col}_kg", f"{col}_reps"]] = df[col].astype(str).apply(lambda x: pd.Series(parse_kg_count(x)))
-            df[f"{col}_1rm"] = df.apply(lambda row: estimate_1rm(row[f"{col}_kg"], row[f"{col}_reps"]), axis=1)
+    # 正規化済みの共有データ (modules/dataset.py)。書き換えずに集計だけ行う
+    if dataset.empty:
+        st.warning("有効な日付の記録がありません。")
+        return
+    # ランキング対象は重量のある種目のみ (懸垂は除く)
+    exercise_cols = ONE_RM_EXERCISES
 
     # --- タブによる機能切り替え ---
-    tab1, tab2 = st.tabs(["💪 1RMランキング", "📈 成長率ランキング"])
+    tab1, tab2, tab3 = st.tabs(["💪 1RMランキング", "📈 成長率ランキング", "📅 練習日数ランキング"])
 
     # --- 1RMランキングタブ ---
     with tab1:
         st.subheader("種目別 自己ベスト(1RM)ランキング")
-        selected_exercise_1rm = st.selectbox("種目を選択", exercise_cols, key="1rm_select")
-        
-        if selected_exercise_1rm and f"{selected_exercise_1rm}_1rm" in df.columns:
-            pr_ranking = df.groupby('name')[f'{selected_exercise_1rm}_1rm'].max()
-            pr_ranking = pr_ranking[pr_ranking > 0].sort_values(ascending=False).reset_index()
+        col1, col2 = st.columns(2)
+        with col1:
+            selected_exercise_1rm = st.selectbox(
+                "種目を選択", exercise_cols, format_func=EXERCISE_LABELS.get, key="1rm_select"
+            )
+        with col2:
+            window = st.selectbox("期間", list(RANKING_WINDOWS), format_func=RANKING_WINDOWS.get, key="1rm_window")
+        # 推定1RMの式と体重比 (modules/scoring.py)。値は取り込み時に全部の式の分を作ってある
+        col1, col2 = st.columns([2, 1])
+        with col1:
+            formula = st.selectbox("推定1RMの計算式", list(FORMULAS), format_func=FORMULAS.get, key="1rm_formula")
+        with col2:
+            relative = st.checkbox("体重比で比べる", key="1rm_relative", help="フォームで体重を記録したメンバーのみ")
+
+        # 記録日は日本時間の日付なので、サーバーの時刻 (UTC) ではなく日本時間の今日で区切る
+        today = pd.Timestamp.now(tz="Asia/Tokyo").tz_localize(None).normalize()
+        window_start, window_end = None, None
+        if window == '30d':
+            window_start, window_end = today - pd.Timedelta(days=29), today
+        elif window == 'semester':
+            window_start, window_end = semester_bounds(today)
+        elif window == 'custom':
+            first_date, last_date = dataset.date_range()
+            period = st.date_input("記録日", [first_date, last_date], key="1rm_period")
+            if len(period) == 2:
+                window_start, window_end = period
+
+        if selected_exercise_1rm:
+            # 全期間は自己ベスト索引、期間を指定した時は日付順の索引 (またはSQLiteの集計クエリ) から引くだけで、記録全体は走査しない
+            with perf.stage('pr_ranking') as timing:
+                if window_start is None and formula == DEFAULT_FORMULA and not relative:
+                    pr_ranking = add_percentile(dataset.ranking(selected_exercise_1rm))
+                else:
+                    pr_ranking = dataset.leaderboard(
+                        selected_exercise_1rm, window_start, window_end, formula=formula, relative=relative
+                    )
+                timing['rows'] = len(pr_ranking)
             pr_ranking.index = pr_ranking.index + 1
-            pr_ranking.rename(columns={'name': '名前', f'{selected_exercise_1rm}_1rm': '推定1RM (kg)'}, inplace=True)
-            
-            st.markdown(f"#### {selected_exercise_1rm} トップ10")
-            for index, row in pr_ranking.head(10).iterrows():
-                cols = st.columns([1, 4, 2])
-                rank_str = f"**{index}位**"
-                if index == 1: rank_str = f"🥇 {rank_str}"
-                elif index == 2: rank_str = f"🥈 {rank_str}"
-                elif index == 3: rank_str = f"🥉 {rank_str}"
-                cols[0].markdown(rank_str)
-                cols[1].markdown(f"**{row['名前']}**")
-                cols[2].markdown(f"**{row['推定1RM (kg)']:.1f} kg**")
-            
-            with st.expander("全ランキングを表示"):
-                st.dataframe(pr_ranking, use_container_width=True)
+            score_col = metric_label(relative)
+            pr_ranking.rename(
+                columns={'name': '名前', 'best': score_col, 'date': '達成日', 'percentile': 'パーセンタイル'},
+                inplace=True,
+            )
+            # 体重比は倍率 (1.25 倍)、それ以外は kg で表示する
+            format_score = (lambda v: f"{v:.2f} 倍") if relative else (lambda v: f"{v:.1f} kg")
+            # 直近1週間に出た自己ベストには NEW バッジを付ける。期間・式を選んだ時の達成日はその中でのベストの日なので、
+            # 全期間の自己ベスト (自己ベスト索引) の日と同じ行だけに付ける
+            new_pr_since = today - pd.Timedelta(days=NEW_PR_DAYS)
+            all_time = dataset.ranking(selected_exercise_1rm)
+            pr_dates = dict(zip(all_time['name'], all_time['date']))
+
+            if pr_ranking.empty and relative:
+                st.info("体重の分かる記録がありません。フォームで体重を入力すると、体重比で比べられます。")
+            elif pr_ranking.empty:
+                st.info(f"この期間の{EXERCISE_LABELS[selected_exercise_1rm]}の記録はありません。")
+            else:
+                st.markdown(f"#### {EXERCISE_LABELS[selected_exercise_1rm]} トップ10")
+                for index, row in pr_ranking.head(10).iterrows():
+                    cols = st.columns([1, 4, 2])
+                    rank_str = f"**{index}位**"
+                    if index == 1: rank_str = f"🥇 {rank_str}"
+                    elif index == 2: rank_str = f"🥈 {rank_str}"
+                    elif index == 3: rank_str = f"🥉 {rank_str}"
+                    cols[0].markdown(rank_str)
+                    pr_date = pr_dates.get(row['名前'])
+                    is_new = pr_date is not None and pr_date >= new_pr_since and row['達成日'] == pr_date
+                    badge = " 🆕" if is_new else ""
+                    cols[1].markdown(f"**{row['名前']}**{badge}")
+                    cols[2].markdown(f"**{format_score(row[score_col])}**")
+
+                # メンバーを選ぶと、サークル内での位置 (順位とパーセンタイル) を表示する
+                member = st.selectbox(
+                    "メンバーの位置を見る", [None] + pr_ranking['名前'].tolist(),
+                    format_func=lambda name: "選択してください" if name is None else name, key="1rm_member"
+                )
+                if member is not None:
+                    rank = pr_ranking.index[pr_ranking['名前'] == member][0]
+                    row = pr_ranking.loc[rank]
+                    st.metric(
+                        member, f"{rank}位 / {len(pr_ranking)}人",
+                        help=f"{score_col} {format_score(row[score_col])}、パーセンタイル {row['パーセンタイル']:.0f}",
+                    )
+
+                with st.expander("全ランキングを表示"):
+                    st.dataframe(
+                        pr_ranking,
+                        column_config={
+                            "達成日": st.column_config.DateColumn(format="YYYY-MM-DD"),
+                            "パーセンタイル": st.column_config.NumberColumn(format="%.0f"),
+                        },
+                        use_container_width=True
+                    )
 
     # --- 成長率ランキングタブ (新機能) ---
     with tab2:
@@ -88,49 +148,32 @@ def run(df_original):
         col1, col2 = st.columns(2)
         
         with col1:
-            # 1. 月の選択肢を生成
-            #months = df['date'].dt.to_period('M').unique().sort_values(ascending=False).astype(str)
-            months = df['date'].dt.to_period('M').drop_duplicates().sort_values(ascending=False).astype(str)
+            # 1. 月の選択肢 (記録のある月、新しい順)
+            months = dataset.months
             selected_month_str = st.selectbox("対象月を選択", months)
         
         with col2:
-            selected_exercise_growth = st.selectbox("種目を選択", exercise_cols, key="growth_select")
+            selected_exercise_growth = st.selectbox(
+                "種目を選択", exercise_cols, format_func=EXERCISE_LABELS.get, key="growth_select"
+            )
         
         if selected_month_str and selected_exercise_growth:
-            # 2. 選択された月の開始日と終了日を定義
-            start_of_month = pd.to_datetime(selected_month_str + "-01")
-            end_of_month = start_of_month + pd.offsets.MonthEnd(1)
-
-            # 3. 各ユーザーの月初と月末のベスト1RMを計算
-            growth_data = []
-            users = df['name'].unique()
+            # 2. 全月分を前計算した成長率テーブルから、選択された月・種目の行を引く
+            with perf.stage('growth_ranking') as timing:
+                growth_ranking = dataset.growth_for(selected_exercise_growth, selected_month_str)
+                timing['rows'] = len(growth_ranking)
             
-            for user in users:
-                user_df = df[(df['name'] == user) & (df[f'{selected_exercise_growth}_1rm'] > 0)]
-                
-                # 月初時点でのベスト1RM
-                start_df = user_df[user_df['date'] < start_of_month]
-                start_1rm = start_df[f'{selected_exercise_growth}_1rm'].max() if not start_df.empty else 0
-                
-                # 月末時点でのベスト1RM
-                end_df = user_df[user_df['date'] <= end_of_month]
-                end_1rm = end_df[f'{selected_exercise_growth}_1rm'].max() if not end_df.empty else 0
-
-                # 成長があった場合のみリストに追加
-                if end_1rm > start_1rm:
-                    growth_data.append({
-                        "名前": user,
-                        "月初1RM (kg)": start_1rm,
-                        "月末1RM (kg)": end_1rm,
-                        "成長(kg)": end_1rm - start_1rm
-                    })
-            
-            if not growth_data:
-                st.info(f"{selected_month_str}月は、{selected_exercise_growth}で成長したメンバーの記録がありません。")
+            if growth_ranking.empty:
+                st.info(f"{selected_month_str}月は、{EXERCISE_LABELS[selected_exercise_growth]}で成長したメンバーの記録がありません。")
             else:
-                # 4. 成長量でランキングを作成
-                growth_ranking = pd.DataFrame(growth_data)
-                growth_ranking['成長率(%)'] = (growth_ranking['成長(kg)'] / growth_ranking['月初1RM (kg)']) * 100
+                # 3. 成長量でランキングを作成
+                growth_ranking = growth_ranking.rename(columns={
+                    'name': "名前",
+                    'start_1rm': "月初1RM (kg)",
+                    'end_1rm': "月末1RM (kg)",
+                    'growth': "成長(kg)",
+                    'growth_pct': '成長率(%)',
+                })
                 
                 # ★★★ +inf% (無限大) や -inf% になった行を削除する処理を追加 ★★★
                 growth_ranking.replace([np.inf, -np.inf], np.nan, inplace=True)
@@ -146,7 +189,7 @@ def run(df_original):
 
 
                 # --- ↓↓↓ トップ10をスタイリッシュに表示する処理を追加 ↓↓↓ ---
-                    st.markdown(f"#### {selected_month_str}月 {selected_exercise_growth} 成長トップ10")
+                    st.markdown(f"#### {selected_month_str}月 {EXERCISE_LABELS[selected_exercise_growth]} 成長トップ10")
                     for index, row in growth_ranking.head(10).iterrows():
                         cols = st.columns([1, 3, 3])
                         rank_str = f"**{index}位**"
@@ -180,21 +223,101 @@ def run(df_original):
                             },
                             use_container_width=True
                         )
+    # --- 練習日数ランキングタブ ---
+    with tab3:
+        st.subheader("月間 練習日数ランキング")
+        selected_month_freq = st.selectbox("対象月を選択", dataset.months, key="freq_month")
+
+        if selected_month_freq:
+            # 集計キューブ (modules/cube.py) の全種目・月ごとのセルを引くだけで、記録全体は走査しない
+            month_start = pd.Period(selected_month_freq, freq='M').start_time
+            with perf.stage('frequency_ranking') as timing:
+                freq_ranking = dataset.trend('M', ALL_EXERCISES, start=month_start, end=month_start)
+                timing['rows'] = len(freq_ranking)
+            freq_ranking = (
+                freq_ranking.sort_values(['sessions', 'tonnage'], ascending=False)[
+                    ['name', 'sessions', 'frequency', 'sets', 'tonnage']
+                ]
+                .rename(columns={
+                    'name': "名前",
+                    'sessions': "練習日数",
+                    'frequency': "週あたり日数",
+                    'sets': "セット数",
+                    'tonnage': "総挙上量 (kg)",
+                })
+                .reset_index(drop=True)
+            )
+            freq_ranking.index = freq_ranking.index + 1
+
+            if freq_ranking.empty:
+                st.info(f"{selected_month_freq}月の記録はありません。")
+            else:
+                st.markdown(f"#### {selected_month_freq}月 練習日数トップ10")
+                for index, row in freq_ranking.head(10).iterrows():
+                    cols = st.columns([1, 3, 3])
+                    rank_str = f"**{index}位**"
+                    if index == 1: rank_str = f"🥇 {rank_str}"
+                    elif index == 2: rank_str = f"🥈 {rank_str}"
+                    elif index == 3: rank_str = f"🥉 {rank_str}"
+                    cols[0].markdown(rank_str)
+                    cols[1].markdown(f"**{row['名前']}**")
+                    cols[2].markdown(
+                        f"**{row['練習日数']:.0f} 日** <small>(週 {row['週あたり日数']:.1f} 日)</small>",
+                        unsafe_allow_html=True,
+                    )
+
+                with st.expander("全メンバーを表示"):
+                    st.dataframe(
+                        freq_ranking,
+                        column_config={
+                            "練習日数": st.column_config.NumberColumn(format="%d"),
+                            "週あたり日数": st.column_config.NumberColumn(format="%.1f"),
+                            "セット数": st.column_config.NumberColumn(format="%d"),
+                            "総挙上量 (kg)": st.column_config.NumberColumn(format="%.0f"),
+                        },
+                        use_container_width=True
+                    )
+
     # --- ↓↓↓ この部分が追加されました ↓↓↓ ---
     st.markdown("---")
     st.subheader("📊 データ管理")
     st.info("アプリのコードを更新（git push）する前など、定期的に全記録をダウンロードしてバックアップすることを推奨します。")
 
-    # オリジナルの全データ(df_original)をCSV形式に変換
-    # BOM付きUTF-8でエンコードすることで、Excelで開いた際の文字化けを防ぐ
-    csv_data = df_original.to_csv(index=False).encode('utf-8-sig')
-
-    st.download_button(
-        label="📈 全トレーニング記録をダウンロード (CSV)",
-        data=csv_data,
-        file_name=f"training_log_backup_{datetime.now().strftime('%Y%m%d')}.csv",
-        mime='text/csv',
-        help="サーバーに保存されている最新の全トレーニング記録をCSVファイルとしてダウンロードします。",
-        type='primary'  # ★★★ この行を追加 ★★★
-    )    
-                        
\ No newline at end of file
+    # ファイルは「作成」ボタンが押された時にだけ作り、(データのバージョン, 形式, 絞り込み) ごとに使い回す (modules/export.py)
+    col1, col2 = st.columns(2)
+    with col1:
+        export_format = st.selectbox(
+            "形式", list(EXPORT_FORMATS), format_func=lambda f: EXPORT_FORMATS[f][0], key="export_format"
+        )
+    with col2:
+        export_filtered = st.checkbox("メンバー・期間で絞り込む", key="export_filtered")
+
+    members, start, end = None, None, None
+    if export_filtered:
+        col1, col2 = st.columns(2)
+        with col1:
+            # 誰も選ばなければ全員
+            members = tuple(st.multiselect("記入者", dataset.members, key="export_members")) or None
+        with col2:
+            first_date, last_date = dataset.date_range()
+            period = st.date_input("記録日", [first_date, last_date], key="export_period")
+            if len(period) == 2:
+                start, end = period
+
+    request = (dataset.version, export_format, members, start, end)
+    if st.button("📦 ダウンロード用ファイルを作成", key="export_build"):
+        st.session_state.export_request = request
+
+    # 条件を変えたら、作り直すまでダウンロードボタンは出さない
+    if st.session_state.get("export_request") == request:
+        label, mime, extension = EXPORT_FORMATS[export_format]
+        with perf.stage('export', rows=len(dataset.raw), cache='hit'):
+            export_data = build_export(*request, dataset.raw)
+        st.download_button(
+            label=f"📈 トレーニング記録をダウンロード ({label})",
+            data=export_data,
+            file_name=f"training_log_backup_{pd.Timestamp.now(tz='Asia/Tokyo'):%Y%m%d}.{extension}",
+            mime=mime,
+            help="サーバーに保存されている最新のトレーニング記録をファイルとしてダウンロードします。",
+            type='primary'  # ★★★ この行を追加 ★★★
+        )
@@ -0,0 +1,78 @@
+# modules/scoring.py (推定1RMの計算式と体重比のスコア)
+
+import numpy as np
+
+# 推定1RMの計算式 (id → 表示名)。イベントテーブルには取り込み時に全部の式の列を作っておき、
+# トラッカー・ランキングでは列を選ぶだけにする (表示のたびに計算し直さない)
+FORMULAS = {
+    'current': "標準 (重量×(1+回数/40))",
+    'epley': "Epley (重量×(1+回数/30))",
+    'brzycki': "Brzycki (重量×36/(37-回数)、12回まで)",
+    'lombardi': "Lombardi (重量×回数^0.1)",
+}
+DEFAULT_FORMULA = 'current'
+
+# 回答シートの体重の列 (任意)。フォームに質問を足すと、体重比のスコアが使えるようになる
+BODYWEIGHT_COLUMN = "体重(kg)"
+
+# 式ごとのイベントテーブルの列名 (標準の式はこれまで通り one_rm)
+ONE_RM_COLUMNS = {f: 'one_rm' if f == DEFAULT_FORMULA else f'one_rm_{f}' for f in FORMULAS}
+
+# Brzycki の式は回数が増えると急に大きくなる (30回で重量の約5倍、36回で36倍) ので、
+# 推定の当てになる範囲 (低〜中回数) だけを使い、それより多い回数のセットは推定しない (0にする)
+BRZYCKI_MAX_REPS = 12
+
+
+def estimate_one_rm(kg, reps, formula=DEFAULT_FORMULA):
+    """
+    重量・回数の配列から推定1RMを一括で計算する。
+    重量か回数が0 (回数のみの記録・解釈できなかったセル) の要素と、式が使えない範囲の要素は0。
+    """
+    kg = np.asarray(kg, dtype="float64")
+    reps = np.asarray(reps, dtype="float64")
+    valid = (kg != 0) & (reps != 0)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        if formula == 'current':
+            one_rm = kg * (1 + reps / 40)
+        elif formula == 'epley':
+            one_rm = kg * (1 + reps / 30)
+        elif formula == 'brzycki':
+            one_rm = kg * 36 / (37 - reps)
+            valid &= reps <= BRZYCKI_MAX_REPS
+        elif formula == 'lombardi':
+            one_rm = kg * np.power(reps, 0.10)
+        else:
+            raise ValueError(f"unknown 1RM formula: {formula}")
+    return np.where(valid, one_rm, 0.0)
+
+
+def one_rm_columns(kg, reps):
+    """全部の式の推定1RMを {列名: float64配列} で返す。"""
+    return {ONE_RM_COLUMNS[f]: estimate_one_rm(kg, reps, f) for f in FORMULAS}
+
+
+def relative_to_bodyweight(values, bodyweight):
+    """体重比 (推定1RM ÷ 体重)。体重が分からない (NaN・0以下) 要素は0。"""
+    values = np.asarray(values, dtype="float64")
+    bodyweight = np.asarray(bodyweight, dtype="float64")
+    valid = np.isfinite(bodyweight) & (bodyweight > 0)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(valid, values / bodyweight, 0.0)
+
+
+def metric_values(events, formula=DEFAULT_FORMULA, relative=False):
+    """イベントテーブル (または同じ列を持つ絞り込み結果) から、選んだ式・体重比のスコアの配列を取り出す。"""
+    values = events[ONE_RM_COLUMNS[formula]].to_numpy(dtype="float64")
+    if relative:
+        return relative_to_bodyweight(values, events['bodyweight'].to_numpy(dtype="float64"))
+    return values
+
+
+def metric_label(relative=False):
+    """スコアの表示名 (グラフの軸・表の列名)。"""
+    return "体重比 (1RM÷体重)" if relative else "推定1RM (kg)"
+
+
+def bench_target_ratio(height_cm):
+    """身長から決める、ベンチプレスの目標の体重比 (modules/menu_gen.py)。"""
+    return 1.2 + (height_cm - 160) * 0.005
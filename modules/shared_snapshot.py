@@ -0,0 +1,165 @@
+# modules/shared_snapshot.py (プロセス全体で共有する最新スナップショットと、それを取り直す裏のスレッド)
+
+import random
+import threading
+import time
+
+from streamlit.logger import get_logger
+
+from modules import perf
+
+logger = get_logger(__name__)
+
+
+class SharedSnapshot:
+    """
+    1つのデータソースについて、全セッションで共有する最新のDataset (読み取り専用・バージョン付き) を持つ。
+    セッション側はDataFrameを持たず、毎回の再実行で current() を呼んでその時点の版を受け取るだけにする。
+    そのためメモリは訪問者数ではなく、保持している版の数だけ増える。
+
+    シートの取得はプロセスに1つの Refresher スレッドが interval 秒ごとに行い、
+    作り終えた版を参照の差し替えだけで公開する。セッションはネットワークを待たず、
+    常に最後に完成した版を受け取る (起動直後でまだ版が無い時だけ、最初の取得を待つ)。
+    取得に失敗した場合は last_error に残し、最後に取得できた版を返し続ける。
+
+    warm_start を渡すと、最初の取得の前にネットワークを使わずに用意できる生データ
+    (ローカルに保存したスナップショットなど) で版を作り、すぐに表示できるようにする。
+    overlay を渡すと、取得した生データに手を加えてから版を作る (シートへの書き込み待ちの行を足すなど)。
+    overlay は (生データ, 取得を始めた時刻 time.monotonic()) を受け取る。ローカルの値の時は時刻が None。
+    overlay の結果が変わった時は republish() でシートを読み直さずに版を作り直せる。
+    """
+
+    def __init__(self, fetch, build, interval=60, overlay=None, warm_start=None, refresher=None):
+        self._fetch = fetch  # () -> 生データのDataFrame
+        self._build = build  # 生データ -> Dataset
+        self._overlay = overlay  # (生データ, 取得を始めた時刻) -> 生データ
+        self._warm_start = warm_start  # () -> 生データ、無ければ None
+        self.interval = interval
+        self._refresher = refresher or REFRESHER
+        self._start_lock = threading.Lock()
+        self._started = False
+        self._fetch_lock = threading.Lock()  # 取得は同時に1つだけ
+        self._publish_lock = threading.Lock()  # 版の作り直しと差し替え (ネットワークは使わない)
+        self._ready = threading.Event()  # 最初の取得が終わった (成功・失敗とも)
+        self._current = None
+        self._raw = None  # 最後に取得できた生データ (overlay をかける前)
+        self._fetched_at = None  # self._raw の取得を始めた時刻 (ローカルの値なら None)
+        self.published_at = None  # 最後に版を差し替えた時刻 (time.time())
+        self.last_error = None
+
+    def current(self, wait=30):
+        """
+        最新のDatasetを返す。ネットワークは待たない。
+        まだ版が無い時だけ、最初の取得を最大 wait 秒待つ。それでも無ければ None。
+        """
+        self._start()
+        if self._current is None:
+            with perf.stage('snapshot', cache='miss'):
+                self._ready.wait(wait)
+        else:
+            perf.record('snapshot', 0.0, cache='hit')
+        return self._current
+
+    def _start(self):
+        """最初の呼び出しで、ローカルの値から版を作り、Refresher に登録する。"""
+        if self._started:
+            return
+        with self._start_lock:
+            if self._started:
+                return
+            if self._warm_start is not None:
+                try:
+                    raw = self._warm_start()
+                    if raw is not None:
+                        with perf.stage('snapshot_warm_start', rows=len(raw)):
+                            self._swap(raw)
+                except Exception as e:
+                    logger.warning("warm start failed: %s", e)
+            self._refresher.register(self)
+            self._started = True
+
+    def refresh(self):
+        """データソースから取り直して版を差し替える。Refresher のスレッドから呼ばれる。"""
+        if not self._fetch_lock.acquire(blocking=False):
+            return  # 別のスレッドが取得中
+        try:
+            with perf.stage('snapshot_refresh') as timing:
+                started = time.monotonic()
+                raw = self._fetch()
+                self._swap(raw, started)
+                timing['rows'] = len(raw)
+            self.last_error = None
+        except Exception as e:
+            self.last_error = e
+            logger.warning("snapshot refresh failed: %s", e)
+        finally:
+            self._fetch_lock.release()
+            self._ready.set()
+
+    def republish(self):
+        """最後に取得した生データから版を作り直す (シートは読まない)。まだ値が無ければ何もしない。"""
+        if self._raw is not None:
+            with perf.stage('snapshot_republish'):
+                self._swap(self._raw, self._fetched_at)
+        return self._current
+
+    def _swap(self, raw, fetched_at=None):
+        with self._publish_lock:
+            dataset = self._build(self._overlay(raw, fetched_at) if self._overlay is not None else raw)
+            # 読む側はロックを取らないので、版と生データは参照の代入1回ずつで差し替える
+            self._raw = raw
+            self._fetched_at = fetched_at
+            self._current = dataset
+            self.published_at = time.time()
+
+
+class Refresher:
+    """
+    プロセスに1つのスレッドで、登録された全スナップショットを順に取り直す。
+    取り直しの時刻は interval に ±jitter の揺らぎを加えて決めるので、
+    複数のサークルや複数のプロセスの取得が同じ瞬間に重ならない。
+    """
+
+    def __init__(self, jitter=0.1):
+        self.jitter = jitter
+        self._due = {}  # SharedSnapshot -> 次に取り直す時刻 (time.monotonic())
+        self._cond = threading.Condition()
+        self._thread = None
+
+    def register(self, snapshot):
+        """スナップショットを登録し、すぐに1回目の取得を始める。"""
+        with self._cond:
+            self._due.setdefault(snapshot, time.monotonic())
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="snapshot-refresher", daemon=True)
+                self._thread.start()
+            self._cond.notify()
+
+    def poke(self, snapshot):
+        """次の周期を待たずに取り直させる。"""
+        with self._cond:
+            if snapshot in self._due:
+                self._due[snapshot] = time.monotonic()
+                self._cond.notify()
+
+    def _next_time(self, snapshot):
+        return time.monotonic() + snapshot.interval * random.uniform(1 - self.jitter, 1 + self.jitter)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                now = time.monotonic()
+                due = [s for s, at in self._due.items() if at <= now]
+                if not due:
+                    self._cond.wait(min(self._due.values()) - now)
+                    continue
+            for snapshot in due:
+                snapshot.refresh()
+                with self._cond:
+                    # 取得中に poke された場合は、その時刻を優先する
+                    if self._due[snapshot] <= now:
+                        self._due[snapshot] = self._next_time(snapshot)
+
+
+# プロセスに1つの取り直し用スレッド (最初に登録された時に起動する)
+REFRESHER = Refresher()
@@ -0,0 +1,167 @@
+# modules/sheet_sync.py (フォーム回答シートの差分同期)
+
+import threading
+import time
+import zlib
+
+import numpy as np
+import pandas as pd
+
+from modules import perf
+
+# 新しい行を取りに行く範囲の右端の列 (Sheetsの最大列)。値は右端の空セルが省かれて返る
+_LAST_COL = "ZZZ"
+
+
+def _checksum(row):
+    """1行分の値から安価なチェックサムを作る。"""
+    return zlib.crc32("\x1f".join(map(str, row)).encode("utf-8"))
+
+
+def _trim(row):
+    """Sheets APIは右端の空セルを省いて返すので、比較用に末尾の空文字を落とす。"""
+    row = list(row)
+    while row and row[-1] == "":
+        row.pop()
+    return row
+
+
+class SheetSync:
+    """
+    フォームの回答シートを差分で同期する。
+
+    フォームの回答は末尾に追記されていくだけなので、通常は
+    「ヘッダー行」「前回取り込んだ最後の行」「それ以降の新しい行」を
+    1回の batch_get でまとめて取得し、新しい行だけをメモリ上のスナップショットに追加する。
+    ヘッダー行か前回の最後の行のチェックサムが変わっていたら (列の追加や行の削除・編集)、
+    シート全体を読み直す。途中の行だけが編集された場合は検出できないので、
+    full_reload_interval 秒ごとに全体の読み直しも行う。
+
+    store (SnapshotStore) を渡すと、起動時にローカルの前回スナップショットから
+    すぐに値を復元し、同期で内容が変わるたびに保存し直す。
+    """
+
+    def __init__(self, open_worksheet, full_reload_interval=30 * 60, store=None):
+        self._open_worksheet = open_worksheet
+        self._worksheet = None
+        self.full_reload_interval = full_reload_interval
+        self._store = store
+        self._lock = threading.Lock()
+        self._header = None
+        self._rows = []
+        self._header_sum = None
+        self._last_row_sum = None
+        self._last_full_reload = None
+        self._changed = False
+        self.last_error = None
+
+        saved = store.load() if store is not None else None
+        if saved is not None:
+            # 復元した値で表示だけはすぐにできるようにする。
+            # _last_full_reload は None のままなので、最初の同期ではシート全体と突き合わせる
+            header, rows = saved
+            self._header = header
+            self._header_sum = _checksum(header)
+            self._last_row_sum = _checksum(header)
+            self._append(rows)
+
+    @property
+    def has_data(self):
+        """表示できる値を持っているか (シートから取得済み、またはローカルから復元済み)。"""
+        return self._header is not None
+
+    @property
+    def header(self):
+        """取り込み済みのヘッダー行 (末尾の空欄は除く)。まだ無ければ None。"""
+        return self._header
+
+    def _ws(self):
+        if self._worksheet is None:
+            self._worksheet = self._open_worksheet()
+        return self._worksheet
+
+    def sync(self):
+        """シートと同期し、現在のスナップショットをDataFrameで返す。"""
+        with self._lock:
+            self._changed = False
+            try:
+                self._sync()
+            except Exception as e:
+                # 接続が切れている可能性があるので、次回はワークシートを開き直す。
+                # 取り込み済みの値は変更前に例外になるので、最後の正常な状態が残る
+                self._worksheet = None
+                self.last_error = e
+                raise
+            self.last_error = None
+            if self._store is not None and self._changed:
+                self._store.save(self._header, self._rows)
+            return self.to_dataframe()
+
+    def snapshot(self):
+        """ネットワークに触れず、現在持っている値をDataFrameで返す。"""
+        with self._lock:
+            return self.to_dataframe()
+
+    def _sync(self):
+        due = (
+            self._last_full_reload is None
+            or time.monotonic() - self._last_full_reload >= self.full_reload_interval
+        )
+        if due:
+            with perf.stage('sheet_full_reload') as timing:
+                self._full_reload()
+                timing['rows'] = len(self._rows)
+            return
+
+        with perf.stage('sheet_incremental') as timing:
+            self._sync_incremental()
+            timing['rows'] = len(self._rows)
+
+    def _sync_incremental(self):
+        n = len(self._rows)
+        # シート上の行番号: 1行目がヘッダー、データのi行目は i+1 行目
+        header, last_row, new_rows = self._ws().batch_get([
+            "1:1",
+            f"A{n + 1}:{_LAST_COL}{n + 1}",
+            f"A{n + 2}:{_LAST_COL}",
+        ])
+        header = header[0] if header else []
+        last_row = last_row[0][:len(self._header)] if last_row else []
+
+        if _checksum(_trim(header)) != self._header_sum or _checksum(_trim(last_row)) != self._last_row_sum:
+            self._full_reload()
+            return
+        self._append(list(new_rows))
+
+    def _full_reload(self):
+        values = self._ws().get_values()
+        old_header, old_rows = self._header, self._rows
+        header = _trim(values[0]) if values else []
+        self._header = header
+        self._header_sum = _checksum(header)
+        self._rows = []
+        self._last_row_sum = _checksum(header)  # データ行が無い場合はヘッダー行が「最後の行」
+        self._append(values[1:])
+        self._changed = (header, self._rows) != (old_header, old_rows)
+        self._last_full_reload = time.monotonic()
+
+    def _append(self, rows):
+        if not rows:
+            return
+        width = len(self._header)
+        for row in rows:
+            row = list(row[:width])
+            self._rows.append(row + [""] * (width - len(row)))
+        self._last_row_sum = _checksum(_trim(self._rows[-1]))
+        self._changed = True
+
+    def to_dataframe(self):
+        """取り込み済みの値から、空セルをNaNにしたDataFrameを作る。"""
+        header = self._header or []
+        df = pd.DataFrame(self._rows, columns=header, dtype=object)
+        df = df.where(df != "", np.nan)
+        # 見出しの無い空の列は落とす (get_as_dataframe と同じ扱い)
+        keep = [i for i, name in enumerate(header) if name != "" or df.iloc[:, i].notna().any()]
+        if len(keep) < len(header):
+            df = df.iloc[:, keep]
+        return df
@@ -0,0 +1,56 @@
+# modules/snapshot_store.py (シートのスナップショットをローカルに保存する)
+
+import json
+import os
+from pathlib import Path
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+# data/training_log.csv と同じ data/ の下に保存する (個人情報を含むのでgit管理外)
+SNAPSHOT_DIR = Path(__file__).resolve().parent.parent / "data" / "snapshots"
+
+
+class SnapshotStore:
+    """
+    シートから取り込んだ値 (ヘッダー + 行) をParquetファイル1つに保存・復元する。
+    起動直後やシートに接続できない時は、ここに残っている最後の正常なスナップショットを使う。
+
+    列名はシートのヘッダーそのままだと重複や空文字があり得るので、
+    Parquet上は c0, c1, ... とし、ヘッダーはスキーマのメタデータに入れておく。
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+
+    @classmethod
+    def for_sheet(cls, sheet_name, worksheet_name):
+        return cls(SNAPSHOT_DIR / f"{sheet_name}__{worksheet_name}.parquet")
+
+    def exists(self):
+        return self.path.exists()
+
+    def load(self):
+        """保存済みの (header, rows) を返す。無い・読めない場合は None。"""
+        if not self.path.exists():
+            return None
+        try:
+            table = pq.read_table(self.path)
+        except (OSError, pa.ArrowInvalid):
+            return None
+        meta = table.schema.metadata or {}
+        header = json.loads(meta.get(b"header", b"[]"))
+        columns = [table.column(i).to_pylist() for i in range(table.num_columns)]
+        rows = [list(row) for row in zip(*columns)] if columns else []
+        return header, rows
+
+    def save(self, header, rows):
+        """一時ファイルに書いてから置き換えるので、途中で落ちても前回のファイルは壊れない。"""
+        columns = {f"c{i}": pa.array([row[i] for row in rows], type=pa.string()) for i in range(len(header))}
+        table = pa.table(columns)
+        table = table.replace_schema_metadata({"header": json.dumps(header, ensure_ascii=False)})
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix(".tmp")
+        pq.write_table(table, tmp_path, compression="zstd")
+        os.replace(tmp_path, self.path)
@@ -0,0 +1,194 @@
+# modules/sources.py (記録の取得元: Googleスプレッドシート・ローカルのファイル・プロセス内の偽シート)
+"""
+取得元はどれも open() でワークシートを返す。SheetSync と SubmissionQueue が使うのは
+get_values / batch_get / row_values / append_rows だけなので、同じ形のワークシートを返せば差し替えられる。
+
+- SheetsSource: 本番のGoogleスプレッドシート。認証済みのクライアントはプロセスで1つを使い回す
+- LocalSource: data/training_log.csv などのCSV・Parquetファイル (ネットワーク不要)
+- FakeSheetsSource: メモリ上の偽シート。遅延や割り当て超過のエラーも再現できる (ベンチマーク用)
+"""
+
+import re
+import threading
+import time
+from pathlib import Path
+
+import pandas as pd
+
+from modules.lazy_import import import_timed
+
+DEFAULT_LOCAL_PATH = Path(__file__).resolve().parent.parent / "data" / "training_log.csv"
+
+_SCOPES = ['https://www.googleapis.com/auth/spreadsheets', 'https://www.googleapis.com/auth/drive']
+
+# 認証済みクライアント (サービスアカウントごと) と、開いたスプレッドシート (名前ごと) の使い回し
+_clients = {}
+_spreadsheets = {}
+_pool_lock = threading.Lock()
+
+
+def _client(credentials_info):
+    """サービスアカウントごとに1つの認証済みクライアント。トークンの更新はクライアントが行う。"""
+    key = credentials_info.get("client_email")
+    with _pool_lock:
+        if key not in _clients:
+            gspread = import_timed("gspread")
+            Credentials = import_timed("google.oauth2.service_account").Credentials
+            creds = Credentials.from_service_account_info(credentials_info, scopes=_SCOPES)
+            _clients[key] = gspread.authorize(creds)
+        return _clients[key]
+
+
+class SheetsSource:
+    """
+    Googleスプレッドシートのワークシート。
+    認証とスプレッドシートの検索 (client.open は Drive の検索になる) はプロセスで1回だけ行い、
+    open() ではワークシートの取得 (1リクエスト) だけをする。
+    """
+
+    def __init__(self, sheet_name, worksheet_name, credentials_info):
+        self.sheet_name = sheet_name
+        self.worksheet_name = worksheet_name
+        self._credentials_info = dict(credentials_info)
+
+    def open(self):
+        client = _client(self._credentials_info)
+        key = (self._credentials_info.get("client_email"), self.sheet_name)
+        with _pool_lock:
+            spreadsheet = _spreadsheets.get(key)
+        if spreadsheet is None:
+            spreadsheet = client.open(self.sheet_name)
+            with _pool_lock:
+                _spreadsheets[key] = spreadsheet
+        return spreadsheet.worksheet(self.worksheet_name)
+
+
+class FakeAPIError(Exception):
+    """gspread の APIError と同じく、response.status_code でHTTPステータスが取れる例外。"""
+
+    class _Response:
+        def __init__(self, status_code, headers):
+            self.status_code = status_code
+            self.headers = headers
+
+    def __init__(self, status_code, retry_after=None):
+        super().__init__(f"fake sheets error {status_code}")
+        headers = {} if retry_after is None else {'Retry-After': str(retry_after)}
+        self.response = self._Response(status_code, headers)
+
+
+# "1:1" / "A2:ZZZ10" / "A2:ZZZ" のような行範囲 (列の指定は A から全列として扱う)
+_RANGE = re.compile(r"^[A-Z]*(\d+):[A-Z]*(\d*)$")
+
+
+def _trim(rows):
+    """Sheets API と同じく、行の右端の空セルと末尾の空行を省く。"""
+    out = []
+    for row in rows:
+        row = list(row)
+        while row and row[-1] == "":
+            row.pop()
+        out.append(row)
+    while out and not out[-1]:
+        out.pop()
+    return out
+
+
+class FakeWorksheet:
+    """
+    メモリ上のワークシート。値はすべて文字列 (空セルは '') で持つ。
+    latency 秒の遅延を呼び出しごとに入れ、fail_next() で次の呼び出しをエラーにできる。
+    """
+
+    def __init__(self, values=None, latency=0.0):
+        self._values = [list(row) for row in (values or [])]
+        self.latency = latency
+        self.calls = 0
+        self._failures = []
+        self._lock = threading.Lock()
+
+    def fail_next(self, status_code=429, count=1, retry_after=None):
+        """次の count 回の呼び出しを status_code のエラーにする。"""
+        with self._lock:
+            self._failures.extend([(status_code, retry_after)] * count)
+
+    def _call(self):
+        if self.latency:
+            time.sleep(self.latency)
+        with self._lock:
+            self.calls += 1
+            if self._failures:
+                status_code, retry_after = self._failures.pop(0)
+                raise FakeAPIError(status_code, retry_after)
+
+    def _rows(self, a1):
+        match = _RANGE.match(a1)
+        if match is None:
+            raise ValueError(f"unsupported range: {a1}")
+        first = int(match[1])
+        last = int(match[2]) if match[2] else len(self._values)
+        return _trim(self._values[first - 1:last])
+
+    def get_values(self):
+        self._call()
+        with self._lock:
+            return _trim(self._values)
+
+    def batch_get(self, ranges):
+        self._call()
+        with self._lock:
+            return [self._rows(a1) for a1 in ranges]
+
+    def row_values(self, row):
+        self._call()
+        with self._lock:
+            rows = self._rows(f"{row}:{row}")
+        return rows[0] if rows else []
+
+    def append_rows(self, rows, value_input_option=None):
+        self._call()
+        with self._lock:
+            # 表の最後の空でない行の次から書き込む (Sheets の append と同じ)
+            end = len(_trim(self._values))
+            del self._values[end:]
+            self._values.extend(['' if v is None else str(v) for v in row] for row in rows)
+
+
+class FakeSheetsSource:
+    """プロセス内の偽シート。何度 open() しても同じワークシートを返す。"""
+
+    def __init__(self, values=None, latency=0.0):
+        self.worksheet = FakeWorksheet(values, latency)
+
+    @classmethod
+    def from_frame(cls, df, latency=0.0):
+        """DataFrame (列名がヘッダー、NaNは空セル) から作る。"""
+        body = df.astype(object).where(df.notna(), '').astype(str).values.tolist()
+        return cls([list(map(str, df.columns))] + body, latency)
+
+    def open(self):
+        return self.worksheet
+
+
+class LocalSource(FakeSheetsSource):
+    """
+    ローカルのCSV・Parquetファイル (既定は data/training_log.csv) をシートの代わりにする。
+    ファイルは最初の open() で1度だけ読む。書き込みはメモリ上だけに残り、ファイルは変更しない。
+    """
+
+    def __init__(self, path=DEFAULT_LOCAL_PATH, latency=0.0):
+        super().__init__(latency=latency)
+        self.path = Path(path)
+        self._loaded = False
+        self._load_lock = threading.Lock()
+
+    def open(self):
+        with self._load_lock:
+            if not self._loaded:
+                if self.path.suffix == ".parquet":
+                    df = pd.read_parquet(self.path)
+                else:
+                    df = pd.read_csv(self.path, dtype=str, keep_default_na=False)
+                self.worksheet = FakeSheetsSource.from_frame(df, self.worksheet.latency).worksheet
+                self._loaded = True
+        return self.worksheet
@@ -0,0 +1,357 @@
+# modules/sql_store.py (イベントテーブルをSQLiteに置き、絞り込み・集計をクエリで行う)
+
+import hashlib
+import sqlite3
+import threading
+from contextlib import closing
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from modules.circles import DEFAULT_CIRCLE, circle_cache
+from modules.events import EVENT_COLUMNS, EVENTS_FORMAT
+from modules.scoring import DEFAULT_FORMULA, ONE_RM_COLUMNS
+from modules.growth import GROWTH_COLUMNS
+from modules.window_index import LEADERBOARD_COLUMNS, add_percentile
+
+# data/training_log.csv と同じ data/ の下に置く (個人情報を含むのでgit管理外)
+DEFAULT_DB_PATH = Path(__file__).resolve().parent.parent / "data" / "tracker.db"
+
+# 日付はISO形式の文字列で持つ (文字列の大小 = 日付の前後)
+_DATE_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS events (
+    circle   TEXT    NOT NULL,
+    seq      INTEGER NOT NULL,
+    date     TEXT    NOT NULL,
+    name     TEXT    NOT NULL,
+    exercise TEXT    NOT NULL,
+    kg       REAL    NOT NULL,
+    reps     INTEGER NOT NULL,
+    one_rm   REAL    NOT NULL,
+    score    REAL    NOT NULL,
+    one_rm_epley    REAL NOT NULL,
+    one_rm_brzycki  REAL NOT NULL,
+    one_rm_lombardi REAL NOT NULL,
+    bodyweight      REAL
+);
+-- トラッカー: (サークル, メンバー, 種目, 期間) の絞り込み
+CREATE INDEX IF NOT EXISTS events_member_idx ON events (circle, name, exercise, date);
+-- ランキング: (サークル, 種目) ごとの集計
+CREATE INDEX IF NOT EXISTS events_exercise_idx ON events (circle, exercise, date);
+-- 保存中のイベントの版。rows と digest (先頭 rows 行の内容のハッシュ) は、次の版が末尾への追記だけかを見るのに使う
+CREATE TABLE IF NOT EXISTS versions (
+    circle  TEXT PRIMARY KEY,
+    version TEXT NOT NULL,
+    rows    INTEGER NOT NULL,
+    digest  TEXT NOT NULL
+);
+"""
+
+_VERSION_COLUMNS = {'circle', 'version', 'rows', 'digest'}
+
+# 読み込みの途中で別の版に置き換えられた時に、入れ直して読み直す回数の上限
+_MAX_READ_ATTEMPTS = 3
+
+
+def _to_sql_date(value):
+    return pd.Timestamp(value).strftime(_DATE_FORMAT)
+
+
+def _row_hashes(events):
+    """イベントテーブルの1行ごとのハッシュ値 (uint64配列)。"""
+    if events.empty:
+        return np.empty(0, dtype="uint64")
+    return pd.util.hash_pandas_object(events[EVENT_COLUMNS], index=False).to_numpy()
+
+
+def _digest(hashes):
+    return hashlib.sha1(hashes.tobytes()).hexdigest()
+
+
+def _metric_sql(formula=DEFAULT_FORMULA, relative=False):
+    """選んだ推定1RMの式・体重比 (modules/scoring.py) のスコアのSQL式。体重が分からない行は0。"""
+    column = ONE_RM_COLUMNS[formula]
+    if relative:
+        return f"(CASE WHEN bodyweight > 0 THEN {column} / bodyweight ELSE 0 END)"
+    return column
+
+
+class EventStore:
+    """
+    イベントテーブル (modules/events.py) をサークルごとにSQLiteファイルへ保存する。
+    オフラインでも動くローカルファイル1つだけを使う。
+
+    接続はクエリごとに開き直すので、Streamlitの複数セッション (スレッド) から共有してよい。
+    書き込みはロックで1つずつ行い、読み込みはWALモードで書き込み中でも並行して行える。
+    """
+
+    def __init__(self, path=DEFAULT_DB_PATH):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        with closing(self._connect()) as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._migrate(conn)
+            conn.executescript(_SCHEMA)
+
+    @staticmethod
+    def _migrate(conn):
+        """
+        列の足りない古い events・versions テーブルは作り直す。
+        中身はシートから作り直せるキャッシュなので、消してバージョンも忘れれば次の load で入れ直される。
+        """
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(events)")}
+        versions = {row[1] for row in conn.execute("PRAGMA table_info(versions)")}
+        if (columns and not set(EVENT_COLUMNS) <= columns) or (versions and not _VERSION_COLUMNS <= versions):
+            with conn:
+                conn.execute("DROP TABLE IF EXISTS events")
+                conn.execute("DROP TABLE IF EXISTS versions")
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=30)
+
+    def query(self, sql, params=()):
+        """SELECT文の結果をDataFrameで返す。"""
+        with closing(self._connect()) as conn:
+            return pd.read_sql_query(sql, conn, params=params)
+
+    def query_version(self, circle, version, sql, params=()):
+        """
+        サークルに version の版が保存されている時だけ、SELECT文の結果を返す (違う版なら None)。
+        版の確認とクエリは1つの読み込みトランザクションで行うので、途中で別の版に置き換わっても混ざらない。
+        """
+        with closing(self._connect()) as conn:
+            conn.execute("BEGIN")
+            try:
+                if self._stored(conn, circle)[0] != version:
+                    return None
+                return pd.read_sql_query(sql, conn, params=params)
+            finally:
+                conn.rollback()
+
+    @staticmethod
+    def _stored(conn, circle):
+        """保存中の (version, rows, digest)。まだ無ければ (None, 0, None)。"""
+        row = conn.execute("SELECT version, rows, digest FROM versions WHERE circle = ?", (circle,)).fetchone()
+        return row if row else (None, 0, None)
+
+    def version(self, circle):
+        """保存済みのデータのバージョン。まだ無ければ None。"""
+        with closing(self._connect()) as conn:
+            return self._stored(conn, circle)[0]
+
+    def load(self, circle, version, events):
+        """
+        サークルのイベントを events (日付順) で置き換える。
+        同じバージョンが保存済みなら何もしない。保存中のイベントが events の先頭と同じ
+        (前の版の末尾に記録を足しただけ) なら、足りない行だけを書き足す。置き換えは1トランザクションで行う。
+        別のプロセスと同じファイルを使っても、版の確認と書き込みが混ざらないよう書き込みロックを先に取る。
+        """
+        with self._lock, closing(self._connect()) as conn, conn:
+            conn.execute("BEGIN IMMEDIATE")
+            stored, stored_rows, stored_digest = self._stored(conn, circle)
+            if stored == version:
+                return False
+            hashes = _row_hashes(events)
+            start = 0
+            if stored is not None and stored_rows <= len(events) and _digest(hashes[:stored_rows]) == stored_digest:
+                start = stored_rows
+            else:
+                conn.execute("DELETE FROM events WHERE circle = ?", (circle,))
+            added = events.iloc[start:]
+            rows = zip(
+                [circle] * len(added),
+                range(start, len(events)),
+                added['date'].dt.strftime(_DATE_FORMAT),
+                added['name'].astype(str),
+                added['exercise'].astype(str),
+                added['kg'].astype("float64"),
+                added['reps'].astype("int64"),
+                added['one_rm'].astype("float64"),
+                added['score'].astype("float64"),
+                added['one_rm_epley'].astype("float64"),
+                added['one_rm_brzycki'].astype("float64"),
+                added['one_rm_lombardi'].astype("float64"),
+                # 体重が分からない (NaN) 行は NULL
+                added['bodyweight'].astype("float64").astype(object).where(added['bodyweight'].notna(), None),
+            )
+            conn.executemany("INSERT INTO events VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+            conn.execute(
+                "INSERT INTO versions (circle, version, rows, digest) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (circle) DO UPDATE SET "
+                "version = excluded.version, rows = excluded.rows, digest = excluded.digest",
+                (circle, version, len(events), _digest(hashes)),
+            )
+            return True
+
+
+class SqlDataset:
+    """
+    Dataset (modules/dataset.py) と同じ問い合わせメソッドを、EventStore へのクエリで実装したもの。
+    トラッカー・ランキングはどちらを受け取っても同じように動く。
+    raw (バックアップ用の生データ)・version・quarantine (検証で弾いた行) は元のDatasetのものをそのまま使う。
+
+    SQLiteのファイルにはサークルごとに1つの版しか置かないので、クエリのたびに保存中の版を確かめ、
+    別の版 (前の版に戻った時・別のプロセスが書いた時) なら自分の版を入れ直してから答える。
+    """
+
+    def __init__(self, store, dataset, circle=DEFAULT_CIRCLE):
+        self.store = store
+        self.circle = circle
+        self.raw = dataset.raw
+        self.version = dataset.version
+        self.quarantine = dataset.quarantine
+        self._cube = dataset.cube
+        self._events = dataset.events
+        # 保存済みのイベントは、生データとイベントテーブルの作り方の両方が同じ時だけ使い回す
+        self._stored_version = f"{dataset.version}/{EVENTS_FORMAT}"
+        store.load(circle, self._stored_version, self._events)
+
+        self.members = self._query(
+            "SELECT DISTINCT name FROM events WHERE circle = ? ORDER BY name"
+        )['name'].tolist()
+        self.months = self._query(
+            "SELECT DISTINCT substr(date, 1, 7) AS month FROM events WHERE circle = ? ORDER BY month DESC"
+        )['month'].tolist()
+
+    def _query(self, sql, params=()):
+        return self._read(sql, (self.circle, *params))
+
+    def _read(self, sql, params):
+        """自分の版が保存されている状態でクエリを実行する。別の版なら入れ直してから読み直す。"""
+        for _ in range(_MAX_READ_ATTEMPTS):
+            result = self.store.query_version(self.circle, self._stored_version, sql, params)
+            if result is not None:
+                return result
+            self.store.load(self.circle, self._stored_version, self._events)
+        raise RuntimeError(f"events for circle {self.circle!r} keep changing while reading")
+
+    @property
+    def empty(self):
+        return not self.members
+
+    def date_range(self):
+        """記録のある最初と最後の日付。"""
+        row = self._query("SELECT MIN(date) AS first, MAX(date) AS last FROM events WHERE circle = ?").iloc[0]
+        return pd.Timestamp(row['first']), pd.Timestamp(row['last'])
+
+    def select(self, exercise, names, start, end, formula=DEFAULT_FORMULA, relative=False):
+        """
+        1種目・指定メンバー・期間 (両端を含む) の記録を日付順に返す。
+        one_rm 列は選んだ推定1RMの式・体重比の値になる。
+        """
+        names = list(names)
+        if not names:
+            return pd.DataFrame({
+                'name': pd.Series(dtype=object),
+                'date': pd.Series(dtype="datetime64[ns]"),
+                'kg': pd.Series(dtype="float32"),
+                'reps': pd.Series(dtype="int16"),
+                'one_rm': pd.Series(dtype="float32"),
+            })
+        placeholders = ", ".join("?" * len(names))
+        rows = self._query(
+            f"SELECT name, date, kg, reps, {_metric_sql(formula, relative)} AS one_rm FROM events "
+            f"WHERE circle = ? AND name IN ({placeholders}) AND exercise = ? AND date BETWEEN ? AND ? "
+            "ORDER BY date, seq",
+            (*names, exercise, _to_sql_date(start), _to_sql_date(end)),
+        )
+        return rows.astype({
+            'date': "datetime64[ns]", 'kg': "float32", 'reps': "int16", 'one_rm': "float32",
+        })
+
+    def best(self, name, exercise):
+        """(スコア, 日付) を返す。記録が無ければ None。同じスコアなら最初に出した日。"""
+        rows = self._query(
+            "SELECT score, date FROM events "
+            "WHERE circle = ? AND name = ? AND exercise = ? AND score > 0 "
+            "ORDER BY score DESC, date, seq LIMIT 1",
+            (name, exercise),
+        )
+        if rows.empty:
+            return None
+        return float(rows['score'].iloc[0]), pd.Timestamp(rows['date'].iloc[0])
+
+    def ranking(self, exercise):
+        """種目の自己ベストをメンバーごとに並べたDataFrame (name, best, date)。スコアの高い順。"""
+        table = self._query(
+            "SELECT name, score AS best, date FROM ("
+            "  SELECT name, score, date,"
+            "         ROW_NUMBER() OVER (PARTITION BY name ORDER BY score DESC, date, seq) AS rn"
+            "  FROM events WHERE circle = ? AND exercise = ? AND score > 0"
+            ") WHERE rn = 1 ORDER BY best DESC, name",
+            (exercise,),
+        )
+        return table.astype({'date': "datetime64[ns]"})
+
+    def leaderboard(self, exercise, start=None, end=None, k=None, formula=DEFAULT_FORMULA, relative=False):
+        """
+        期間 (両端を含む、省略すると無制限) 内のベストで並べたランキング (name, best, date, percentile)。
+        best は選んだ推定1RMの式・体重比の値。
+        """
+        # 標準の式は Dataset.metric_index と同じく score (回数のみの種目は回数) で並べる
+        metric = 'score' if formula == DEFAULT_FORMULA and not relative else _metric_sql(formula, relative)
+        conditions, params = "", [exercise]
+        if start is not None:
+            conditions += " AND date >= ?"
+            params.append(_to_sql_date(pd.Timestamp(start).normalize()))
+        if end is not None:
+            conditions += " AND date < ?"
+            params.append(_to_sql_date(pd.Timestamp(end).normalize() + pd.Timedelta(days=1)))
+        table = self._query(
+            "SELECT name, score AS best, date FROM ("
+            "  SELECT name, score, date,"
+            "         ROW_NUMBER() OVER (PARTITION BY name ORDER BY score DESC, date, seq) AS rn"
+            f"  FROM (SELECT name, date, seq, {metric} AS score FROM events"
+            f"        WHERE circle = ? AND exercise = ?{conditions})"
+            "  WHERE score > 0"
+            ") WHERE rn = 1 ORDER BY best DESC, name",
+            tuple(params),
+        ).astype({'best': "float64", 'date': "datetime64[ns]"})
+        # 百分位は期間内の全員の中での値なので、上位 k 人に絞る前に付ける
+        table = add_percentile(table)
+        if k is not None:
+            table = table.head(k)
+        return table[LEADERBOARD_COLUMNS]
+
+    def trend(self, grain, exercise, names=None, start=None, end=None):
+        """週・月ごとの集計。数百セルしかないので、Dataset が取り込み時に作った集計キューブから答える。"""
+        return self._cube.query(grain, exercise, names, start, end)
+
+    def growth_for(self, exercise, month):
+        """
+        1種目・1ヶ月分の成長率 (modules/growth.py と同じ列)。
+        月初より前のベストと月末までのベストを、月末までの範囲を1回走査して求める。
+        """
+        start = pd.Period(month, freq='M').start_time
+        end = start + pd.offsets.MonthBegin(1)
+        # 月初の条件は SELECT 句にあるので、circle より先に渡す
+        growth = self._read(
+            "SELECT name,"
+            "       COALESCE(MAX(CASE WHEN date < ? THEN one_rm END), 0) AS start_1rm,"
+            "       MAX(one_rm) AS end_1rm "
+            "FROM events WHERE circle = ? AND exercise = ? AND one_rm > 0 AND date < ? "
+            "GROUP BY name HAVING end_1rm > start_1rm ORDER BY name",
+            (_to_sql_date(start), self.circle, exercise, _to_sql_date(end)),
+        )
+        growth['growth'] = growth['end_1rm'] - growth['start_1rm']
+        with np.errstate(divide='ignore'):
+            growth['growth_pct'] = growth['growth'] / growth['start_1rm'] * 100
+        return growth[GROWTH_COLUMNS]
+
+
+@st.cache_resource(show_spinner=False)
+def get_event_store(path=str(DEFAULT_DB_PATH)):
+    """SQLiteファイルごとに1つの EventStore をプロセス全体で共有する。"""
+    return EventStore(path)
+
+
+def get_sql_dataset(dataset, circle=DEFAULT_CIRCLE, path=str(DEFAULT_DB_PATH)):
+    """Dataset の内容をSQLiteに反映し、クエリで答える SqlDataset を返す。サークル・バージョンごとに1回だけ書き込む。"""
+    return circle_cache(circle, "sql").get(
+        (path, dataset.version), lambda latest: SqlDataset(get_event_store(path), dataset, circle)
+    )
@@ -0,0 +1,208 @@
+# modules/submission_queue.py (フォームからの書き込みをまとめてシートに送る)
+
+import random
+import threading
+import time
+
+import pandas as pd
+from streamlit.logger import get_logger
+
+from modules import perf
+
+logger = get_logger(__name__)
+
+# 再試行すれば通る可能性のあるHTTPステータス (429: 書き込みの割り当て超過、5xx: 一時的な障害)
+_RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+
+
+def _status_of(error):
+    response = getattr(error, 'response', None)
+    return getattr(response, 'status_code', None)
+
+
+def _retry_after(error):
+    """429 応答の Retry-After ヘッダー (秒)。無ければ None。"""
+    response = getattr(error, 'response', None)
+    value = getattr(response, 'headers', {}).get('Retry-After') if response is not None else None
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+class SubmissionQueue:
+    """
+    フォームの送信を1つのキューに集め、裏のスレッドが append_rows でまとめてシートに書き込む。
+    練習後に送信が集中しても、書き込みは linger 秒ごとに最大 batch_size 行ずつの1回のAPI呼び出しで済む。
+
+    - ヘッダー行は最初に1度だけ読んで覚える (送信のたびにシート全体を読まない)
+    - 割り当て超過 (429) や一時的な障害の時は、Retry-After か指数バックオフ (上限 max_backoff 秒) で待って再送する
+    - 再送しても通らない誤り (400など) の時は、そのまとまりを1行ずつ送り直し、通らなかった行だけを failed に残す
+      (1行の不備で同じまとまりの他の送信まで失わないように)。failed と last_error は管理者パネルとフォームに表示する
+    - 書き込み待ちの行は pending() で取れるので、表示側はシートに届く前から反映できる
+    - 書き込み終わった行も、書き込みより後に始めたシートの取得が表示されるまでは with_pending で足し続ける
+      (書き込みの前に始めた取得の結果には入っていないので、そこで消えないように)
+    """
+
+    def __init__(self, open_worksheet, known_header=None, batch_size=50, linger=1.0, max_backoff=64):
+        self._open_worksheet = open_worksheet
+        self._known_header = known_header  # () -> 同期済みのヘッダー行 (無ければ None)
+        self._worksheet = None
+        self.batch_size = batch_size
+        self.linger = linger
+        self.max_backoff = max_backoff
+        self._header = None
+        self._header_lock = threading.Lock()
+        self._pending = []  # 書き込み待ち (送信中を含む) の行。送った順
+        self._written = []  # 書き込み終わった (書き込んだ時刻 time.monotonic(), 行) の組。書き込んだ順
+        self._cond = threading.Condition()
+        self._worker = None
+        self._isolating = 0  # 1行ずつ送り直している残りの行数
+        self.failed = []  # 再送しても通らない誤り (400など) になった (行, 誤りの内容) の組
+        self.last_error = None
+
+    def _ws(self):
+        if self._worksheet is None:
+            self._worksheet = self._open_worksheet()
+        return self._worksheet
+
+    def header(self):
+        """
+        シートのヘッダー行。同期済みのヘッダー (known_header) があればそれを使い、
+        無ければ最初の1回だけ1行目を読む。
+        """
+        with self._header_lock:
+            if self._header is None and self._known_header is not None:
+                self._header = self._known_header()
+            if self._header is None:
+                self._header = self._ws().row_values(1)
+            return self._header
+
+    def to_row(self, record):
+        """{列名: 値} をヘッダーの列順の1行にする。無い列は空欄。"""
+        return [record.get(name, '') for name in self.header()]
+
+    def submit(self, record):
+        """記録1件をキューに入れてすぐに返す。書き込みは裏のスレッドが行う。"""
+        row = self.to_row(record)
+        with self._cond:
+            self._pending.append(row)
+            self._cond.notify()
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._run, name="sheet-writer", daemon=True)
+                self._worker.start()
+        return row
+
+    def pending(self):
+        """まだシートへの書き込みが終わっていない行のコピー。"""
+        with self._cond:
+            return [list(row) for row in self._pending]
+
+    def unconfirmed(self, fetched_at=None):
+        """
+        fetched_at (time.monotonic()) に始めたシートの取得の結果に、入っていないかもしれない行。
+        書き込み待ちの行と、fetched_at より後に書き込み終わった行。fetched_at が None なら書き込み終わった行は全部。
+        fetched_at より前に書き込み終わった行は、以後の取得にも必ず入っているので忘れる。
+        """
+        with self._cond:
+            if fetched_at is not None:
+                self._written = [(at, row) for at, row in self._written if at > fetched_at]
+            return [list(row) for _, row in self._written] + [list(row) for row in self._pending]
+
+    def with_pending(self, df_raw, fetched_at=None):
+        """
+        シートから読んだ生データ (load_data の結果、fetched_at に取得を始めたもの) の末尾に、
+        まだその中に入っていないかもしれない行 (unconfirmed) を足す。
+        送信直後の記録を、シートに届く前から全タブに表示するために使う。
+        書き込みと取得が重なって既にシートから読めている行 (送信日時と記入者名が同じ行) は足さない。
+        """
+        rows = self.unconfirmed(fetched_at)
+        if not rows:
+            return df_raw
+        header = self.header()
+        added = pd.DataFrame(rows, columns=header, dtype=object)
+        added = added.where(added != '', None)
+        keys = ['タイムスタンプ', '記入者名']
+        if not df_raw.empty and all(k in df_raw.columns and k in added.columns for k in keys):
+            def key_of(df):
+                sent = pd.to_datetime(df['タイムスタンプ'], errors='coerce', format='mixed')
+                return pd.MultiIndex.from_arrays([sent, df['記入者名'].astype(str)])
+            added = added[~key_of(added).isin(key_of(df_raw))]
+            if added.empty:
+                return df_raw
+        if len(df_raw.columns):
+            added = added[[c for c in df_raw.columns if c in added.columns]]
+        if '記録日' in added.columns:
+            added['記録日'] = pd.to_datetime(added['記録日'], errors='coerce')
+        return pd.concat([df_raw, added], ignore_index=True)
+
+    def failed_rows(self):
+        """書き込めずに外した行 (failed) のDataFrame。列はヘッダーの順で、最後に誤りの内容 ('エラー')。"""
+        with self._cond:
+            failed = list(self.failed)
+        if not failed:
+            return pd.DataFrame()
+        table = pd.DataFrame([row for row, _ in failed], columns=self.header(), dtype=object)
+        table['エラー'] = [error for _, error in failed]
+        return table
+
+    def flush(self, timeout=None):
+        """書き込み待ちが無くなるまで待つ。時間内に終われば True。"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while self._pending:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+            return True
+
+    def _run(self):
+        attempt = 0
+        while True:
+            with self._cond:
+                while not self._pending:
+                    self._cond.wait()
+            # 少し待って、同じ時間帯の送信を1回の書き込みにまとめる
+            time.sleep(self.linger)
+            with self._cond:
+                batch = self._pending[:1 if self._isolating else self.batch_size]
+            try:
+                with perf.stage('sheet_append', rows=len(batch)):
+                    self._ws().append_rows(batch, value_input_option='USER_ENTERED')
+            except Exception as e:
+                self.last_error = e
+                status = _status_of(e)
+                if status is not None and status not in _RETRYABLE_STATUS:
+                    if len(batch) > 1:
+                        # どの行が通らないのか分からないので、このまとまりを1行ずつ送り直す
+                        logger.warning("append_rows failed (%s), resending %d rows one by one: %s", status, len(batch), e)
+                        with self._cond:
+                            self._isolating = len(batch)
+                        continue
+                    # 送り直しても通らない内容なので、キューから外して残しておく
+                    logger.error("append_rows failed (%s), %d rows set aside: %s", status, len(batch), e)
+                    self._done(batch, error=e)
+                    continue
+                # 接続が切れている可能性もあるので、次はワークシートを開き直す
+                self._worksheet = None
+                delay = _retry_after(e) or min(self.max_backoff, 2 ** attempt) + random.uniform(0, 1)
+                logger.warning("append_rows failed (%s), retrying in %.1f s: %s", status, delay, e)
+                attempt += 1
+                time.sleep(delay)
+                continue
+            attempt = 0
+            self.last_error = None
+            self._done(batch)
+
+    def _done(self, batch, error=None):
+        """batch をキューから外す。error があれば書き込めなかった行として failed に残す。"""
+        with self._cond:
+            del self._pending[:len(batch)]
+            self._isolating = max(0, self._isolating - len(batch))
+            if error is not None:
+                self.failed.extend((row, str(error)) for row in batch)
+            else:
+                now = time.monotonic()
+                self._written.extend((now, row) for row in batch)
+            self._cond.notify_all()
@@ -3,6 +3,13 @@ import pandas as pd
 import plotly.express as px
 import datetime
 
+from modules import perf
+from modules.chart_data import downsample
+from modules.cube import GRAINS
+from modules.events import session_summary
+from modules.exercises import EXERCISE_COLS, EXERCISE_LABELS, EXERCISES_BY_ID
+from modules.scoring import DEFAULT_FORMULA, FORMULAS, metric_label
+
 '''
 @st.cache_data
 def load_data():
@@ -30,161 +37,38 @@ def load_data():
 
 '''
 
-def parse_kg_count(value):
-    if isinstance(value, str) and '-' in value:
-        try:
-            kg, rep = value.split('-')
-            return float(kg), int(rep)
-        except:
-            return 0, 0
-    try:
-        return 0, int(value)
-    except:
-        return 0, 0
-
-def estimate_1rm(weight, reps):
-    if reps == 0:
-        return 0
-    return weight * (1 + reps / 40)
-
-# 関数名を 'run' にし、引数(df)を受け取るように変更
-def run(df_original):
-    st.title("筋トレ記録トラッカー")
-
-    if df_original is None or df_original.empty:
-        st.warning("表示できる記録がありません。「記録入力」タブからデータを追加してください。")
-        return
-
-    # 元のデータフレームをコピーして加工することで、他のタブに影響を与えない
-    df = df_original.copy()
-    
-    # --- tracker.py内で行っていたデータ前処理 ---
-      # 1. カラム名を英語に統一
-    df = df.rename(columns={
-        'タイムスタンプ': 'timestamp',
-        '記入者名': 'name',
-        '記録日': 'date',
-        'ベンチプレス(kg × 回数)': 'bench_press',
-        'デッドリフト(kg × 回数)': 'deadlift',
-        'スクワット(kg × 回数)': 'squat',
-        'ラットプルダウン(kg × 回数)': 'latpulldown',
-        '懸垂(回数)': 'chinup',
-        'マシンショルダープレス(kg × 回数)': 'shoulder_press',
-        'レッグプレス(kg × 回数)': 'leg_press',
-        '45°レッグプレス(kg × 回数)': 'leg_press_45',
-        'メールアドレス': 'email'
-    })
-
-    # 2. 'date'列をdatetime型に変換。変換できないものはNaT(Not a Time)になる
-    df['date'] = pd.to_datetime(df['date'], errors='coerce')
-
-    # 3. 'date'が無効(NaT)な行を完全に削除する（これが重要！）
-    df.dropna(subset=['date'], inplace=True)
-    if df.empty:
-        st.warning("有効な日付の記録がありません。")
-        return
-
-    # 4. トレーニング種目の列だけを0で埋める
-    exercise_cols = [
-        'bench_press', 'deadlift', 'squat', 'latpulldown', 'chinup', 
-        'shoulder_press', 'leg_press', 'leg_press_45'
-    ]
-    for col in exercise_cols:
-        if col in df.columns:
-            df[col] = df[col].fillna(0) # 各種目列のNaNだけを0で埋める
-        else:
-            df[col] = 0 # 列自体が存在しない場合は0で作成
-     # 重量・回数に分解
-    exercise_cols = ['bench_press', 'deadlift', 'squat', 'latpulldown', 'chinup', 'shoulder_press', 'leg_press', 'leg_press_45']
-    for col in exercise_cols:
-        if col in df.columns:
-            # 文字列でないとapplyできない場合があるので、型を変換
-            df[col] = df[col].astype(str)
-            df[[f"{col}_kg", f"{col}_count"]] = df[col].apply(lambda x: pd.Series(parse_kg_count(x)))
-            if col != 'chinup':
-                df[f"{col}_1rm"] = df.apply(lambda row: estimate_1rm(row[f"{col}_kg"], row[f"{col}_count"]), axis=1)
-    # フィルター UI（本体エリア）
-    st.subheader("フィルタ")
-    col1, col2, col3 = st.columns(3)
+# 同じ (データのバージョン, 種目, メンバー, 期間, 1RMの式, 体重比) のグラフは作り直さず、全セッションで使い回す
+@st.cache_resource(max_entries=64, show_spinner=False)
+def _cached_charts(version, selected_ex, members, start_date, end_date, formula, relative, _dff):
+    perf.mark_miss()
+    return build_charts(_dff, selected_ex, relative)
 
-    with col1:
-        # name列が存在し、空でない場合のみフィルタを表示
-        if 'name' in df and not df['name'].dropna().empty:
-            selected_authors = st.multiselect("記入者を選択", df['name'].dropna().unique().tolist())
-        else:
-            selected_authors = []
-    with col2:
-        exercise_labels = {
-            'bench_press': 'ベンチプレス',
-            'deadlift': 'デッドリフト',
-            'squat': 'スクワット',
-            'latpulldown': 'ラットプルダウン',
-            'chinup': '懸垂',
-            'shoulder_press': 'マシンショルダープレス',
-            'leg_press': 'レッグプレス',
-            'leg_press_45': '45°レッグプレス',
-        }
-        exercise_labels_reverse = {v: k for k, v in exercise_labels.items()}
-        selected_jp = st.selectbox("種目を選択", list(exercise_labels.values()))
-        selected_ex = exercise_labels_reverse[selected_jp]
 
-    with col3:
-        start_date, end_date = st.date_input("期間を選択", [df['date'].min(), df['date'].max()])
-
-    # データフィルタリング
-    mask = (
-        df['name'].isin(selected_authors) &
-        (df['date'] >= pd.to_datetime(start_date)) &
-        (df['date'] <= pd.to_datetime(end_date))
-    )
-    dff = df.loc[mask]
-
-
-
-    # ▼▼▼ 最も重要な変更は、この一行です ▼▼▼
-    dff = dff.sort_values(by='date')
-    # ▲▲▲ この一行がグラフを日付順に正しく並べ替えます ▲▲▲
-
-
-    
-    # 不正データ（重量・回数ともにゼロ）を除外
-    if selected_ex != "chinup":
-        dff = dff[~((dff[f"{selected_ex}_kg"] == 0) & (dff[f"{selected_ex}_count"] == 0))]
-    else:
-        dff = dff[dff[f"{selected_ex}_count"] != 0]
-
-     # グラフ表示 V1
-    # if selected_ex != "chinup":
-    #     st.subheader("重量推移")
-    #     fig = px.line(dff, x='date', y=f'{selected_ex}_kg', markers=True)
-    #     st.plotly_chart(fig, use_container_width=True)
-
-    #     st.subheader("推定1RM推移")
-    #     fig2 = px.line(dff, x='date', y=f'{selected_ex}_1rm', markers=True)
-    #     st.plotly_chart(fig2, use_container_width=True)
-    # else:
-    #     st.subheader("回数推移")
-    #     fig = px.line(dff, x='date', y=f'{selected_ex}_count', markers=True)
-    #     st.plotly_chart(fig, use_container_width=True)
-    
-    # グラフ表示 V2
+def build_charts(dff, selected_ex, relative=False):
+    """
+    絞り込み済みの記録 dff から、表示するグラフの [(見出し, Figure), ...] を作る。
+    dff の one_rm は dataset.select で選んだ式・体重比の値 (relative なら体重比として表示する)。
+    """
     end_range = dff['date'].max() + pd.Timedelta(days=2)
     start_range = end_range - pd.Timedelta(days=15)
+    # 最初に表示される15日分はすべての点を送り、それより前はメンバーごとに形を保って間引く (modules/chart_data.py)
+    # 数値ラベルは送った点にだけ付ける
+    charts = []
     
-    if selected_ex != "chinup":
-        st.subheader("重量推移")
+    if not EXERCISES_BY_ID[selected_ex].reps_only:
+        kg_points = downsample(dff, 'kg', window_start=start_range)
         fig = px.line(
-            dff,
+            kg_points,
             x='date',
-            y=f'{selected_ex}_kg',
+            y='kg',
+            text=kg_points['kg'].round(1),
             color='name' if len(dff['name'].unique()) > 1 else None,
             markers=True,
-            title=f"{exercise_labels[selected_ex]} の重量推移",
-            labels={'date': '日付', f'{selected_ex}_kg': '重量 (kg)'}
+            title=f"{EXERCISE_LABELS[selected_ex]} の重量推移",
+            labels={'date': '日付', 'kg': '重量 (kg)'}
         )
         fig.update_traces(
             mode="lines+markers+text",
-            text=dff[f'{selected_ex}_kg'].round(1),
             textposition="top center"
         )
         fig.update_layout(
@@ -201,21 +85,22 @@ def run(df_original):
                 gridcolor="#e0e0e0",
                 )
         )
-        st.plotly_chart(fig, use_container_width=True)
+        charts.append(("重量推移", fig))
 
-        st.subheader("推定1RM推移")
+        one_rm_points = downsample(dff, 'one_rm', window_start=start_range)
+        one_rm_title = "体重比推移" if relative else "推定1RM推移"
         fig2 = px.line(
-            dff,
+            one_rm_points,
             x='date',
-            y=f'{selected_ex}_1rm',
+            y='one_rm',
+            text=one_rm_points['one_rm'].round(2 if relative else 1),
             color='name' if len(dff['name'].unique()) > 1 else None,
             markers=True,
-            title=f"{exercise_labels[selected_ex]} の推定1RM推移",
-            labels={'date': '日付', f'{selected_ex}_1rm': '推定1RM (kg)'}
+            title=f"{EXERCISE_LABELS[selected_ex]} の{one_rm_title}",
+            labels={'date': '日付', 'one_rm': metric_label(relative)}
         )
         fig2.update_traces(
             mode="lines+markers+text",
-            text=dff[f'{selected_ex}_1rm'].round(1),
             textposition="top center"
         )
         fig2.update_layout(
@@ -233,21 +118,55 @@ def run(df_original):
                 )
         )
         fig2.update_xaxes(rangeslider_visible=False)
-        st.plotly_chart(fig2, use_container_width=True)
+        charts.append((one_rm_title, fig2))
+
+        # 1日ごとの総挙上量 (重量×回数の合計)。1セルに複数セットを書いた日はその合計になる
+        sessions = session_summary(dff)
+        tonnage_points = downsample(sessions, 'tonnage', window_start=start_range)
+        fig3 = px.line(
+            tonnage_points,
+            x='date',
+            y='tonnage',
+            text=tonnage_points['tonnage'].round(0),
+            color='name' if len(dff['name'].unique()) > 1 else None,
+            markers=True,
+            title=f"{EXERCISE_LABELS[selected_ex]} の総挙上量推移",
+            labels={'date': '日付', 'tonnage': '総挙上量 (kg)'}
+        )
+        fig3.update_traces(
+            mode="lines+markers+text",
+            textposition="top center"
+        )
+        fig3.update_layout(
+            plot_bgcolor="white",
+            title_x=0.5,
+            xaxis=dict(
+                showgrid=True,
+                gridcolor="#e0e0e0",
+                range=[start_range, end_range],
+                rangeslider_visible=False
+                ),
+            yaxis=dict(
+                showgrid=True,
+                gridcolor="#e0e0e0",
+                )
+        )
+        charts.append(("総挙上量推移", fig3))
     else:
-        st.subheader("回数推移")
+        # 回数のグラフは全期間を表示するので、全体を点数の上限まで間引く
+        reps_points = downsample(dff, 'reps')
         fig = px.line(
-            dff,
+            reps_points,
             x='date',
-            y=f'{selected_ex}_count',
+            y='reps',
+            text='reps',
             color='name' if len(dff['name'].unique()) > 1 else None,
             markers=True,
-            title=f"{exercise_labels[selected_ex]} の回数推移",
-            labels={'date': '日付', f'{selected_ex}_count': '回数'}
+            title=f"{EXERCISE_LABELS[selected_ex]} の回数推移",
+            labels={'date': '日付', 'reps': '回数'}
         )
         fig.update_traces(
             mode="lines+markers+text",
-            text=dff[f'{selected_ex}_count'].round(1),
             textposition="top center"
         )
         fig.update_layout(
@@ -257,8 +176,183 @@ def run(df_original):
             yaxis=dict(showgrid=True, gridcolor="#e0e0e0")
         )
         fig.update_xaxes(rangeslider_visible=False)
-        st.plotly_chart(fig, use_container_width=True)
+        charts.append(("回数推移", fig))
+    return charts
+
+
+GRAIN_LABELS = {'W': "週", 'M': "月"}
+
+
+def build_trend_chart(trend, selected_ex, grain):
+    """dataset.trend の結果から、週・月ごとの総挙上量 (回数のみの種目は合計回数) の棒グラフを作る。"""
+    value, label = ('total_reps', '合計回数') if EXERCISES_BY_ID[selected_ex].reps_only else ('tonnage', '総挙上量 (kg)')
+    fig = px.bar(
+        trend,
+        x='period',
+        y=value,
+        color='name' if trend['name'].nunique() > 1 else None,
+        barmode='group',
+        title=f"{EXERCISE_LABELS[selected_ex]} の{GRAIN_LABELS[grain]}ごとの{label.split(' ')[0]}",
+        labels={'period': GRAIN_LABELS[grain], value: label, 'name': '名前'}
+    )
+    fig.update_layout(
+        plot_bgcolor="white",
+        title_x=0.5,
+        xaxis=dict(showgrid=True, gridcolor="#e0e0e0"),
+        yaxis=dict(showgrid=True, gridcolor="#e0e0e0")
+    )
+    return fig
+
+
+def trend_table(trend, selected_ex, grain):
+    """dataset.trend の結果を表示用の列名に直す。"""
+    columns = {
+        'period': f"{GRAIN_LABELS[grain]} (初日)",
+        'name': "名前",
+        'sessions': "練習日数",
+        'frequency': "週あたり日数",
+        'sets': "セット数",
+        'total_reps': "合計回数",
+    }
+    if EXERCISES_BY_ID[selected_ex].reps_only:
+        columns['best_score'] = "最高回数"
+    else:
+        columns['tonnage'] = "総挙上量 (kg)"
+        columns['best_one_rm'] = "最大推定1RM (kg)"
+    table = trend[list(columns)].rename(columns=columns)
+    table[columns['period']] = table[columns['period']].dt.date
+    return table.round(1)
+
+
+# 関数名を 'run' にし、引数(dataset)を受け取るように変更
+def run(dataset):
+    st.title("筋トレ記録トラッカー")
+
+    if dataset is None or dataset.raw.empty:
+        st.warning("表示できる記録がありません。「記録入力」タブからデータを追加してください。")
+        return
+
+    # 正規化済みの共有データ。絞り込みは dataset の問い合わせメソッドに任せる
+    # (pandas版: modules/dataset.py、SQLite版: modules/sql_store.py)
+    if dataset.empty:
+        st.warning("有効な日付の記録がありません。")
+        return
+    first_date, last_date = dataset.date_range()
+
+    # フィルター UI（本体エリア）
+    st.subheader("フィルタ")
+    col1, col2, col3 = st.columns(3)
+
+    with col1:
+        # name列が存在し、空でない場合のみフィルタを表示
+        if dataset.members:
+            selected_authors = st.multiselect("記入者を選択", dataset.members)
+        else:
+            selected_authors = []
+    with col2:
+        selected_ex = st.selectbox("種目を選択", EXERCISE_COLS, format_func=EXERCISE_LABELS.get)
+
+    with col3:
+        start_date, end_date = st.date_input("期間を選択", [first_date, last_date])
+
+    # 推定1RMの式と体重比 (modules/scoring.py)。値は取り込み時に全部の式の分を作ってあるので、列を選ぶだけ。
+    # 回数のみの種目は推定1RMが無い (0) ので選べない
+    reps_only = EXERCISES_BY_ID[selected_ex].reps_only
+    col4, col5 = st.columns([2, 1])
+    with col4:
+        formula = st.selectbox(
+            "推定1RMの計算式", list(FORMULAS), format_func=FORMULAS.get, key="tracker_formula", disabled=reps_only
+        )
+    with col5:
+        relative = st.checkbox(
+            "体重比で表示", key="tracker_relative", help="フォームで体重を記録したメンバーのみ", disabled=reps_only
+        )
+    if reps_only:
+        formula, relative = DEFAULT_FORMULA, False
+
+    # データフィルタリング (種目・記入者・期間)
+    with perf.stage('tracker_select') as timing:
+        dff = dataset.select(selected_ex, selected_authors, start_date, end_date, formula, relative)
+        timing['rows'] = len(dff)
+
+
+
+    # ▼▼▼ 最も重要な変更は、この一行です ▼▼▼
+    dff = dff.sort_values(by='date')
+    # ▲▲▲ この一行がグラフを日付順に正しく並べ替えます ▲▲▲
+
+
+    
+    # 不正データ（重量・回数ともにゼロ、回数ゼロ、範囲外の値など）は取り込み時の検証 (modules/validation.py) で除いてある
+    if relative:
+        # 体重比は体重の分かる記録だけ (体重が分からない記録の値は0)
+        dff = dff[dff['one_rm'] > 0]
+
+    # 選択したメンバーの自己ベスト。標準の式は自己ベスト索引、それ以外の式・体重比は全期間のランキングを引くだけ
+    if selected_authors:
+        if formula == DEFAULT_FORMULA and not relative:
+            st.subheader("自己ベスト")
+            bests = {author: dataset.best(author, selected_ex) for author in selected_authors}
+        else:
+            st.subheader(f"自己ベスト ({FORMULAS[formula]}{'・体重比' if relative else ''})")
+            board = dataset.leaderboard(selected_ex, formula=formula, relative=relative)
+            bests = dict(zip(board['name'], zip(board['best'], board['date'])))
+        pr_cols = st.columns(min(len(selected_authors), 4))
+        for i, author in enumerate(selected_authors):
+            pr = bests.get(author)
+            with pr_cols[i % len(pr_cols)]:
+                if pr is None:
+                    st.metric(author, "記録なし")
+                else:
+                    score, pr_date = pr
+                    if reps_only:
+                        value = f"{score:.0f} 回"
+                    elif relative:
+                        value = f"{score:.2f} 倍"
+                    else:
+                        value = f"{score:.1f} kg"
+                    st.metric(author, value, help=f"{pr_date:%Y-%m-%d} 達成")
+
+     # グラフ表示 V1
+    # if selected_ex != "chinup":
+    #     st.subheader("重量推移")
+    #     fig = px.line(dff, x='date', y='kg', markers=True)
+    #     st.plotly_chart(fig, use_container_width=True)
+
+    #     st.subheader("推定1RM推移")
+    #     fig2 = px.line(dff, x='date', y='one_rm', markers=True)
+    #     st.plotly_chart(fig2, use_container_width=True)
+    # else:
+    #     st.subheader("回数推移")
+    #     fig = px.line(dff, x='date', y='reps', markers=True)
+    #     st.plotly_chart(fig, use_container_width=True)
+    
+    # グラフ表示 V2
+    with perf.stage('charts', rows=len(dff), cache='hit'):
+        charts = _cached_charts(
+            dataset.version, selected_ex, tuple(sorted(selected_authors)), start_date, end_date,
+            formula, relative, dff
+        )
+    with perf.stage('plotly_render', rows=len(dff)):
+        for title, fig in charts:
+            st.subheader(title)
+            st.plotly_chart(fig, use_container_width=True)
+
+    # 週・月ごとのまとめ (取り込み時に作った集計キューブ modules/cube.py を引くだけで、記録全体は走査しない)
+    if selected_authors:
+        st.subheader("週・月ごとのまとめ")
+        grain = st.radio(
+            "集計単位", GRAINS, format_func=GRAIN_LABELS.get, horizontal=True, key="trend_grain"
+        )
+        with perf.stage('tracker_trend') as timing:
+            trend = dataset.trend(grain, selected_ex, selected_authors, start_date, end_date)
+            timing['rows'] = len(trend)
+        if trend.empty:
+            st.info("この期間の記録はありません。")
+        else:
+            st.plotly_chart(build_trend_chart(trend, selected_ex, grain), use_container_width=True)
+            st.dataframe(trend_table(trend, selected_ex, grain), use_container_width=True, hide_index=True)
 
  # データ表示
     st.markdown(f"**データ件数**: {len(dff)}")
-    st.dataframe(dff[['name', 'date', f'{selected_ex}_kg', f'{selected_ex}_count']], use_container_width=True)
\ No newline at end of file
+    st.dataframe(dff[['name', 'date', 'kg', 'reps']], use_container_width=True)
\ No newline at end of file
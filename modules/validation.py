@@ -0,0 +1,231 @@
+# modules/validation.py (取り込み時の検証。おかしな行はイベントテーブルに入れず、理由と一緒に隔離テーブルに残す)
+
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+from modules.exercises import EXERCISE_LABELS, REPS_ONLY_EXERCISES
+
+# ありえる値の範囲。外れたセットがあれば、そのセル (その送信のその種目) だけを取り込まない
+MAX_KG = 500.0
+MAX_REPS = 100
+MIN_BODYWEIGHT, MAX_BODYWEIGHT = 20.0, 300.0
+# 記録日は送信日時 (タイムスタンプ) の MAX_DAYS_BEFORE 日前〜 MAX_DAYS_AFTER 日後まで。
+# 年の打ち間違い (2025年の送信で 2005-12-30 など) を弾く。送信日時が無い行は、それより前の行の
+# 最後の送信日時 (シートの順) より MAX_DAYS_AFTER 日以上後の日付だけを弾く (古さは比べない)
+MAX_DAYS_BEFORE = 365
+MAX_DAYS_AFTER = 1
+EARLIEST_DATE = pd.Timestamp("2000-01-01")
+
+# 隔離テーブルの列 (行全体かセルの一部を取り込まなかった行ごとに1行)
+#   sheet_row : シートの行番号 (見出しが1行目)
+#   timestamp : 送信日時 (シートの値のまま)
+#   name      : 記入者名
+#   date      : 記録日 (日付として読めなければ NaT)
+#   dropped   : 取り込まなかった部分 (WHOLE_ROW か、種目名・"体重" を "、" でつないだもの)
+#   reasons   : 理由 (複数あれば " / " でつなぐ)
+QUARANTINE_COLUMNS = ['sheet_row', 'timestamp', 'name', 'date', 'dropped', 'reasons']
+WHOLE_ROW = "行全体"
+BODYWEIGHT_LABEL = "体重"
+
+
+def empty_quarantine():
+    return pd.DataFrame({
+        'sheet_row': pd.Series(dtype="int64"),
+        'timestamp': pd.Series(dtype=object),
+        'name': pd.Series(dtype=object),
+        'date': pd.Series(dtype="datetime64[ns]"),
+        'dropped': pd.Series(dtype=object),
+        'reasons': pd.Series(dtype=object),
+    })
+
+
+def empty_seen():
+    return pd.Series(dtype="int64", index=pd.Index([], dtype="uint64"))
+
+
+@dataclass(frozen=True)
+class Validation:
+    """validate の結果。"""
+    ok: np.ndarray  # df の行ごとの bool (False の行は行全体を隔離した)
+    set_ok: np.ndarray  # parsed のセットごとの bool (False のセットはセルごと取り込まない)
+    bodyweight_ok: np.ndarray  # df の行ごとの bool (False の行は体重だけを取り込まない)
+    quarantine: pd.DataFrame  # 隔離した行と理由 (QUARANTINE_COLUMNS)
+    seen: pd.Series  # これまでに見た送信の内容のハッシュ → 最初に出てきたシートの行番号 (次の追記分の重複検出に渡す)
+    latest_sent: pd.Timestamp  # これまでの最後の送信日時 (無ければ NaT。次の追記分の記録日の検証に渡す)
+
+
+def sheet_rows(df):
+    """df の各行のシートの行番号。SheetSync の生データは0始まりの連番なので、見出しの分を足す。"""
+    if pd.api.types.is_integer_dtype(df.index):
+        return df.index.to_numpy(dtype="int64") + 2
+    return np.arange(len(df), dtype="int64") + 2
+
+
+def _found(positions, reasons, parts=None):
+    """
+    (行の位置の配列, 理由の配列, 取り込まない部分の配列) の組。
+    parts が None なら行全体を取り込まない (記録日・記入者名・二重送信など、行全体の問題)。
+    """
+    positions = np.asarray(positions, dtype="int64")
+    parts = np.full(len(positions), None, dtype=object) if parts is None else np.asarray(parts, dtype=object)
+    return positions, np.asarray(reasons, dtype=object), parts
+
+
+def _check_dates(df, latest_sent):
+    """
+    記録日の検証。送信日時のある行は送信日時と、無い行はそれより前の最後の送信日時と比べる
+    (今日とは比べないので、同じシートなら何度取り込み直しても結果は変わらない)。
+    """
+    dates = df['date']
+    if 'timestamp' in df.columns:
+        sent = pd.to_datetime(df['timestamp'], errors='coerce', format='mixed')
+    else:
+        sent = pd.Series(pd.NaT, index=df.index, dtype="datetime64[ns]")
+    running = sent.cummax().ffill()
+    if pd.notna(latest_sent):
+        running = running.where(running >= latest_sent, latest_sent)
+    has_sent = sent.notna()
+    reference = sent.where(has_sent, running).dt.normalize()
+    odd = dates.notna() & (
+        (dates < EARLIEST_DATE)
+        | (dates > reference + pd.Timedelta(days=MAX_DAYS_AFTER))
+        | (has_sent & (dates < reference - pd.Timedelta(days=MAX_DAYS_BEFORE)))
+    )
+    missing = np.flatnonzero(dates.isna().to_numpy())
+    pos = np.flatnonzero(odd.to_numpy())
+    which = np.where(has_sent.to_numpy()[pos], "送信", "最後の送信").astype(object)
+    day, ref_day = (d.iloc[pos].dt.strftime("%Y-%m-%d").fillna("不明").to_numpy(dtype=object) for d in (dates, reference))
+    reasons = "記録日がありえない (" + day + "、" + which + " " + ref_day + ")"
+    latest = running.iloc[-1] if len(running) else latest_sent
+    return [
+        _found(missing, np.full(len(missing), "記録日が空か、日付として読めない", dtype=object)),
+        _found(pos, reasons),
+    ], latest
+
+
+def _check_sets(df, parsed, exercises):
+    """
+    範囲外の重量・回数のセットと、書式に合わないセル。理由の文字列も列ごとにまとめて作る。
+    どちらもそのセルだけを取り込まないので、(見つけたもの, parsed のセットごとの取り込むかどうか) を返す。
+    """
+    labels = np.array([EXERCISE_LABELS.get(ex, ex) for ex in exercises], dtype=object)
+    reps_only = np.array([ex in REPS_ONLY_EXERCISES for ex in exercises])
+    kg, reps = parsed.kg, parsed.reps
+    bad = np.flatnonzero((kg < 0) | (kg > MAX_KG) | (reps < 0) | (reps > MAX_REPS) | ((kg > 0) & (reps == 0)))
+    code = parsed.code[bad]
+    kg_text = pd.Series(kg[bad]).map("{:g}".format).to_numpy(dtype=object)
+    reps_text = reps[bad].astype(str).astype(object) + "回"
+    value = np.where(reps_only[code] & (kg[bad] == 0), reps_text, kg_text + "kg×" + reps_text)
+    found = [_found(parsed.row[bad], labels[code] + "の値がありえない (" + value + ")", labels[code])]
+    # 範囲外のセットがあるセルは、同じセルの他のセットも取り込まない
+    cell = parsed.row * len(exercises) + parsed.code
+    set_ok = ~np.isin(cell, cell[bad])
+
+    # 読めないセルの元の値は、種目の列ごとに配列から位置でまとめて取り出す
+    rows, codes = parsed.unparsed_row, parsed.unparsed_code
+    text = np.empty(len(rows), dtype=object)
+    for c, ex in enumerate(exercises):
+        hit = codes == c
+        if hit.any() and ex in df.columns:
+            text[hit] = df[ex].to_numpy(dtype=object)[rows[hit]]
+    text = pd.Series(text, dtype=object).astype(str).str.slice(0, 20).to_numpy(dtype=object)
+    found.append(_found(rows, labels[codes] + "の書き方が読めない (" + text + ")", labels[codes]))
+    return found, set_ok
+
+
+def _check_bodyweight(df):
+    """範囲外の体重。体重だけを取り込まないので、(見つけたもの, 行ごとの体重を取り込むかどうか) を返す。"""
+    if 'bodyweight' not in df.columns:
+        return [], np.ones(len(df), dtype=bool)
+    given = df['bodyweight'].notna() & (df['bodyweight'].astype(str).str.strip() != "")
+    weights = pd.to_numeric(df['bodyweight'], errors='coerce')
+    bad = given & ~weights.between(MIN_BODYWEIGHT, MAX_BODYWEIGHT)
+    pos = np.flatnonzero(bad.to_numpy())
+    text = df['bodyweight'].iloc[pos].astype(str).to_numpy(dtype=object)
+    return [_found(pos, "体重がありえない (" + text + ")", np.full(len(pos), BODYWEIGHT_LABEL))], ~bad.to_numpy()
+
+
+def _check_duplicates(df, parsed, exercises, rows, seen):
+    """
+    同じメンバー・記録日・記録内容の2回目以降の送信 (二重送信)。最初の1回だけを残す。
+    記録の無い行は比べない。seen (前の版までに見た内容) と、df の中の前の行の両方と比べる。
+    """
+    has_record = np.zeros(len(df), dtype=bool)
+    has_record[parsed.row] = True
+    has_record[parsed.unparsed_row] = True
+    columns = [c for c in ['name', 'date', *exercises, 'bodyweight'] if c in df.columns]
+    keys = pd.util.hash_pandas_object(df[columns], index=False).to_numpy()[has_record]
+    first = pd.Series(rows[has_record], index=keys)
+    first = first[~first.index.duplicated()]
+    seen = pd.concat([seen, first[~first.index.isin(seen.index)]])
+    origin = seen.reindex(keys).to_numpy()
+    positions = np.flatnonzero(has_record)
+    dup = origin != rows[has_record]
+    reasons = "二重送信 (" + origin[dup].astype("int64").astype(str).astype(object) + "行目と同じ内容)"
+    return [_found(positions[dup], reasons)], seen
+
+
+def _join_by_row(pos, texts, separator):
+    """行の位置ごとに、出てきた順のまま同じ文字列を1つにしてつなぐ。(行の位置, つないだ文字列) を返す。"""
+    found = pd.DataFrame({'pos': pos, 'text': texts}).drop_duplicates().sort_values('pos', kind='stable')
+    pos, first, counts = np.unique(found['pos'].to_numpy(), return_index=True, return_counts=True)
+    texts = found['text'].to_numpy()
+    joined = texts[first]
+    # 1つだけの行 (ほとんど) はつながずにそのまま使う
+    for k in np.flatnonzero(counts > 1):
+        joined[k] = separator.join(texts[first[k]:first[k] + counts[k]])
+    return pos, joined
+
+
+def validate(df, parsed, exercises, seen=None, latest_sent=None):
+    """
+    列名が英語に揃い、'date' を datetime にした横持ちの df を1行 (1回の送信) ずつ検証する。
+    parsed は df の parse_cells (modules/events.py) の結果。
+    次のどれかに当たる行は、行全体を隔離する (イベントテーブルに入れない):
+      - 記入者名が空
+      - 記録日が空・読めない・送信日時から離れすぎている
+      - 前の送信と同じ内容 (seen に前の版までに見た内容を渡すと、それとも比べる)
+    次の問題は、そのセルだけを取り込まない (同じ送信の他の種目は取り込む):
+      - 重量・回数が範囲外のセットがある、書式に合わない (そのセルの全セット)
+      - 体重 (任意) が範囲外 (体重だけ)
+    どちらも理由と一緒に隔離テーブルに残す。
+    追記分だけを検証する時は、前の版の Validation の seen と latest_sent を渡す。
+    取り込み時に新しい行ごとに1度だけ呼ぶので、タブ側では同じ掃除をしないこと。
+    """
+    rows = sheet_rows(df)
+    found, latest_sent = _check_dates(df, pd.NaT if latest_sent is None else latest_sent)
+    in_sets, set_ok = _check_sets(df, parsed, exercises)
+    in_bodyweight, bodyweight_ok = _check_bodyweight(df)
+    found += in_sets + in_bodyweight
+    if 'name' in df.columns:
+        missing = np.flatnonzero(df['name'].isna().to_numpy())
+        found.append(_found(missing, np.full(len(missing), "記入者名が空", dtype=object)))
+    duplicates, seen = _check_duplicates(df, parsed, exercises, rows, empty_seen() if seen is None else seen)
+    found += duplicates
+
+    ok = np.ones(len(df), dtype=bool)
+    found_pos = np.concatenate([p for p, _, _ in found])
+    if len(found_pos) == 0:
+        return Validation(ok, set_ok, bodyweight_ok, empty_quarantine(), seen, latest_sent)
+    reasons = np.concatenate([r for _, r, _ in found])
+    parts = np.concatenate([part for _, _, part in found])
+    whole = pd.isna(parts)
+    ok[found_pos[whole]] = False
+    pos, reasons = _join_by_row(found_pos, reasons, " / ")
+    # 行全体を取り込まなかった行以外は、取り込まなかったセル (種目名・体重) を並べる
+    dropped = np.full(len(pos), WHOLE_ROW, dtype=object)
+    partial = ok[pos]
+    if partial.any():
+        part_pos, part_names = _join_by_row(found_pos[~whole], parts[~whole], "、")
+        dropped[partial] = part_names[np.searchsorted(part_pos, pos[partial])]
+    quarantine = pd.DataFrame({
+        'sheet_row': rows[pos],
+        'timestamp': df['timestamp'].to_numpy()[pos] if 'timestamp' in df.columns else None,
+        'name': df['name'].astype(object).to_numpy()[pos] if 'name' in df.columns else None,
+        'date': df['date'].to_numpy()[pos],
+        'dropped': dropped,
+        'reasons': reasons,
+    })
+    return Validation(ok, set_ok, bodyweight_ok, quarantine[QUARANTINE_COLUMNS], seen, latest_sent)
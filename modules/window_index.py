@@ -0,0 +1,132 @@
+# modules/window_index.py (任意の期間の種目別ランキングを引く、日付順の索引)
+
+import numpy as np
+import pandas as pd
+
+LEADERBOARD_COLUMNS = ['name', 'best', 'date', 'percentile']
+
+# (メンバー番号, 日) を1つの整数キーにする。日は1970-01-01からの日数 (負でもよいようにずらす)
+_DAY_OFFSET = 2 ** 31
+_MEMBER_SHIFT = 2 ** 32
+
+
+def _to_days(values):
+    return np.asarray(values, dtype="datetime64[D]").astype("int64")
+
+
+def add_percentile(table):
+    """
+    ランキング (best の高い順) に、メンバー内での百分位 (percentile) を足す。
+    自分以下のスコアの人の割合 (%) で、1位は100、全員同じなら全員100。
+    """
+    return table.assign(percentile=table['best'].rank(pct=True, method='max') * 100)
+
+
+def empty_leaderboard():
+    return pd.DataFrame({
+        'name': pd.Series(dtype=object),
+        'best': pd.Series(dtype="float64"),
+        'date': pd.Series(dtype="datetime64[ns]"),
+        'percentile': pd.Series(dtype="float64"),
+    })
+
+
+class _ExerciseIndex:
+    """
+    1種目分。(メンバー, 日) ごとのベストスコアを (メンバー, 日付) 順に並べ、
+    区間の最大値の位置を O(1) で引ける疎テーブル (sparse table) を持つ。
+    table[j][i] は区間 [i, i + 2**j) で最大のスコアの位置 (同じスコアなら日付の早い方)。
+    """
+
+    def __init__(self, names, codes, days, scores):
+        self.names = np.asarray(names, dtype=object)
+        self.keys = codes.astype("int64") * _MEMBER_SHIFT + (days + _DAY_OFFSET)
+        self.days = days
+        self.scores = scores
+        n = len(scores)
+        self.table = [np.arange(n, dtype="int32")]
+        width = 1
+        while width * 2 <= n:
+            prev = self.table[-1]
+            left, right = prev[:n - 2 * width + 1], prev[width:n - width + 1]
+            self.table.append(np.where(scores[left] >= scores[right], left, right))
+            width *= 2
+
+    def best_in_window(self, start_day, end_day):
+        """各メンバーの [start_day, end_day] 内のベストの位置。記録の無いメンバーは -1。"""
+        members = np.arange(len(self.names), dtype="int64") * _MEMBER_SHIFT
+        lo = np.searchsorted(self.keys, members + (start_day + _DAY_OFFSET), side='left')
+        hi = np.searchsorted(self.keys, members + (end_day + _DAY_OFFSET), side='right')
+        length = hi - lo
+        pos = np.full(len(members), -1, dtype="int64")
+        has = length > 0
+        level = np.zeros(len(members), dtype="int64")
+        level[has] = np.log2(length[has]).astype("int64")
+        # 区間の長さごとに段 j が決まるので、段ごとにまとめて引く (段の数は log2(記録数) 以下)
+        for j in np.unique(level[has]):
+            sel = has & (level == j)
+            a = self.table[j][lo[sel]]
+            b = self.table[j][hi[sel] - (1 << j)]
+            pos[sel] = np.where(self.scores[a] >= self.scores[b], a, b)
+        return pos
+
+
+class WindowIndex:
+    """
+    種目ごとの、日付順に並んだ自己ベスト検索用の索引。
+    「直近30日」「今学期」のような任意の期間について、メンバーごとのベストを
+    メンバー数 × log(記録数) の手間で求め、上位 k 人と百分位のランキングを返す。
+    スコアは推定1RM (回数のみの種目は回数)。0以下の値は記録なしとして扱う。
+    """
+
+    def __init__(self, by_exercise=None):
+        self._by_exercise = by_exercise if by_exercise is not None else {}
+
+    @classmethod
+    def build(cls, events, scores=None):
+        """
+        イベントテーブル (modules/events.py) から作る。同じ日の記録はその日のベストにまとめる。
+        scores (events と同じ長さの配列) を渡すと、score 列の代わりにその値で順位を付ける。
+        """
+        if scores is not None:
+            events = events[['exercise', 'name', 'date']].assign(score=scores)
+        rows = events.loc[events['score'] > 0, ['exercise', 'name', 'date', 'score']]
+        if rows.empty:
+            return cls()
+        daily = (
+            rows.assign(day=_to_days(rows['date']), score=rows['score'].astype("float64"))
+            .groupby(['exercise', 'name', 'day'], observed=True, sort=True)['score'].max()
+            .reset_index()
+        )
+        by_exercise = {}
+        for ex, part in daily.groupby('exercise', observed=True, sort=False):
+            # メンバーのカテゴリは名前順なので、番号をそのまま詰め直せば名前順の番号になる
+            codes, uniques = pd.factorize(part['name'].cat.codes.to_numpy(), sort=True)
+            by_exercise[ex] = _ExerciseIndex(
+                part['name'].cat.categories[uniques], codes, part['day'].to_numpy(), part['score'].to_numpy()
+            )
+        return cls(by_exercise)
+
+    def leaderboard(self, exercise, start=None, end=None, k=None):
+        """
+        期間 [start, end] (両端の日を含む、省略すると無制限) の種目のランキング。
+        DataFrame (name, best, date, percentile) をスコアの高い順に返す。k を渡すと上位 k 人まで
+        (percentile は全員の中での値のまま)。
+        """
+        index = self._by_exercise.get(exercise)
+        if index is None:
+            return empty_leaderboard()
+        start_day = -_DAY_OFFSET if start is None else _to_days(pd.Timestamp(start).to_datetime64())
+        end_day = _DAY_OFFSET - 1 if end is None else _to_days(pd.Timestamp(end).to_datetime64())
+        pos = index.best_in_window(start_day, end_day)
+        found = pos >= 0
+        table = pd.DataFrame({
+            'name': index.names[found],
+            'best': index.scores[pos[found]],
+            'date': index.days[pos[found]].astype("datetime64[D]").astype("datetime64[ns]"),
+        })
+        table = add_percentile(table)
+        table = table.sort_values(['best', 'name'], ascending=[False, True], kind='stable')
+        if k is not None:
+            table = table.head(k)
+        return table.reset_index(drop=True)[LEADERBOARD_COLUMNS]
@@ -0,0 +1,11 @@
+# tests/conftest.py (テスト共通のデータ)
+
+import pytest
+
+from benchmarks.generate import generate_log
+
+
+@pytest.fixture(scope="session")
+def sheet():
+    """回答シートと同じ形の架空の記録 (体重の列は一部の行だけに入っている)。"""
+    return generate_log(3000, bodyweight_rate=0.2, seed=1)
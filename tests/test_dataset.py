@@ -0,0 +1,67 @@
+# tests/test_dataset.py (追記分だけを取り込んだ版と、全体を作り直した版が同じになること)
+
+import numpy as np
+import pandas as pd
+import pytest
+from pandas.testing import assert_frame_equal
+
+from modules.dataset import Dataset
+from modules.events import day_bodyweights, fill_bodyweights
+
+
+def _assert_same(incremental, full):
+    assert incremental.version == full.version
+    assert_frame_equal(incremental.events, full.events)
+    assert_frame_equal(incremental.quarantine, full.quarantine)
+    assert incremental.members == full.members
+
+
+@pytest.mark.parametrize("split", [0.3, 0.5, 0.9])
+def test_incremental_build_equals_full_build(sheet, split):
+    n = int(len(sheet) * split)
+    full = Dataset(sheet)
+    incremental = Dataset(sheet, base=Dataset(sheet.iloc[:n]))
+    assert full.events['bodyweight'].notna().any()
+    _assert_same(incremental, full)
+    for relative in (False, True):
+        assert_frame_equal(
+            incremental.leaderboard('bench_press', relative=relative),
+            full.leaderboard('bench_press', relative=relative),
+        )
+
+
+def test_chained_small_appends_equal_full_build(sheet):
+    part = sheet.iloc[:1200]
+    dataset = Dataset(part.iloc[:1000])
+    for end in range(1010, 1201, 10):
+        dataset = Dataset(part.iloc[:end], base=dataset)
+    _assert_same(dataset, Dataset(part))
+
+
+def test_appended_weight_refills_earlier_records():
+    # 体重の無かったメンバーに後から体重が書かれると、それより前の記録にもその体重が入る (全体を作り直した時と同じ)
+    df = pd.DataFrame({
+        'タイムスタンプ': ["2025/01/01 10:00:00", "2025/01/02 10:00:00", "2025/01/03 10:00:00"],
+        '記入者名': ["A", "A", "A"],
+        '記録日': pd.to_datetime(["2025-01-01", "2025-01-02", "2025-01-03"]),
+        'ベンチプレス(kg × 回数)': ["60-10", "62.5-10", "65-8"],
+        '体重(kg)': [None, None, "70"],
+    })
+    incremental = Dataset(df, base=Dataset(df.iloc[:2]))
+    assert incremental.events['bodyweight'].tolist() == [70.0, 70.0, 70.0]
+    _assert_same(incremental, Dataset(df))
+
+
+def test_fill_takes_same_day_then_earlier_then_later_weight():
+    df = pd.DataFrame({
+        'name': ["A", "A", "A", "B"],
+        'date': pd.to_datetime(["2025-01-05", "2025-01-10", "2025-01-10", "2025-01-01"]),
+        'bodyweight': ["60", "61", "62", None],
+    })
+    table = day_bodyweights(df)
+    # 同じ日に2つあればシートで後の値
+    assert table['bodyweight'].tolist() == [60.0, 62.0]
+    names = ["A", "A", "A", "A", "B", "C"]
+    dates = pd.to_datetime(["2025-01-01", "2025-01-05", "2025-01-07", "2025-01-20", "2025-01-01", "2025-01-01"])
+    filled = fill_bodyweights(names, dates.to_numpy(), table)
+    np.testing.assert_array_equal(filled, [60.0, 60.0, 60.0, 62.0, np.nan, np.nan])
@@ -0,0 +1,26 @@
+# tests/test_parsing.py (セルの解釈)
+
+import numpy as np
+import pandas as pd
+
+from modules.parsing import parse_numeric_series, parse_sets
+
+
+def test_parse_sets_reads_basic_forms():
+    cell, kg, reps = parse_sets(pd.Series(["80-10", " 37.5 -10", "15", "", None, "abc", "1-2-3"], dtype=object))
+    assert cell.tolist() == [0, 1, 2]
+    assert kg.tolist() == [80.0, 37.5, 0.0]
+    assert reps.tolist() == [10, 10, 15]
+
+
+def test_parse_sets_treats_overlong_reps_as_unreadable():
+    # int64 に収まらない回数で落ちずに、読めないセル (セット無し) になる
+    cell, kg, reps = parse_sets(pd.Series(["99999999999999999999", "80-99999999999999999999", "80-10"]))
+    assert cell.tolist() == [2]
+    assert reps.tolist() == [10]
+
+
+def test_numeric_series_truncates_and_drops_overlong_values():
+    kg, reps = parse_numeric_series(pd.Series([1e20, 12.7, np.nan, np.inf]))
+    assert kg.tolist() == [0.0] * 4
+    assert reps.tolist() == [0, 12, 0, 0]
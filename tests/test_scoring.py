@@ -0,0 +1,25 @@
+# tests/test_scoring.py (推定1RMの計算式)
+
+import numpy as np
+import pytest
+
+from modules.scoring import BRZYCKI_MAX_REPS, FORMULAS, estimate_one_rm
+
+
+@pytest.mark.parametrize("formula", list(FORMULAS))
+def test_zero_weight_or_reps_scores_zero(formula):
+    np.testing.assert_array_equal(estimate_one_rm([0, 80, 0], [10, 0, 0], formula), [0.0, 0.0, 0.0])
+
+
+def test_brzycki_is_capped_at_low_and_moderate_reps():
+    reps = np.array([1, 10, BRZYCKI_MAX_REPS, BRZYCKI_MAX_REPS + 1, 30, 36, 40, 100])
+    one_rm = estimate_one_rm(np.full(len(reps), 60.0), reps, 'brzycki')
+    assert one_rm[0] == pytest.approx(60.0)
+    assert one_rm[1] == pytest.approx(60 * 36 / 27)
+    assert one_rm[2] > 0
+    np.testing.assert_array_equal(one_rm[3:], 0.0)
+
+
+def test_brzycki_high_rep_back_off_set_does_not_beat_a_heavy_set():
+    heavy, back_off = estimate_one_rm([100.0, 40.0], [5, 30], 'brzycki')
+    assert heavy > back_off
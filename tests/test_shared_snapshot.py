@@ -0,0 +1,149 @@
+# tests/test_shared_snapshot.py (全セッションで共有するスナップショットと、裏で取り直すスレッド)
+
+import threading
+import time
+
+import pytest
+
+from modules.shared_snapshot import Refresher, SharedSnapshot
+
+
+def _wait_until(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.005)
+    return True
+
+
+class Source:
+    """呼ばれるたびに1つ大きい値を返す取得元。gate が閉じている間は取得の途中で止まる。"""
+
+    def __init__(self):
+        self.calls = 0
+        self.gate = threading.Event()
+        self.gate.set()
+        self.error = None
+
+    def fetch(self):
+        self.calls += 1
+        self.gate.wait()
+        if self.error is not None:
+            raise self.error
+        return f"v{self.calls}"  # 生データの代わり (len() で行数を取れる値)
+
+
+def _snapshot(source, **kwargs):
+    # プロセス共通の REFRESHER ではなく、テストごとの Refresher を使う
+    kwargs.setdefault('refresher', Refresher(jitter=0))
+    return SharedSnapshot(source.fetch, lambda raw: ('dataset', raw), **kwargs)
+
+
+def test_warm_start_is_served_without_waiting_for_the_fetch():
+    source = Source()
+    source.gate.clear()
+    snapshot = _snapshot(source, interval=60, warm_start=lambda: "v0")
+    started = time.monotonic()
+    assert snapshot.current(wait=5) == ('dataset', 'v0')
+    assert time.monotonic() - started < 1
+    source.gate.set()
+    assert _wait_until(lambda: snapshot.current() == ('dataset', 'v1'))
+
+
+def test_cold_start_waits_for_the_first_fetch_only():
+    source = Source()
+    snapshot = _snapshot(source, interval=60)
+    assert snapshot.current(wait=5) == ('dataset', 'v1')
+
+
+def test_fetches_are_single_flight():
+    source = Source()
+    snapshot = _snapshot(source, interval=60, warm_start=lambda: "v0")
+    snapshot.current()
+    assert _wait_until(lambda: source.calls == 1)
+    source.gate.clear()
+    threads = [threading.Thread(target=snapshot.refresh) for _ in range(8)]
+    for t in threads:
+        t.start()
+    assert _wait_until(lambda: source.calls == 2)
+    time.sleep(0.05)
+    source.gate.set()
+    for t in threads:
+        t.join(5)
+    # 取得中に呼ばれた分は取得せずに返る
+    assert source.calls == 2
+    assert snapshot.current() == ('dataset', 'v2')
+
+
+def test_failed_fetch_keeps_the_last_version():
+    source = Source()
+    snapshot = _snapshot(source, interval=60)
+    assert snapshot.current(wait=5) == ('dataset', 'v1')
+    source.error = RuntimeError("quota")
+    snapshot.refresh()
+    assert snapshot.current() == ('dataset', 'v1')
+    assert snapshot.last_error is source.error
+    source.error = None
+    snapshot.refresh()
+    assert snapshot.current() == ('dataset', 'v3') and snapshot.last_error is None
+
+
+def test_refresher_refreshes_on_interval_and_on_poke():
+    source = Source()
+    refresher = Refresher(jitter=0)
+    snapshot = _snapshot(source, interval=0.05, refresher=refresher)
+    snapshot.current(wait=5)
+    assert _wait_until(lambda: source.calls >= 3)
+
+    slow = Source()
+    other = _snapshot(slow, interval=60, refresher=refresher)
+    other.current(wait=5)
+    assert slow.calls == 1
+    refresher.poke(other)
+    assert _wait_until(lambda: slow.calls == 2)
+
+
+def test_readers_never_see_a_half_built_version():
+    source = Source()
+    built = []
+
+    def build(raw):
+        dataset = {'raw': raw}
+        time.sleep(0.001)
+        dataset['check'] = raw  # 作り終えてから公開されるなら、raw と check は常に一致する
+        built.append(raw)
+        return dataset
+
+    snapshot = SharedSnapshot(source.fetch, build, interval=0.001, refresher=Refresher(jitter=0))
+    snapshot.current(wait=5)
+    seen = set()
+    deadline = time.monotonic() + 0.3
+    while time.monotonic() < deadline:
+        dataset = snapshot.current()
+        assert dataset['raw'] == dataset['check']
+        seen.add(dataset['raw'])
+    assert len(seen) > 1
+
+
+@pytest.mark.parametrize("fetched_at_given", [True, False])
+def test_overlay_gets_the_fetch_start_time(fetched_at_given):
+    source = Source()
+    calls = []
+
+    def overlay(raw, fetched_at):
+        calls.append(fetched_at)
+        return raw
+
+    snapshot = SharedSnapshot(source.fetch, lambda raw: raw, interval=60, overlay=overlay,
+                              warm_start=(lambda: "v0") if not fetched_at_given else None,
+                              refresher=Refresher(jitter=0))
+    before = time.monotonic()
+    snapshot.current(wait=5)
+    assert _wait_until(lambda: snapshot.current() == "v1")
+    snapshot.republish()
+    if not fetched_at_given:
+        assert calls[0] is None  # ローカルの値には取得時刻が無い
+    fetched = [t for t in calls if t is not None]
+    assert fetched and all(t >= before for t in fetched)
+    assert calls[-1] == fetched[0]  # republish は最後の取得の時刻を使い回す
@@ -0,0 +1,77 @@
+# tests/test_sql_store.py (SQLite版の SqlDataset が Dataset と同じ答えを返すこと)
+
+import pandas as pd
+import pytest
+from pandas.testing import assert_frame_equal
+
+from modules.dataset import Dataset
+from modules.exercises import EXERCISE_COLS, REPS_ONLY_EXERCISES
+from modules.scoring import FORMULAS
+from modules.sql_store import EventStore, SqlDataset
+
+
+@pytest.fixture(scope="module")
+def backends(sheet, tmp_path_factory):
+    dataset = Dataset(sheet)
+    store = EventStore(tmp_path_factory.mktemp("sql") / "tracker.db")
+    return dataset, SqlDataset(store, dataset)
+
+
+def _same(left, right):
+    assert_frame_equal(left.reset_index(drop=True), right.reset_index(drop=True), check_dtype=False)
+
+
+def test_reps_only_exercises_are_covered():
+    assert REPS_ONLY_EXERCISES and set(REPS_ONLY_EXERCISES) <= set(EXERCISE_COLS)
+
+
+def test_members_months_and_range(backends):
+    dataset, sql = backends
+    assert sql.members == dataset.members
+    assert sql.months == dataset.months
+    assert sql.date_range() == dataset.date_range()
+
+
+@pytest.mark.parametrize("exercise", EXERCISE_COLS)
+def test_ranking_and_best(backends, exercise):
+    dataset, sql = backends
+    ranking = dataset.ranking(exercise)
+    assert not ranking.empty
+    _same(sql.ranking(exercise), ranking)
+    name = ranking['name'].iloc[0]
+    (score, date), (expected_score, expected_date) = sql.best(name, exercise), dataset.best(name, exercise)
+    assert score == pytest.approx(expected_score) and date == expected_date
+
+
+@pytest.mark.parametrize("exercise", EXERCISE_COLS)
+@pytest.mark.parametrize("formula", list(FORMULAS))
+@pytest.mark.parametrize("relative", [False, True])
+def test_leaderboard(backends, exercise, formula, relative):
+    dataset, sql = backends
+    end = dataset.date_range()[1]
+    for start, k in [(None, None), (end - pd.Timedelta(days=30), 5)]:
+        expected = dataset.leaderboard(exercise, start, end, k, formula=formula, relative=relative)
+        _same(sql.leaderboard(exercise, start, end, k, formula=formula, relative=relative), expected)
+
+
+@pytest.mark.parametrize("exercise", EXERCISE_COLS)
+def test_select_and_growth(backends, exercise):
+    dataset, sql = backends
+    first, last = dataset.date_range()
+    names = dataset.members[:5]
+    for formula in FORMULAS:
+        _same(
+            sql.select(exercise, names, first, last, formula=formula),
+            dataset.select(exercise, names, first, last, formula=formula),
+        )
+    month = dataset.months[1]
+    _same(sql.growth_for(exercise, month), dataset.growth_for(exercise, month))
+
+
+def test_versions_sharing_one_file_answer_for_their_own_version(sheet, tmp_path):
+    # 同じファイルの同じサークルに別の版が書かれても、それぞれ自分の版で答える (追記の入れ直しも含む)
+    store = EventStore(tmp_path / "tracker.db")
+    older, newer = Dataset(sheet.iloc[:2000]), Dataset(sheet)
+    old_sql, new_sql = SqlDataset(store, older), SqlDataset(store, newer)
+    for dataset, sql in [(older, old_sql), (newer, new_sql), (older, old_sql), (newer, new_sql)]:
+        _same(sql.ranking('bench_press'), dataset.ranking('bench_press'))
@@ -0,0 +1,91 @@
+# tests/test_submission_queue.py (フォームからの書き込みのキュー)
+
+import time
+from types import SimpleNamespace
+
+import pandas as pd
+
+from modules.submission_queue import SubmissionQueue
+
+HEADER = ['タイムスタンプ', '記入者名', '記録日', 'ベンチプレス(kg × 回数)']
+
+
+class FakeWorksheet:
+    """append_rows の呼び出しを記録する偽のワークシート。fail_on を含むまとまりは status で失敗する。"""
+
+    def __init__(self, fail_on=None, status=400):
+        self.calls = []
+        self.rows = []
+        self.fail_on = fail_on
+        self.status = status
+
+    def row_values(self, _):
+        return HEADER
+
+    def append_rows(self, rows, value_input_option=None):
+        self.calls.append(len(rows))
+        if self.fail_on is not None and any(self.fail_on in row for row in rows):
+            error = RuntimeError(f"HTTP {self.status}")
+            error.response = SimpleNamespace(status_code=self.status, headers={})
+            raise error
+        self.rows.extend(rows)
+
+
+def _record(name, bench="80-10"):
+    return {'タイムスタンプ': '2025/01/01 10:00:00', '記入者名': name, '記録日': '2025-01-01 00:00:00',
+            'ベンチプレス(kg × 回数)': bench}
+
+
+def test_batch_is_written_in_one_call():
+    sheet = FakeWorksheet()
+    queue = SubmissionQueue(lambda: sheet, linger=0.05)
+    for name in ["A", "B", "C"]:
+        queue.submit(_record(name))
+    assert queue.flush(timeout=5)
+    assert sheet.calls == [3]
+    assert [row[1] for row in sheet.rows] == ["A", "B", "C"]
+
+
+def test_rejected_row_does_not_take_the_rest_of_its_batch():
+    sheet = FakeWorksheet(fail_on="壊れた")
+    queue = SubmissionQueue(lambda: sheet, linger=0.05)
+    for name in ["A", "壊れた", "C", "D"]:
+        queue.submit(_record(name))
+    assert queue.flush(timeout=5)
+    # まとめて1回 → 失敗したので1行ずつ4回
+    assert sheet.calls == [4, 1, 1, 1, 1]
+    assert [row[1] for row in sheet.rows] == ["A", "C", "D"]
+    failed = queue.failed_rows()
+    assert failed['記入者名'].tolist() == ["壊れた"]
+    assert failed['エラー'].tolist() == ["HTTP 400"]
+    # 書き込めた行は、次の取得が表示されるまで表示に足し続ける。書き込めなかった行は足さない
+    fetched = pd.DataFrame([queue.to_row(_record("前から"))], columns=HEADER)
+    shown = queue.with_pending(fetched)
+    assert shown['記入者名'].tolist() == ["前から", "A", "C", "D"]
+
+
+def test_rows_after_the_isolated_batch_are_batched_again():
+    sheet = FakeWorksheet(fail_on="壊れた")
+    queue = SubmissionQueue(lambda: sheet, linger=0.05)
+    for name in ["A", "壊れた"]:
+        queue.submit(_record(name))
+    assert queue.flush(timeout=5)
+    for name in ["E", "F"]:
+        queue.submit(_record(name))
+    assert queue.flush(timeout=5)
+    assert sheet.calls == [2, 1, 1, 2]
+    assert len(queue.failed) == 1
+
+
+def test_retryable_error_is_retried_and_cleared():
+    sheet = FakeWorksheet(fail_on="A", status=503)
+    queue = SubmissionQueue(lambda: sheet, linger=0.01, max_backoff=0)
+    queue.submit(_record("A"))
+    deadline = time.monotonic() + 5
+    while queue.last_error is None and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert queue.last_error is not None
+    sheet.fail_on = None
+    assert queue.flush(timeout=5)
+    assert queue.last_error is None and not queue.failed
+    assert [row[1] for row in sheet.rows] == ["A"]
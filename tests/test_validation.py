@@ -0,0 +1,91 @@
+# tests/test_validation.py (取り込み時の検証と隔離)
+
+import pandas as pd
+import pytest
+
+from modules.dataset import Dataset, ingest
+from modules.validation import WHOLE_ROW
+
+BENCH, SQUAT, LEG = 'ベンチプレス(kg × 回数)', 'スクワット(kg × 回数)', 'レッグプレス(kg × 回数)'
+
+
+def _sheet(rows):
+    """(送信日時, 記入者名, 記録日, {列: 値}) のリストから回答シートの生データを作る。"""
+    records = [{'タイムスタンプ': sent, '記入者名': name, '記録日': date, **cells} for sent, name, date, cells in rows]
+    df = pd.DataFrame(records)
+    df['記録日'] = pd.to_datetime(df['記録日'], errors='coerce')
+    return df
+
+
+def _quarantine_by_row(df):
+    events, checked, _ = ingest(df)
+    return events, checked.quarantine.set_index('sheet_row')
+
+
+def test_bad_cell_keeps_the_other_exercises_of_the_submission():
+    df = _sheet([
+        ("2025/05/01 20:00:00", "A", "2025-05-01", {BENCH: "80-10", SQUAT: "100-5", LEG: "163"}),
+        ("2025/05/01 20:05:00", "B", "2025-05-01", {BENCH: "60-10", SQUAT: "abc", LEG: None}),
+    ])
+    events, quarantine = _quarantine_by_row(df)
+    # 163回は範囲外なのでレッグプレスだけ、読めないスクワットだけを取り込まない
+    assert sorted(zip(events['name'], events['exercise'].astype(str))) == [
+        ("A", "bench_press"), ("A", "squat"), ("B", "bench_press"),
+    ]
+    assert quarantine.loc[2, 'dropped'] == "レッグプレス"
+    assert quarantine.loc[2, 'reasons'] == "レッグプレスの値がありえない (0kg×163回)"
+    assert quarantine.loc[3, 'dropped'] == "スクワット"
+    assert quarantine.loc[3, 'reasons'] == "スクワットの書き方が読めない (abc)"
+
+
+def test_one_bad_set_drops_the_whole_cell():
+    df = _sheet([("2025/05/01 20:00:00", "A", "2025-05-01", {BENCH: "80-10,800-5", SQUAT: "100-5"})])
+    events, quarantine = _quarantine_by_row(df)
+    assert events['exercise'].astype(str).tolist() == ["squat"]
+    assert quarantine.loc[2, 'dropped'] == "ベンチプレス"
+
+
+def test_bad_bodyweight_drops_only_the_weight():
+    df = _sheet([("2025/05/01 20:00:00", "A", "2025-05-01", {BENCH: "80-10", '体重(kg)': "650"})])
+    events, quarantine = _quarantine_by_row(df)
+    assert len(events) == 1 and events['bodyweight'].isna().all()
+    assert quarantine.loc[2, 'dropped'] == "体重"
+
+
+def test_row_level_problems_drop_the_whole_row():
+    df = _sheet([
+        ("2025/05/01 20:00:00", "A", "2005-05-01", {BENCH: "80-10", LEG: "163"}),  # 年の打ち間違い
+        ("2025/05/01 20:01:00", None, "2025-05-01", {BENCH: "80-10"}),  # 記入者名が空
+        ("2025/05/01 20:02:00", "B", "2025-05-01", {BENCH: "70-10"}),
+        ("2025/05/01 20:03:00", "B", "2025-05-01", {BENCH: "70-10"}),  # 二重送信
+    ])
+    events, quarantine = _quarantine_by_row(df)
+    assert events['name'].astype(str).tolist() == ["B"]
+    assert quarantine['dropped'].to_dict() == {2: WHOLE_ROW, 3: WHOLE_ROW, 5: WHOLE_ROW}
+    # 行全体の問題とセルの問題が重なった行は、理由を全部つなぐ
+    assert quarantine.loc[2, 'reasons'] == (
+        "記録日がありえない (2005-05-01、送信 2025-05-01) / レッグプレスの値がありえない (0kg×163回)"
+    )
+    assert quarantine.loc[5, 'reasons'] == "二重送信 (4行目と同じ内容)"
+
+
+@pytest.mark.parametrize("date, flagged", [("2021-01-01", False), ("2025-05-10", True)])
+def test_rows_without_timestamp_are_checked_against_the_last_submission(date, flagged):
+    # 送信日時の無い行は今日ではなく、それより前の最後の送信日時と比べる (未来の日付だけを弾く)
+    df = _sheet([
+        ("2025/05/01 20:00:00", "A", "2025-05-01", {BENCH: "80-10"}),
+        (None, "B", date, {BENCH: "60-10"}),
+    ])
+    _, quarantine = _quarantine_by_row(df)
+    assert (3 in quarantine.index) == flagged
+    if flagged:
+        assert quarantine.loc[3, 'reasons'] == "記録日がありえない (2025-05-10、最後の送信 2025-05-01)"
+
+
+def test_quarantine_is_the_same_for_incremental_and_full_builds(sheet):
+    sheet = sheet.copy()
+    sheet.loc[sheet.index[::97], '記録日'] = pd.Timestamp("2005-01-01")  # 行全体を弾く行を混ぜる
+    full = Dataset(sheet)
+    assert (full.quarantine['dropped'] == WHOLE_ROW).any() and (full.quarantine['dropped'] != WHOLE_ROW).any()
+    incremental = Dataset(sheet, base=Dataset(sheet.iloc[:1500]))
+    pd.testing.assert_frame_equal(incremental.quarantine, full.quarantine)